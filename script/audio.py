@@ -0,0 +1,142 @@
+import os
+import struct
+
+import numpy as np
+
+from textgrid import read_textgrid
+
+WAV_PATTERN = r'^\d+_[\w-]+\.wav$'
+# PCM sample widths that map straight onto a NumPy dtype (24-bit is unpacked)
+PCM_DTYPES = {1: np.uint8, 2: np.dtype('<i2'), 4: np.dtype('<i4')}
+FLOAT_DTYPES = {4: np.dtype('<f4'), 8: np.dtype('<f8')}
+
+
+class WavFile:
+    # samples stay on disk: 'data' is a memmap (frames x channels) and only the
+    # pages behind the requested segments are ever read
+    def __init__(self, path, sample_rate, data, scale, offset=0.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.data = data
+        self.scale = scale
+        self.offset = offset
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __repr__(self):
+        return f"WavFile({os.path.basename(self.path)!r}, {self.sample_rate} Hz, {len(self)} frames)"
+
+    @property
+    def duration(self):
+        return len(self) / self.sample_rate
+
+    def gather(self, index, channel=0):
+        # float64 samples at an integer index array of any shape; positions
+        # outside the file read as silence
+        index = np.asarray(index)
+        inside = (index >= 0) & (index < len(self))
+        values = self.data[np.where(inside, index, 0), channel].astype(np.float64)
+        return np.where(inside, (values - self.offset) * self.scale, 0.0)
+
+    def segment(self, start, end, channel=0):
+        first = max(int(round(start * self.sample_rate)), 0)
+        last = min(int(round(end * self.sample_rate)), len(self))
+        return self.gather(np.arange(first, last), channel)
+
+
+class Int24Frames:
+    # 24-bit PCM has no NumPy dtype: the bytes are memory-mapped as
+    # (frames x channels x 3) and only the indexed samples are unpacked
+    def __init__(self, path, offset, n_frames, channels):
+        if n_frames:
+            self.raw = np.memmap(path, np.uint8, 'r', offset, (n_frames, channels, 3))
+        else:
+            self.raw = np.zeros((0, channels, 3), dtype=np.uint8)
+        self.shape = (n_frames, channels)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        raw = np.asarray(self.raw[key], dtype=np.int32)
+        values = raw[..., 0] | (raw[..., 1] << 8) | (raw[..., 2] << 16)
+        return np.where(values >= 1 << 23, values - (1 << 24), values)
+
+
+def read_wav(path):
+    with open(path, 'rb') as file:
+        riff, _, wave = struct.unpack('<4sI4s', file.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError(f"{path} is not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            header = file.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = file.read(size)
+                tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if tag == 0xFFFE and len(body) >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE: the real format is the subformat GUID's first word
+                    tag = struct.unpack('<H', body[24:26])[0]
+                fmt = (tag, channels, sample_rate, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path}: data chunk before fmt chunk")
+                data_offset = file.tell()
+                break
+            else:
+                file.seek(size + (size & 1), os.SEEK_CUR)
+    tag, channels, sample_rate, bits = fmt
+    width = bits // 8
+    n_frames = size // (width * channels)
+    if tag == 1 and width == 3:
+        return WavFile(path, sample_rate, Int24Frames(path, data_offset, n_frames, channels), 1 / (1 << 23))
+    if tag == 1 and width in PCM_DTYPES:
+        dtype = PCM_DTYPES[width]
+        if width == 1:
+            return WavFile(path, sample_rate,
+                           np.memmap(path, dtype, 'r', data_offset, (n_frames, channels)), 1 / 128, 128.0)
+        scale = 1 / float(1 << (bits - 1))
+    elif tag == 3 and width in FLOAT_DTYPES:
+        dtype = FLOAT_DTYPES[width]
+        scale = 1.0
+    else:
+        raise ValueError(f"{path}: unsupported WAV format (tag {tag}, {bits} bits)")
+    if n_frames == 0:
+        return WavFile(path, sample_rate, np.zeros((0, channels), dtype=dtype), scale)
+    return WavFile(path, sample_rate, np.memmap(path, dtype, 'r', data_offset, (n_frames, channels)), scale)
+
+
+def labelled_intervals(textgrid_path, tier_name, labels=None):
+    # (labels, starts, ends) of the non-empty intervals of one tier
+    tier = read_textgrid(textgrid_path).tier(tier_name)
+    if tier is None or tier.is_point_tier:
+        return None
+    texts = np.array([text.strip() for text in tier.texts], dtype=object)
+    keep = texts != ''
+    if labels is not None:
+        keep &= np.isin(texts, list(labels))
+    return texts[keep], tier.starts[keep], tier.ends[keep]
+
+
+def frame_starts(n_samples, frame_length, hop):
+    # start offsets of the frames covering a segment; a segment shorter than
+    # one frame still gets one (zero-padded) frame
+    n_frames = max(int((n_samples - frame_length) // hop) + 1, 1)
+    return np.arange(n_frames) * hop
+
+
+def paired_textgrid(audio_path):
+    path = os.path.splitext(audio_path)[0] + '.TextGrid'
+    return path if os.path.exists(path) else None
+
+
+def paired_wav(textgrid_path):
+    stem = os.path.splitext(textgrid_path)[0]
+    for extension in ('.wav', '.WAV'):
+        if os.path.exists(stem + extension):
+            return stem + extension
+    return None
@@ -0,0 +1,345 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from synth import SYNTH_ROOT, corpus_params, generate_corpus, read_marker
+
+RESULTS_PATH = 'bench_results.jsonl'
+REPEATS = 3
+# a stage this much slower than in the previous run is reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _path(ctx, *parts):
+    return os.path.join(ctx['root'], *parts)
+
+
+def _out(ctx, name):
+    return os.path.join(ctx['workdir'], name)
+
+
+# every stage is (name, setup, run): setup(ctx) prepares untimed state (and
+# clears caches for the cold stages), run(ctx, state) is timed and returns
+# the number of rows or tokens it went through
+
+def _vot_processor(ctx):
+    from vot import TextGridProcessor
+    return TextGridProcessor(_path(ctx, 'vot'), output_path=_out(ctx, 'vot.csv'), workers=ctx['workers'])
+
+
+def _cold_vot(ctx):
+    _remove(_out(ctx, 'vot.csv'), _out(ctx, 'vot.manifest.json'))
+
+
+def _parse_vot(ctx, state):
+    return len(_vot_processor(ctx).df)
+
+
+def _cold_index(ctx):
+    _remove(_out(ctx, 'labels.sqlite'))
+
+
+def _parse_index(ctx, state):
+    from labelindex import LabelIndex
+    with LabelIndex(_out(ctx, 'labels.sqlite'), ctx['root']) as index:
+        index.update(workers=ctx['workers'])
+        return int(index.sql('SELECT COUNT(*) AS n FROM intervals')['n'][0])
+
+
+def _aggregate_vot(ctx, processor):
+    return int(processor.calculate_statistics()['N'].sum())
+
+
+def _vowel_plotter(ctx):
+    from monothong import VowelSpacePlotter
+    return VowelSpacePlotter(_path(ctx, 'vowels', 'monothongs', 'summary.tsv'))
+
+
+def _aggregate_vowels(ctx, plotter):
+    return len(plotter.transform_by_label()[1])
+
+
+def _tone_contours(ctx):
+    from contours import load_tone_contours
+    return load_tone_contours(_path(ctx, 'vowels', 'tones', 'mean_f0_results.tsv'))
+
+
+def _aggregate_tones(ctx, contours):
+    contours.label_means()
+    return len(contours)
+
+
+def _moments(ctx):
+    from fricative_cog import load_moments
+    return load_moments('praat', directory=_path(ctx, 'fricatives'))
+
+
+def _aggregate_cog(ctx, moments):
+    from fricative_cog import build_fricative_table, summarize_cog
+    fricative_df = build_fricative_table(moments)
+    summarize_cog(fricative_df)
+    return len(fricative_df)
+
+
+def _sonorant_rows(ctx):
+    from sonorants import load_sonorants
+    return load_sonorants(_path(ctx, 'sonorants', 'output.txt'))
+
+
+def _aggregate_sonorants(ctx, df_clean):
+    from sonorants import sonorant_stats
+    sonorant_stats(df_clean)
+    return len(df_clean)
+
+
+def _envelope_source(ctx):
+    return _path(ctx, 'fricatives', 'spectral_envolope.tsv')
+
+
+def _cold_cube(ctx):
+    _remove(os.path.splitext(_envelope_source(ctx))[0] + '.cube.npz')
+
+
+def _load_cube(ctx, state):
+    from spectra import load_spectral_cube
+    return len(load_spectral_cube(_envelope_source(ctx)))
+
+
+def _spectral_cube(ctx):
+    from spectra import load_spectral_cube
+    return load_spectral_cube(_envelope_source(ctx))
+
+
+def _aggregate_spectra(ctx, cube):
+    cube.label_means()
+    return len(cube)
+
+
+TABLES = {
+    'monothongs': ('vowels', 'monothongs', 'summary.tsv'),
+    'dipthongs': ('vowels', 'dipthongs', 'summary.tsv'),
+    'tones': ('vowels', 'tones', 'mean_f0_results.tsv'),
+    'envelopes': ('fricatives', 'spectral_envolope.tsv'),
+    'sonorants': ('sonorants', 'output.txt'),
+}
+
+
+def _load_stages():
+    from store import columnar_path, load_table
+    stages = []
+    for name, parts in TABLES.items():
+        def cold(ctx, parts=parts):
+            _remove(columnar_path(_path(ctx, *parts)))
+
+        def load(ctx, state, parts=parts):
+            return len(load_table(_path(ctx, *parts)))
+        stages += [(f'load/{name}', cold, load), (f'load/{name}-cached', None, load)]
+    return stages
+
+
+def _diphthong_rows(ctx):
+    from store import load_table
+    return load_table(_path(ctx, 'vowels', 'dipthongs', 'summary.tsv'),
+                      columns=['Filename', 'vowel', 'F1', 'F2', 'VowelPercent'])
+
+
+def _timepoints(ctx, df, method='nearest'):
+    from trajectory import extract_timepoints, trajectory_array
+    tokens, _ = trajectory_array(extract_timepoints(df, (25, 50, 75), method=method), [25, 50, 75])
+    return len(tokens)
+
+
+def _render(target, **params):
+    def run(ctx, state):
+        import importlib
+        module_name, func_name = target.split(':')
+        func = getattr(importlib.import_module(module_name), func_name)
+        func(save_path=_out(ctx, f"{func_name}-{params.get('kind', module_name)}.png"), dpi=ctx['dpi'],
+             show=False, **{key: value(ctx) if callable(value) else value for key, value in params.items()})
+        return 0
+    return run
+
+
+def _cog_tables(ctx):
+    from fricative_cog import build_fricative_table, summarize_cog
+    fricative_df = build_fricative_table(_moments(ctx))
+    return fricative_df, summarize_cog(fricative_df)[0]
+
+
+def _render_cog(ctx, state):
+    from fricative_cog import plot_cog_by_poa
+    fricative_df, cog_by_poa = state
+    plot_cog_by_poa(fricative_df, cog_by_poa, save_path=_out(ctx, 'fricative_cog.png'), dpi=ctx['dpi'], show=False)
+    return len(fricative_df)
+
+
+def bench_stages():
+    return [
+        ('parse/vot', _cold_vot, _parse_vot),
+        ('parse/vot-cached', None, _parse_vot),
+        ('parse/label-index', _cold_index, _parse_index),
+        *_load_stages(),
+        ('load/spectral-cube', _cold_cube, _load_cube),
+        ('aggregate/vot', _vot_processor, _aggregate_vot),
+        ('aggregate/vowels', _vowel_plotter, _aggregate_vowels),
+        ('aggregate/tones', _tone_contours, _aggregate_tones),
+        ('aggregate/cog', _moments, _aggregate_cog),
+        ('aggregate/sonorants', _sonorant_rows, _aggregate_sonorants),
+        ('aggregate/spectra', _spectral_cube, _aggregate_spectra),
+        ('timepoints/diphthongs', _diphthong_rows, _timepoints),
+        ('timepoints/diphthongs-interp', _diphthong_rows, lambda ctx, df: _timepoints(ctx, df, 'interp')),
+        ('render/plosives', None, _render('vot:plot_figure', kind='plosives', directory=lambda ctx: _path(ctx, 'vot'))),
+        ('render/vowel-space', None, _render('monothong:plot_figure',
+                                             tsv_path=lambda ctx: _path(ctx, 'vowels', 'monothongs', 'summary.tsv'))),
+        ('render/tones', None, _render('tones:plot_tones',
+                                       source=lambda ctx: _path(ctx, 'vowels', 'tones', 'mean_f0_results.tsv'))),
+        ('render/diphthongs', None, _render('dipthong_and_vowel_cluster:plot_diphthongs',
+                                            source=lambda ctx: _path(ctx, 'vowels', 'dipthongs', 'summary.tsv'))),
+        ('render/fricatives', None, _render('fricative:plot_fricative_spectra', source=_envelope_source)),
+        ('render/cog', _cog_tables, _render_cog),
+    ]
+
+
+@contextlib.contextmanager
+def _quiet():
+    # the scripts' own progress output and warnings would drown the timings
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+
+def measure_stage(ctx, setup, run, repeats=REPEATS):
+    # wall time of `repeats` runs, then one more under tracemalloc for the
+    # peak of Python and NumPy allocations (tracing slows the run down, so
+    # it is kept out of the timings)
+    seconds = []
+    with _quiet():
+        for _ in range(repeats):
+            state = setup(ctx) if setup is not None else None
+            gc.collect()
+            start = time.perf_counter()
+            rows = run(ctx, state)
+            seconds.append(time.perf_counter() - start)
+        state = setup(ctx) if setup is not None else None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(ctx, state)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return seconds, peak, rows
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def ensure_corpus(root, n_tokens, tokens_per_file=10, frame_tokens=10000, seed=0, workers=None):
+    # a synthetic corpus per size, regenerated only when its parameters change
+    if read_marker(root) == corpus_params(n_tokens, tokens_per_file, frame_tokens, seed):
+        return root
+    generate_corpus(root, n_tokens, tokens_per_file, frame_tokens, seed=seed, workers=workers)
+    return root
+
+
+def run_benchmarks(sizes=(1000,), stages=None, root=SYNTH_ROOT, out=RESULTS_PATH, repeats=REPEATS, workers=1,
+                   dpi=72, frame_tokens=10000, seed=0):
+    # stages are picked by name prefix ('parse', 'render/tones'); one JSON
+    # line per stage and size is appended to `out`
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    selected = [stage for stage in bench_stages()
+                if not stages or any(stage[0] == name or stage[0].startswith(name.rstrip('/') + '/')
+                                     for name in stages)]
+    if not selected:
+        raise ValueError(f"No stage matches {stages} (stages: {[stage[0] for stage in bench_stages()]})")
+    run_id = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    env = environment()
+    records = []
+    for n_tokens in sizes:
+        corpus = ensure_corpus(os.path.join(root, str(n_tokens)), n_tokens, frame_tokens=frame_tokens, seed=seed,
+                               workers=workers)
+        workdir = os.path.join(corpus, '.bench')
+        os.makedirs(workdir, exist_ok=True)
+        ctx = {'root': corpus, 'workdir': workdir, 'workers': workers, 'dpi': dpi}
+        for name, setup, run in selected:
+            seconds, peak, rows = measure_stage(ctx, setup, run, repeats)
+            record = {'run': run_id, **env, 'tokens': n_tokens, 'stage': name, 'workers': workers,
+                      'seconds': [round(value, 6) for value in seconds], 'best': round(min(seconds), 6),
+                      'median': round(float(np.median(seconds)), 6), 'peak_mb': round(peak / 2 ** 20, 3),
+                      'rows': int(rows)}
+            records.append(record)
+            with open(out, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            print(f"{n_tokens:>8} {name:<32} {record['best']:10.4f}s  peak {record['peak_mb']:10.1f} MB  "
+                  f"rows {record['rows']}")
+    print(f"Appended {len(records)} result(s) to: {out}")
+    return pd.DataFrame(records)
+
+
+def load_results(path=RESULTS_PATH):
+    with open(path, 'r', encoding='utf-8') as file:
+        return pd.DataFrame([json.loads(line) for line in file if line.strip()])
+
+
+def compare_results(path=RESULTS_PATH, threshold=REGRESSION_RATIO):
+    # the latest run of every stage and size against the run before it
+    df = load_results(path).sort_values('run', kind='stable')
+    rows = []
+    for (stage, n_tokens), group in df.groupby(['stage', 'tokens'], sort=True):
+        runs = group.drop_duplicates('run', keep='last')
+        if len(runs) < 2:
+            continue
+        previous, latest = runs.iloc[-2], runs.iloc[-1]
+        ratio = latest['best'] / previous['best'] if previous['best'] > 0 else np.nan
+        rows.append({'stage': stage, 'tokens': n_tokens, 'previous': previous['commit'], 'latest': latest['commit'],
+                     'previous_s': previous['best'], 'latest_s': latest['best'], 'ratio': round(ratio, 3),
+                     'previous_mb': previous['peak_mb'], 'latest_mb': latest['peak_mb'],
+                     'regression': bool(ratio > threshold)})
+    return pd.DataFrame(rows, columns=['stage', 'tokens', 'previous', 'latest', 'previous_s', 'latest_s', 'ratio',
+                                       'previous_mb', 'latest_mb', 'regression'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile the pipeline stages on synthetic corpora")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000], help="tokens per category, e.g. 1000 100000")
+    parser.add_argument('--stages', nargs='*', default=None, help="stage names or prefixes (default: all)")
+    parser.add_argument('--root', default=SYNTH_ROOT)
+    parser.add_argument('--out', default=RESULTS_PATH)
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+    run_benchmarks(args.sizes, args.stages, args.root, args.out, args.repeats, args.workers)
@@ -0,0 +1,186 @@
+import argparse
+import ast
+import fnmatch
+import glob
+import hashlib
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cache import file_digest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FIGURE_DIR = 'pics'
+DRAFT_DIR = os.path.join('pics', 'draft')
+DRAFT_DPI = 72
+STATE_FILE = '.figures.json'
+
+# output name -> plotting target, the data it reads and the keyword arguments
+# it is called with; the script modules it is drawn with are found from the
+# target's imports (script_modules). The R county map (map2.R) needs GADM
+# shapefiles that are not in the repository and is not built here
+FIGURES = {
+    'plosives_vot.png': {
+        'target': 'vot:plot_figure',
+        'inputs': ['data/vot/**/*.TextGrid'],
+        'params': {'kind': 'plosives'},
+    },
+    'affricates_vot.png': {
+        'target': 'vot:plot_figure',
+        'inputs': ['data/vot/**/*.TextGrid'],
+        'params': {'kind': 'affricates'},
+    },
+    'vowel_space.png': {
+        'target': 'monothong:plot_figure',
+        'inputs': ['data/vowels/monothongs/summary.tsv'],
+        'params': {'normalization': 'hz'},
+    },
+    'tones.png': {
+        'target': 'tones:plot_tones',
+        'inputs': ['data/vowels/tones/mean_f0_results.tsv'],
+        'params': {},
+    },
+    'fricatives.png': {
+        'target': 'fricative:plot_fricative_spectra',
+        'inputs': ['data/fricatives/spectral_envolope.tsv'],
+        'params': {},
+    },
+    'fricative_cog_by_poa.png': {
+        'target': 'fricative_cog:plot_figure',
+        'inputs': ['data/fricatives/summary.tsv', 'data/fricatives/spectral_envolope.tsv'],
+        'params': {},
+    },
+    'diphthongs.png': {
+        'target': 'dipthong_and_vowel_cluster:plot_diphthongs',
+        'inputs': ['data/vowels/dipthongs/summary.tsv'],
+        'params': {},
+    },
+}
+
+
+def _imports(module):
+    # the script/ modules imported anywhere in module, function-level
+    # (lazy) imports included
+    with open(os.path.join(SCRIPT_DIR, f'{module}.py'), 'r', encoding='utf-8') as file:
+        tree = ast.parse(file.read())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split('.')[0])
+    return {name for name in names if os.path.exists(os.path.join(SCRIPT_DIR, f'{name}.py'))}
+
+
+def script_modules(target):
+    # the target's module and everything in script/ it imports, transitively
+    found = set()
+    stack = [target.split(':')[0]]
+    while stack:
+        module = stack.pop()
+        if module not in found:
+            found.add(module)
+            stack.extend(_imports(module) - found)
+    return sorted(found)
+
+
+def input_matches(path, pattern):
+    # fnmatch's '*' already crosses '/', so a recursive glob's '**/' is dropped
+    return fnmatch.fnmatch(path, pattern.replace('/**/', '/'))
+
+
+def figure_key(spec, dpi):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps({'target': spec['target'], 'params': spec['params'], 'dpi': dpi},
+                             sort_keys=True).encode('utf-8'))
+    paths = sorted({path for pattern in spec['inputs'] for path in glob.glob(pattern, recursive=True)})
+    paths += [os.path.join(SCRIPT_DIR, f'{module}.py') for module in script_modules(spec['target'])]
+    for path in paths:
+        digest.update(path.encode('utf-8'))
+        digest.update(file_digest(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_state(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _init_worker():
+    # headless: no figure window may block a build worker
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_figure(name, spec, save_path, dpi):
+    module_name, func_name = spec['target'].split(':')
+    func = getattr(importlib.import_module(module_name), func_name)
+    start = time.perf_counter()
+    func(save_path=save_path, dpi=dpi, show=False, **spec['params'])
+    return name, time.perf_counter() - start
+
+
+def build_figures(names=None, draft=False, force=False, workers=None):
+    out_dir = DRAFT_DIR if draft else FIGURE_DIR
+    dpi = DRAFT_DPI if draft else 300
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, STATE_FILE)
+    state = load_state(state_path)
+    names = list(FIGURES) if not names else names
+    unknown = [name for name in names if name not in FIGURES]
+    if unknown:
+        raise KeyError(f"Unknown figure(s): {unknown} (choose from {list(FIGURES)})")
+
+    pending = {}
+    for name in names:
+        key = figure_key(FIGURES[name], dpi)
+        save_path = os.path.join(out_dir, name)
+        if not force and state.get(name) == key and os.path.exists(save_path):
+            print(f"{name}: up to date")
+            continue
+        pending[name] = (key, save_path)
+    if not pending:
+        return state, []
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(render_figure, name, FIGURES[name], save_path, dpi): name
+            for name, (key, save_path) in pending.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                _, elapsed = future.result()
+            except Exception as error:
+                print(f"{name}: failed ({error!r})")
+                failed.append(name)
+                continue
+            state[name] = pending[name][0]
+            save_state(state_path, state)
+            print(f"{name}: built in {elapsed:.1f}s -> {pending[name][1]}")
+    return state, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the figures in pics/ whose inputs changed")
+    parser.add_argument('figures', nargs='*', help="figure file names (default: all)")
+    parser.add_argument('--draft', action='store_true', help=f"low-resolution ({DRAFT_DPI} dpi) build into {DRAFT_DIR}/")
+    parser.add_argument('--force', action='store_true', help="rebuild even if nothing changed")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    _, failed = build_figures(args.figures, draft=args.draft, force=args.force, workers=args.workers)
+    if failed:
+        raise SystemExit(f"{len(failed)} figure(s) failed: {', '.join(sorted(failed))}")
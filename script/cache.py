@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_entry(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': file_digest(path)}
+
+
+def relative_key(path, root):
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+class FileManifest:
+    def __init__(self, manifest_path, root, params=None):
+        self.manifest_path = manifest_path
+        self.root = root
+        self.params = params or {}
+        self.entries = {}
+        # the files built from entries, as they were when last saved
+        self.outputs = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                stored = json.load(file)
+            # results built with other settings (e.g. another tier) are not reusable
+            if stored.get('params') == self.params:
+                self.entries = stored.get('files', {})
+                self.outputs = stored.get('outputs', {})
+
+    def compare(self, paths):
+        current = {}
+        changed = []
+        for path in paths:
+            key = relative_key(path, self.root)
+            stat = os.stat(path)
+            entry = self.entries.get(key)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                current[key] = entry
+                continue
+            # size/mtime moved: only the content hash decides whether to reparse
+            digest = file_digest(path)
+            current[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+            if entry is None or entry['hash'] != digest:
+                changed.append(path)
+        deleted = sorted(set(self.entries) - set(current))
+        return current, changed, deleted
+
+    def output_matches(self, path):
+        # a checkout, pull or stash can swap an output for another version
+        # without touching its inputs; only the one saved here is reusable
+        entry = self.outputs.get(relative_key(path, self.root))
+        if entry is None or not os.path.exists(path):
+            return False
+        stat = os.stat(path)
+        if entry['size'] != stat.st_size:
+            return False
+        return entry['mtime_ns'] == stat.st_mtime_ns or entry['hash'] == file_digest(path)
+
+    def _output_entry(self, path):
+        # an output saved again untouched is not rehashed
+        entry = self.outputs.get(relative_key(path, self.root))
+        stat = os.stat(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry
+        return file_entry(path)
+
+    def save(self, entries, outputs=()):
+        self.entries = entries
+        self.outputs = {relative_key(path, self.root): self._output_entry(path) for path in outputs}
+        tmp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'params': self.params, 'files': entries, 'outputs': self.outputs},
+                      file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
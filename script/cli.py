@@ -0,0 +1,567 @@
+import argparse
+import os
+import sys
+
+# subcommands import their modules when they run, so stats-only commands never
+# pay for matplotlib/seaborn and `--help` needs neither pandas nor numpy
+
+# resampling.N_RESAMPLES, repeated here since importing resampling imports
+# numpy and pandas; change both together
+N_RESAMPLES = 10000
+
+
+def _write_table(df, out):
+    if out is None:
+        print(df.to_string(index=False))
+    else:
+        df.to_csv(out, index=False, encoding='utf-8')
+        print(f"Statistics saved to: {out}")
+
+
+def vot_stats(args):
+    if args.shards:
+        from vot import corpus_statistics
+        _write_table(corpus_statistics(args.directory, tier_name=args.tier, by_speaker=args.by_speaker,
+                                       workers=args.workers, measure=args.measure), args.out)
+        return
+    from vot import TextGridProcessor
+    processor = TextGridProcessor(args.directory, tier_name=args.tier, workers=args.workers, measure=args.measure)
+    if args.contrasts:
+        _write_table(processor.contrasts(confidence=args.confidence, n_resamples=args.resamples, seed=args.seed),
+                     args.out)
+    else:
+        _write_table(processor.calculate_statistics(args.ci, n_resamples=args.resamples, seed=args.seed), args.out)
+
+
+def vot_plot(args):
+    from vot import TextGridProcessor
+    processor = TextGridProcessor(args.directory, tier_name=args.tier, workers=args.workers, measure=args.measure)
+    # --out names the single figure; 'all' always writes both default files
+    out = args.out if args.kind != 'all' else None
+    error = {'error': args.error, 'confidence': args.confidence, 'n_resamples': args.resamples, 'seed': args.seed}
+    if args.kind in ('plosives', 'all'):
+        processor.plot_vot_bar(save_path=out or 'pics/plosives_vot.png', dpi=args.dpi, show=args.show, **error)
+    if args.kind in ('affricates', 'all'):
+        processor.plot_affricates_bar(save_path=out or 'pics/affricates_vot.png', dpi=args.dpi, show=args.show,
+                                      **error)
+
+
+def vot_measure(args):
+    from vot import TextGridProcessor
+    processor = TextGridProcessor(args.directory, tier_name=args.tier, workers=args.workers, measure='auto',
+                                  tolerance=args.tolerance)
+    if args.annotate is not None:
+        processor.write_tiers(args.annotate)
+    flagged = processor.flagged()
+    print(f"{len(flagged)} of {len(processor.df)} token(s) flagged for checking")
+    _write_table(flagged[['path', 'xmin', 'xmax', 'text', 'vot', 'flag']], args.out)
+
+
+def vowels_stats(args):
+    if os.path.isdir(args.source):
+        from monothong import vowel_corpus_stats
+        _write_table(vowel_corpus_stats(args.source, normalization=args.normalization, by_speaker=args.by_speaker,
+                                        workers=args.workers), args.out)
+        return
+    from monothong import VowelSpacePlotter
+    plotter = VowelSpacePlotter(args.source, normalization=args.normalization,
+                                speaker_column=args.speaker_column)
+    stats, _ = plotter.transform_by_label()
+    if args.out is not None:
+        _write_table(stats, args.out)
+
+
+def vowels_plot(args):
+    from monothong import VowelSpacePlotter
+    plotter = VowelSpacePlotter(args.source, normalization=args.normalization,
+                                speaker_column=args.speaker_column, workers=args.workers)
+    plotter.plot_vowel_space(save_path=args.out or 'pics/vowel_space.png', dpi=args.dpi, show=args.show,
+                             confidence=args.confidence)
+
+
+def vowels_track(args):
+    from formants import track_formants, write_formant_table
+    df = track_formants(args.directory, tier_name=args.tier, n_points=args.points, ceilings=args.ceilings,
+                        window_length=args.window_length, workers=args.workers)
+    write_formant_table(df, args.out)
+
+
+def diphthongs_plot(args):
+    from dipthong_and_vowel_cluster import plot_diphthongs
+    plot_diphthongs(save_path=args.out or 'pics/diphthongs.png', source=args.source,
+                    dpi=args.dpi, show=args.show)
+
+
+def tones_plot(args):
+    from tones import plot_tones
+    plot_tones(save_path=args.out or 'pics/tones.png', source=args.source, normalization=args.normalization,
+               speaker_column=args.speaker_column, n_points=args.points, dpi=args.dpi, show=args.show,
+               workers=args.workers)
+
+
+def tones_features(args):
+    from contours import load_tone_contours
+    # speaker shards are normalized per shard (Speaker and Session) unless another column is given
+    speaker_column = args.speaker_column or (['Speaker', 'Session'] if os.path.isdir(args.source) else None)
+    contours = load_tone_contours(args.source, workers=args.workers).normalize(args.normalization, by=speaker_column)
+    _write_table(contours.features(n_points=args.points, n_dct=args.dct), args.out)
+
+
+def tones_track(args):
+    from pitch import track_pitch, write_pitch_table
+    settings = {'floor': args.floor, 'ceiling': args.ceiling, 'time_step': args.time_step}
+    df = track_pitch(args.directory, tier_name=args.tier, n_points=args.points, workers=args.workers,
+                     settings=settings)
+    write_pitch_table(df, args.out)
+
+
+def fricatives_spectra(args):
+    from fricative import plot_fricative_spectra
+    plot_fricative_spectra(save_path=args.out or 'pics/fricatives.png', source=args.source,
+                           dpi=args.dpi, show=args.show)
+
+
+def fricatives_cog(args):
+    import fricative_cog
+    if args.by_speaker and args.plot is not None:
+        raise SystemExit("--plot draws the pooled places of articulation; leave out --by-speaker")
+    if args.shards is not None:
+        # the tables merge per-speaker partials; token rows only when something needs them
+        cog_by_poa, label_stats = fricative_cog.summarize_cog_shards(
+            args.shards, args.moments, fricative_cog.moment_settings, by_speaker=args.by_speaker,
+            workers=args.workers)
+        fricative_df = None
+        if args.contrasts or args.xlsx is not None or args.plot is not None:
+            fricative_df = fricative_cog.load_fricative_shards(args.shards, args.moments,
+                                                               fricative_cog.moment_settings, workers=args.workers)
+    else:
+        fricative_df = fricative_cog.build_fricative_table(
+            fricative_cog.load_moments(args.moments, fricative_cog.moment_settings))
+        cog_by_poa, label_stats = fricative_cog.summarize_cog(fricative_df)
+    contrasts = None
+    if args.contrasts:
+        contrasts = fricative_cog.cog_contrasts(fricative_df, confidence=args.confidence, n_resamples=args.resamples,
+                                                seed=args.seed)
+        print(contrasts.to_string(index=False))
+    if args.xlsx is not None:
+        fricative_cog.write_cog_workbook(args.xlsx, cog_by_poa, fricative_df, label_stats, contrasts,
+                                         args.format)
+    _write_table(cog_by_poa, args.out)
+    if args.plot is not None:
+        fricative_cog.plot_cog_by_poa(fricative_df, cog_by_poa, save_path=args.plot, dpi=args.dpi, show=args.show,
+                                      error=args.error, confidence=args.confidence, n_resamples=args.resamples,
+                                      seed=args.seed)
+
+
+def fricatives_envelopes(args):
+    from envelope import extract_spectral_cube, write_envelope_table
+    cube = extract_spectral_cube(args.directory, tier_name=args.tier, n_fft=args.n_fft, window=args.window,
+                                 n_tapers=args.tapers, workers=args.workers)
+    if args.cube is not None:
+        cube.save(args.cube)
+        print(f"Saved {len(cube)} envelopes to: {args.cube}")
+    if args.out is not None or args.cube is None:
+        write_envelope_table(cube, args.out or 'data/fricatives/spectral_envolope.tsv')
+
+
+def sonorants_stats(args):
+    from sonorants import (load_sonorant_shards, load_sonorants, sonorant_contrasts, sonorant_shard_stats,
+                           sonorant_stats, write_sonorant_workbook)
+    if args.shards:
+        by_poa, by_ipa = sonorant_shard_stats(args.source, tier_name=args.tier, by_speaker=args.by_speaker,
+                                              workers=args.workers)
+    else:
+        df_clean = load_sonorants(args.source, tier_name=args.tier, workers=args.workers)
+        by_poa, by_ipa = sonorant_stats(df_clean)
+    contrasts = None
+    if args.contrasts:
+        if args.shards:
+            df_clean = load_sonorant_shards(args.source, tier_name=args.tier, workers=args.workers)
+        contrasts = sonorant_contrasts(df_clean, confidence=args.confidence, n_resamples=args.resamples,
+                                       seed=args.seed)
+    if args.xlsx is not None:
+        write_sonorant_workbook(args.xlsx, by_poa, by_ipa, contrasts, args.format)
+    else:
+        print(by_poa.to_string())
+        print(by_ipa.to_string())
+        if contrasts is not None:
+            print(contrasts.to_string(index=False))
+
+
+def labels_build(args):
+    from labelindex import build_label_index
+    print(build_label_index(args.root, args.index, workers=args.workers))
+
+
+def labels_find(args):
+    from labelindex import LabelIndex
+    with LabelIndex(args.index, args.root) as index:
+        _write_table(index.find(label=args.label, dataset=args.dataset, tier=args.tier, word=args.word,
+                                start=args.start, end=args.end), args.out)
+
+
+def labels_sql(args):
+    from labelindex import LabelIndex
+    with LabelIndex(args.index, args.root) as index:
+        _write_table(index.sql(args.query), args.out)
+
+
+def labels_align(args):
+    others = {}
+    for item in args.join:
+        spec, _, relation = item.rpartition('=')
+        if not spec:
+            raise SystemExit(f"--join takes SPEC=RELATION, got {item!r}")
+        others[spec] = relation
+    if args.directory is not None:
+        from tierjoin import align_directory
+        table = align_directory(args.directory, args.anchor, others, workers=args.workers)
+    else:
+        from labelindex import LabelIndex
+        from tierjoin import align_corpus
+        with LabelIndex(args.index, args.root) as index:
+            table = align_corpus(args.anchor, others, index=index, by=args.by)
+    _write_table(table, args.out)
+
+
+def figures_build(args):
+    from build_figures import build_figures
+    _, failed = build_figures(args.figures, draft=args.draft, force=args.force, workers=args.workers)
+    if failed:
+        raise SystemExit(f"{len(failed)} figure(s) failed: {', '.join(sorted(failed))}")
+
+
+def figures_watch(args):
+    from watch import CorpusWatcher
+    CorpusWatcher(args.root, draft=not args.final, figures=args.figures, workers=args.workers).watch(
+        args.debounce, args.poll)
+
+
+def tables_convert(args):
+    from store import TABLE_SPECS, convert_table
+    for source in args.sources or TABLE_SPECS:
+        if os.path.exists(source):
+            try:
+                convert_table(source)
+            except ImportError as error:
+                raise SystemExit(str(error))
+
+
+def synth_generate(args):
+    from synth import CATEGORIES, generate_corpus
+    generate_corpus(args.root, args.tokens, args.tokens_per_file, args.frame_tokens, args.categories or CATEGORIES,
+                    args.seed, args.workers)
+
+
+def bench_run(args):
+    from bench import run_benchmarks
+    run_benchmarks(args.sizes, args.stages, args.root, args.results, args.repeats, args.workers, args.dpi,
+                   args.frame_tokens)
+
+
+def bench_compare(args):
+    from bench import compare_results
+    _write_table(compare_results(args.results, args.threshold), args.out)
+
+
+def trace_summary(args):
+    from instrument import load_trace, print_summary
+    print_summary(load_trace(args.trace_file), args.top)
+
+
+def _plot_options(parser, dpi=300):
+    parser.add_argument('--out', default=None, help="image path (default: the figure's file in pics/)")
+    parser.add_argument('--dpi', type=int, default=dpi)
+    parser.add_argument('--show', action='store_true', help="open the figure window after saving")
+
+
+def _resampling_options(parser):
+    parser.add_argument('--confidence', type=float, default=0.95, help="bootstrap CI level")
+    parser.add_argument('--resamples', type=int, default=N_RESAMPLES, help="bootstrap resamples / permutations")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def _export_options(parser):
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'tsv', 'parquet'], default=None,
+                        help="format of the --xlsx bundle (default: from its extension); csv, tsv and parquet "
+                             "write a directory with one file per sheet")
+
+
+def _speaker_options(parser):
+    parser.add_argument('--by-speaker', action='store_true', help="sharded corpus: one block of rows per speaker")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="Phonetic measurement summaries and figures")
+    parser.add_argument('--trace', default=None, metavar='PATH',
+                        help="record stage and per-file timings to a Chrome trace (JSON)")
+    parser.add_argument('--trace-memory', action='store_true', help="add tracemalloc peaks to the trace (slower)")
+    groups = parser.add_subparsers(dest='group', metavar='{vot,vowels,diphthongs,tones,fricatives,sonorants,labels,figures,tables,synth,bench,trace}')
+    groups.required = True
+
+    vot = groups.add_parser('vot', help="VOT tiers of the TextGrids").add_subparsers(dest='command')
+    vot.required = True
+    for name, func in [('stats', vot_stats), ('plot', vot_plot)]:
+        sub = vot.add_parser(name)
+        sub.add_argument('--directory', default='./data/vot/')
+        sub.add_argument('--tier', default='vot')
+        sub.add_argument('--workers', type=int, default=None)
+        sub.add_argument('--measure', choices=['manual', 'auto'], default='manual',
+                         help="VOT typed into the tier labels, or measured from the WAVs")
+        _resampling_options(sub)
+        if name == 'stats':
+            sub.add_argument('--shards', action='store_true',
+                             help="--directory holds one directory per speaker (or speaker/session)")
+            _speaker_options(sub)
+            sub.add_argument('--out', default=None, help="CSV path (default: print)")
+            sub.add_argument('--ci', type=float, default=None, metavar='LEVEL',
+                             help="add bootstrap CI columns at this level (e.g. 0.95)")
+            sub.add_argument('--contrasts', action='store_true',
+                             help="unaspirated vs aspirated: bootstrap CI of the difference, permutation p")
+        else:
+            sub.add_argument('--kind', choices=['plosives', 'affricates', 'all'], default='all')
+            sub.add_argument('--error', choices=['sd', 'ci'], default='sd', help="error bars: +-SD or bootstrap CI")
+            _plot_options(sub)
+        sub.set_defaults(func=func)
+    sub = vot.add_parser('measure', help="measure VOT from the WAVs (burst and voicing onset)")
+    sub.add_argument('--directory', default='./data/vot/', help="TextGrids with same-named WAVs")
+    sub.add_argument('--tier', default='vot', help="tier with the stop/affricate intervals")
+    sub.add_argument('--tolerance', type=float, default=10.0,
+                     help="flag tokens whose typed VOT differs by more than this (ms)")
+    sub.add_argument('--annotate', default=None, metavar='DIR',
+                     help="write the TextGrids with 'vot-auto' and 'vot-check' tiers here")
+    sub.add_argument('--workers', type=int, default=None)
+    sub.add_argument('--out', default=None, help="CSV path for the flagged tokens (default: print)")
+    sub.set_defaults(func=vot_measure)
+
+    vowels = groups.add_parser('vowels', help="monophthong formants").add_subparsers(dest='command')
+    vowels.required = True
+    for name, func in [('stats', vowels_stats), ('plot', vowels_plot)]:
+        sub = vowels.add_parser(name)
+        sub.add_argument('--source', default='data/vowels/monothongs/summary.tsv',
+                         help="summary table, or a directory of speaker shards with a summary.tsv each")
+        sub.add_argument('--normalization', default='hz', choices=['hz', 'lobanov', 'nearey', 'bark', 'erb'])
+        sub.add_argument('--speaker-column', default=None)
+        sub.add_argument('--workers', type=int, default=None)
+        if name == 'stats':
+            _speaker_options(sub)
+            sub.add_argument('--out', default=None, help="CSV path (default: print only)")
+        else:
+            _plot_options(sub)
+            sub.add_argument('--confidence', type=float, nargs='+', default=None, metavar='LEVEL',
+                             help="ellipses holding these shares of the tokens, e.g. 0.5 0.95 "
+                                  "(default: 1 and 2 SD)")
+        sub.set_defaults(func=func)
+
+    sub = vowels.add_parser('track', help="LPC formant tracks of the vowel intervals from the WAVs")
+    sub.add_argument('--directory', default='data/vowels/monothongs', help="WAVs with same-named TextGrids")
+    sub.add_argument('--tier', default='vowel')
+    sub.add_argument('--points', type=int, default=12, help="timepoints per vowel, 0%% to 100%%")
+    sub.add_argument('--ceilings', type=float, nargs='+', default=[5500],
+                     help="formant ceilings (Hz); with several, each token keeps the smoothest")
+    sub.add_argument('--window-length', type=float, default=0.025)
+    sub.add_argument('--workers', type=int, default=None)
+    # required: the default directory's summary.tsv is the hand-verified Praat export
+    sub.add_argument('--out', required=True, help="summary table to write (TSV)")
+    sub.set_defaults(func=vowels_track)
+
+    diphthongs = groups.add_parser('diphthongs', help="diphthong trajectories").add_subparsers(dest='command')
+    diphthongs.required = True
+    sub = diphthongs.add_parser('plot')
+    sub.add_argument('--source', default='data/vowels/dipthongs/summary.tsv')
+    _plot_options(sub)
+    sub.set_defaults(func=diphthongs_plot)
+
+    tones = groups.add_parser('tones', help="F0 contours").add_subparsers(dest='command')
+    tones.required = True
+    for name, func in [('plot', tones_plot), ('features', tones_features)]:
+        sub = tones.add_parser(name)
+        sub.add_argument('--source', default='data/vowels/tones/mean_f0_results.tsv',
+                         help="contour table, or a directory of speaker shards with a mean_f0_results.tsv each")
+        sub.add_argument('--normalization', default='hz', choices=['hz', 'semitones', 'z'])
+        sub.add_argument('--speaker-column', default=None)
+        sub.add_argument('--workers', type=int, default=None)
+        sub.add_argument('--points', type=int, default=None, help="resample contours to this many points")
+        if name == 'plot':
+            _plot_options(sub)
+        else:
+            sub.add_argument('--dct', type=int, default=4, help="number of DCT coefficients")
+            sub.add_argument('--out', default=None, help="CSV path (default: print)")
+        sub.set_defaults(func=func)
+
+    sub = tones.add_parser('track', help="F0 contours of the tone intervals from the WAVs")
+    sub.add_argument('--directory', default='data/vowels/tones', help="WAVs with same-named TextGrids")
+    sub.add_argument('--tier', default='vowel')
+    sub.add_argument('--points', type=int, default=20, help="F0_<n> points per interval")
+    sub.add_argument('--floor', type=float, default=75.0)
+    sub.add_argument('--ceiling', type=float, default=500.0)
+    sub.add_argument('--time-step', type=float, default=0.01)
+    sub.add_argument('--workers', type=int, default=None)
+    # required: the default directory's mean_f0_results.tsv is the tracked Praat export
+    sub.add_argument('--out', required=True, help="contour table to write (TSV)")
+    sub.set_defaults(func=tones_track)
+
+    fricatives = groups.add_parser('fricatives', help="fricative spectra and moments").add_subparsers(dest='command')
+    fricatives.required = True
+    sub = fricatives.add_parser('spectra')
+    sub.add_argument('--source', default='data/fricatives/spectral_envolope.tsv')
+    _plot_options(sub)
+    sub.set_defaults(func=fricatives_spectra)
+    sub = fricatives.add_parser('cog')
+    sub.add_argument('--moments', choices=['praat', 'envelope'], default='praat')
+    sub.add_argument('--shards', default=None, metavar='ROOT',
+                     help="merge the moments of every speaker directory under ROOT instead of data/fricatives")
+    _speaker_options(sub)
+    sub.add_argument('--workers', type=int, default=None)
+    sub.add_argument('--out', default=None, help="CSV path for the COG by POA table (default: print)")
+    sub.add_argument('--xlsx', default=None, help="also write the full workbook")
+    _export_options(sub)
+    sub.add_argument('--plot', default=None, help="also draw the COG figure to this path")
+    sub.add_argument('--error', choices=['sd', 'ci'], default='sd', help="error bars: +-SD or bootstrap CI")
+    sub.add_argument('--contrasts', action='store_true',
+                     help="every pair of places: bootstrap CI of the difference, permutation p")
+    _resampling_options(sub)
+    sub.add_argument('--dpi', type=int, default=300)
+    sub.add_argument('--show', action='store_true')
+    sub.set_defaults(func=fricatives_cog)
+    sub = fricatives.add_parser('envelopes', help="FFT envelopes of the fricative intervals from the WAVs")
+    sub.add_argument('--directory', default='data/fricatives', help="WAVs with same-named TextGrids")
+    sub.add_argument('--tier', default='fricative')
+    sub.add_argument('--window', choices=['hann', 'multitaper'], default='hann')
+    sub.add_argument('--tapers', type=int, default=4, help="sine tapers for --window multitaper")
+    sub.add_argument('--n-fft', type=int, default=1024)
+    sub.add_argument('--workers', type=int, default=None)
+    sub.add_argument('--out', default=None, help="envelope table (default: data/fricatives/spectral_envolope.tsv)")
+    sub.add_argument('--cube', default=None, help="write a dense .npz cube instead of / besides the table")
+    sub.set_defaults(func=fricatives_envelopes)
+
+    sonorants = groups.add_parser('sonorants', help="sonorant voice quality").add_subparsers(dest='command')
+    sonorants.required = True
+    sub = sonorants.add_parser('stats')
+    sub.add_argument('--source', default='data/sonorants',
+                     help="directory of VoiceSauce .mat files + TextGrids, or a VoiceSauce text export")
+    sub.add_argument('--tier', default='sonorant')
+    sub.add_argument('--workers', type=int, default=None)
+    sub.add_argument('--shards', action='store_true',
+                     help="--source holds one directory of .mat files per speaker (or speaker/session)")
+    _speaker_options(sub)
+    sub.add_argument('--xlsx', default=None, help="workbook path (default: print)")
+    _export_options(sub)
+    sub.add_argument('--contrasts', action='store_true',
+                     help="glottalized vs plain: bootstrap CI of the difference, permutation p")
+    _resampling_options(sub)
+    sub.set_defaults(func=sonorants_stats)
+
+    labels = groups.add_parser('labels', help="corpus-wide index of the TextGrid labels").add_subparsers(dest='command')
+    labels.required = True
+    for name, func in [('build', labels_build), ('find', labels_find), ('sql', labels_sql)]:
+        sub = labels.add_parser(name)
+        sub.add_argument('--root', default='data', help="corpus root; datasets are its subdirectories")
+        sub.add_argument('--index', default='data/label_index.sqlite')
+        if name == 'build':
+            sub.add_argument('--workers', type=int, default=None)
+        elif name == 'find':
+            sub.add_argument('--label', nargs='+', default=None, help="first word of the interval text")
+            sub.add_argument('--dataset', nargs='+', default=None, help="e.g. vot, vowels/tones")
+            sub.add_argument('--tier', nargs='+', default=None)
+            sub.add_argument('--word', nargs='+', default=None, help="file stem, e.g. 36_clever")
+            sub.add_argument('--start', type=float, default=None)
+            sub.add_argument('--end', type=float, default=None)
+        else:
+            sub.add_argument('query', help="SQL over the files and intervals tables")
+        if name != 'build':
+            sub.add_argument('--out', default=None, help="CSV path (default: print)")
+        sub.set_defaults(func=func)
+    sub = labels.add_parser('align', help="relate the intervals of other tiers to an anchor tier")
+    sub.add_argument('anchor', help="tier name, or dataset:tier across the corpus (e.g. vowels/tones:vowel)")
+    sub.add_argument('join', nargs='+', metavar='SPEC=RELATION',
+                     help="e.g. sonorants:sonorant=preceding; relations: overlap, contains, within, "
+                          "preceding, following")
+    sub.add_argument('--directory', default=None,
+                     help="align tiers within each TextGrid of this directory instead of across datasets")
+    sub.add_argument('--by', default='word', help="column that pairs TextGrids across datasets")
+    sub.add_argument('--root', default='data')
+    sub.add_argument('--index', default='data/label_index.sqlite')
+    sub.add_argument('--workers', type=int, default=None)
+    sub.add_argument('--out', default=None, help="CSV path (default: print)")
+    sub.set_defaults(func=labels_align)
+
+    figures = groups.add_parser('figures', help="rebuild pics/").add_subparsers(dest='command')
+    figures.required = True
+    sub = figures.add_parser('build')
+    sub.add_argument('figures', nargs='*')
+    sub.add_argument('--draft', action='store_true')
+    sub.add_argument('--force', action='store_true')
+    sub.add_argument('--workers', type=int, default=None)
+    sub.set_defaults(func=figures_build)
+    sub = figures.add_parser('watch', help="recompute statistics and redraw figures as data/ files are saved")
+    sub.add_argument('figures', nargs='*', help="figure file names to keep up to date (default: all)")
+    sub.add_argument('--root', default='data')
+    sub.add_argument('--final', action='store_true', help="redraw pics/ at 300 dpi instead of pics/draft/")
+    sub.add_argument('--debounce', type=float, default=0.3, help="seconds of quiet before recomputing")
+    sub.add_argument('--poll', action='store_true', help="poll file stats even if watchdog is installed")
+    sub.add_argument('--workers', type=int, default=None)
+    sub.set_defaults(func=figures_watch)
+
+    tables = groups.add_parser('tables', help="columnar copies of the exports").add_subparsers(dest='command')
+    tables.required = True
+    sub = tables.add_parser('convert')
+    sub.add_argument('sources', nargs='*')
+    sub.set_defaults(func=tables_convert)
+
+    synth = groups.add_parser('synth', help="synthetic corpora for benchmarking").add_subparsers(dest='command')
+    synth.required = True
+    sub = synth.add_parser('generate')
+    sub.add_argument('--root', default='synth')
+    sub.add_argument('--tokens', type=int, default=1000, help="labelled intervals per category (1e3 to 1e6)")
+    sub.add_argument('--tokens-per-file', type=int, default=10)
+    sub.add_argument('--frame-tokens', type=int, default=10000,
+                     help="tokens covered by the frame-level tables (spectral envelopes, VoiceSauce frames)")
+    sub.add_argument('--categories', nargs='+', default=None, help="e.g. vot vowels/tones (default: all)")
+    sub.add_argument('--seed', type=int, default=0)
+    sub.add_argument('--workers', type=int, default=None)
+    sub.set_defaults(func=synth_generate)
+
+    bench = groups.add_parser('bench', help="stage timings on synthetic corpora").add_subparsers(dest='command')
+    bench.required = True
+    sub = bench.add_parser('run')
+    sub.add_argument('--sizes', type=int, nargs='+', default=[1000], help="tokens per category, e.g. 1000 100000")
+    sub.add_argument('--stages', nargs='*', default=None, help="stage names or prefixes (default: all)")
+    sub.add_argument('--root', default='synth')
+    sub.add_argument('--results', default='bench_results.jsonl')
+    sub.add_argument('--repeats', type=int, default=3)
+    sub.add_argument('--workers', type=int, default=1)
+    sub.add_argument('--dpi', type=int, default=72)
+    sub.add_argument('--frame-tokens', type=int, default=10000)
+    sub.set_defaults(func=bench_run)
+    sub = bench.add_parser('compare', help="latest run of every stage against the run before it")
+    sub.add_argument('--results', default='bench_results.jsonl')
+    sub.add_argument('--threshold', type=float, default=1.2, help="slowdown ratio reported as a regression")
+    sub.add_argument('--out', default=None, help="CSV path (default: print)")
+    sub.set_defaults(func=bench_compare)
+
+    trace = groups.add_parser('trace', help="summaries of --trace files").add_subparsers(dest='command')
+    trace.required = True
+    sub = trace.add_parser('summary', help="stage totals and the slowest files")
+    sub.add_argument('trace_file')
+    sub.add_argument('--top', type=int, default=10, help="slowest files to list")
+    sub.set_defaults(func=trace_summary)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not getattr(args, 'show', False):
+        # saving only: no GUI backend discovery if matplotlib gets imported
+        os.environ.setdefault('MPLBACKEND', 'Agg')
+    if args.trace is not None:
+        import instrument
+        instrument.enable(args.trace, memory=args.trace_memory)
+        with instrument.span(f'{args.group} {args.command}', cat='command'):
+            args.func(args)
+    else:
+        args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+import os
+import re
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from groupstats import PartialStats
+from shards import SHARD_COLUMNS, cached_partial, find_shards, load_shards, map_shards, merge_shards, tag_shard
+from store import load_table
+
+TONE_SOURCE = 'data/vowels/tones/mean_f0_results.tsv'
+# the export inside each speaker shard of a sharded corpus
+TONE_FILE = 'mean_f0_results.tsv'
+# Praat pitch export columns -> the token columns shared with spectra.py
+TOKEN_RENAMES = {'Segment label': 'Label', 'Start (s)': 'Start', 'End (s)': 'End', 'Duration (s)': 'Duration'}
+UNITS = {'hz': 'Hz', 'semitones': 'st', 'z': 'z (log F0)'}
+
+
+def f0_columns(df, prefix='F0_'):
+    pattern = re.compile(re.escape(prefix) + r'(\d+)$')
+    numbered = [(int(m.group(1)), col) for col in df.columns for m in [pattern.match(str(col))] if m]
+    return [col for _, col in sorted(numbered)]
+
+
+def _valid_neighbours(valid):
+    # for every point, the index of the nearest valid point at or before it
+    # (-1 if none) and at or after it (n_points if none)
+    n_points = valid.shape[1]
+    index = np.arange(n_points)
+    before = np.maximum.accumulate(np.where(valid, index, -1), axis=1)
+    after = np.minimum.accumulate(np.where(valid, index, n_points)[:, ::-1], axis=1)[:, ::-1]
+    return before, after
+
+
+def interpolate_rows(values, times, targets):
+    # row-wise linear interpolation that skips NaN points; targets outside a
+    # row's voiced span stay NaN instead of being extrapolated
+    values = np.asarray(values, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    n_tokens, n_points = values.shape
+    valid = ~np.isnan(values)
+    before, after = _valid_neighbours(valid)
+    right = np.clip(np.searchsorted(times, targets, side='left'), 0, n_points - 1)
+    left = np.clip(np.searchsorted(times, targets, side='right') - 1, 0, n_points - 1)
+    lo = before[:, left]
+    hi = after[:, right]
+    usable = (lo >= 0) & (hi < n_points)
+    lo_safe = np.where(usable, lo, 0)
+    hi_safe = np.where(usable, hi, 0)
+    rows = np.arange(n_tokens)[:, None]
+    t_lo, t_hi = times[lo_safe], times[hi_safe]
+    y_lo, y_hi = values[rows, lo_safe], values[rows, hi_safe]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(t_hi > t_lo, (targets - t_lo) / (t_hi - t_lo), 0.0)
+    return np.where(usable, y_lo + weight * (y_hi - y_lo), np.nan)
+
+
+def dct_basis(n_points, n_coefs):
+    # orthonormal DCT-II; coefficient 0 is sqrt(n) times the contour mean
+    k = np.arange(n_coefs)[None, :]
+    n = np.arange(n_points)[:, None]
+    basis = np.cos(np.pi * k * (n + 0.5) / n_points) * np.sqrt(2.0 / n_points)
+    basis[:, 0] /= np.sqrt(2.0)
+    return basis
+
+
+class ToneContours:
+    def __init__(self, tokens, times, f0, unit='hz'):
+        self.tokens = tokens.reset_index(drop=True)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.f0 = np.asarray(f0, dtype=np.float64)
+        self.unit = unit
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __repr__(self):
+        return f"ToneContours(tokens={len(self)}, points={len(self.times)}, unit={self.unit!r})"
+
+    @classmethod
+    def from_frame(cls, df, prefix='F0_'):
+        # one row per token with F0 sampled at equally spaced normalized times
+        columns = f0_columns(df, prefix)
+        if not columns:
+            raise ValueError(f"No {prefix}<n> columns in table")
+        tokens = df.drop(columns=columns).rename(columns=TOKEN_RENAMES)
+        f0 = df[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        return cls(tokens, np.linspace(0, 1, len(columns)), f0)
+
+    def select(self, mask):
+        mask = np.asarray(mask)
+        return ToneContours(self.tokens[mask], self.times, self.f0[mask], self.unit)
+
+    def resample(self, n_points):
+        times = np.linspace(self.times[0], self.times[-1], n_points)
+        return ToneContours(self.tokens, times, interpolate_rows(self.f0, self.times, times), self.unit)
+
+    def normalize(self, method='semitones', by=None, reference=None):
+        # 'semitones': 12 log2(F0 / reference); reference=None uses the geometric
+        # mean F0 of each 'by' group (e.g. a speaker column), by=None one group.
+        # 'z': log-F0 z-scores per group (Rose 1987)
+        if self.unit != 'hz':
+            raise ValueError(f"Contours are already normalized ({self.unit})")
+        if method == 'hz':
+            return self
+        if method not in UNITS:
+            raise ValueError(f"Unknown normalization: {method} (choose from {list(UNITS)})")
+        logs = np.log(np.where(self.f0 > 0, self.f0, np.nan))
+        if method == 'semitones' and reference is not None:
+            return ToneContours(self.tokens, self.times, 12 * (logs - np.log(reference)) / np.log(2), method)
+        if by is None:
+            codes = np.zeros(len(self), dtype=np.int64)
+        else:
+            codes = self.tokens.groupby(by, sort=True, observed=True).ngroup().to_numpy()
+        n_groups = codes.max() + 1 if len(codes) else 0
+        valid = ~np.isnan(logs)
+        filled = np.where(valid, logs, 0.0)
+        count = np.bincount(codes, valid.sum(axis=1), minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.bincount(codes, filled.sum(axis=1), minlength=n_groups) / count
+            centred = logs - mean[codes][:, None]
+            if method == 'semitones':
+                return ToneContours(self.tokens, self.times, 12 * centred / np.log(2), method)
+            ss = np.bincount(codes, (np.where(valid, centred, 0.0) ** 2).sum(axis=1), minlength=n_groups)
+            sd = np.sqrt(ss / (count - 1))
+            return ToneContours(self.tokens, self.times, centred / sd[codes][:, None], method)
+
+    def label_means(self, labels=None):
+        # per-label NaN-aware mean and (population) SD at every point
+        if len(self) == 0:
+            empty = np.empty((0, len(self.times)))
+            return [], empty, empty, np.empty(0, dtype=np.int64)
+        codes, uniques = pd.factorize(self.tokens['Label'].astype(str), sort=True)
+        order = np.argsort(codes, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+        f0 = self.f0[order]
+        valid = ~np.isnan(f0)
+        filled = np.where(valid, f0, 0.0)
+        counts = np.add.reduceat(valid, starts, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.add.reduceat(filled, starts, axis=0) / counts
+            squares = np.add.reduceat(filled ** 2, starts, axis=0) / counts
+            sds = np.sqrt(np.clip(squares - means ** 2, 0, None))
+        n_tokens = np.diff(np.r_[starts, len(codes)])
+        uniques = list(uniques)
+        if labels is not None:
+            pick = [uniques.index(label) if label in uniques else None for label in labels]
+            means = np.array([means[i] if i is not None else np.full(len(self.times), np.nan) for i in pick])
+            sds = np.array([sds[i] if i is not None else np.full(len(self.times), np.nan) for i in pick])
+            n_tokens = np.array([n_tokens[i] if i is not None else 0 for i in pick])
+            uniques = list(labels)
+        return uniques, means, sds, n_tokens
+
+    def label_table(self, labels=None):
+        # label_means as a long table, one row per label and time point
+        labels, means, sds, counts = self.label_means(labels)
+        n_points = len(self.times)
+        return pd.DataFrame({
+            'Label': np.repeat(np.array(labels, dtype=object), n_points),
+            'Time': np.tile(self.times, len(labels)),
+            'N': np.repeat(counts, n_points),
+            'Mean': means.ravel(),
+            'SD': sds.ravel(),
+        })
+
+    def partial_stats(self, by=('Label',)):
+        # mergeable per-point F0 stats of every `by` group; the 'tokens'
+        # column counts the contours themselves
+        columns = [f'F0_{i}' for i in range(1, len(self.times) + 1)]
+        frame = pd.DataFrame(self.f0, columns=columns)
+        frame['tokens'] = 1
+        frame = pd.concat([self.tokens[list(by)].reset_index(drop=True), frame], axis=1)
+        return PartialStats.from_frame(frame, list(by), columns + ['tokens'])
+
+    def features(self, n_points=None, n_dct=4):
+        # all per-token features in one batched pass; gaps are bridged by
+        # interpolation first, so only the unvoiced edges are ignored
+        contours = self.resample(n_points or len(self.times))
+        f0, times = contours.f0, contours.times
+        n_tokens, n_points = f0.shape
+        valid = ~np.isnan(f0)
+        voiced = valid.any(axis=1)
+        before, after = _valid_neighbours(valid)
+        first = np.where(voiced, after[:, 0], 0)
+        last = np.where(voiced, before[:, -1], 0)
+        rows = np.arange(n_tokens)
+        onset = np.where(voiced, f0[rows, first], np.nan)
+        offset = np.where(voiced, f0[rows, last], np.nan)
+
+        filled = np.where(valid, f0, 0.0)
+        n = valid.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = filled.sum(axis=1) / n
+            t_mean = (valid * times).sum(axis=1) / n
+            dt = np.where(valid, times - t_mean[:, None], 0.0)
+            slope = (dt * (filled - mean[:, None])).sum(axis=1) / (dt ** 2).sum(axis=1)
+            # turning point: the point farthest from the onset-offset chord
+            span = times[last] - times[first]
+            chord = onset[:, None] + (offset - onset)[:, None] * np.where(
+                span[:, None] > 0, (times - times[first][:, None]) / span[:, None], 0.0)
+        deviation = f0 - chord
+        tp = np.argmax(np.where(valid, np.abs(deviation), -1.0), axis=1)
+        table = pd.DataFrame({
+            'mean': mean,
+            'range': np.where(voiced, np.nanmax(np.where(valid, f0, -np.inf), axis=1)
+                              - np.nanmin(np.where(valid, f0, np.inf), axis=1), np.nan),
+            'onset': onset,
+            'offset': offset,
+            'slope': slope,
+            'tp_time': np.where(voiced, times[tp], np.nan),
+            'tp_value': np.where(voiced, f0[rows, tp], np.nan),
+            'tp_depth': np.where(voiced, deviation[rows, tp], np.nan),
+        })
+        if 'Duration' in contours.tokens:
+            # slope over normalized time -> per second
+            table['slope_per_s'] = table['slope'] / contours.tokens['Duration'].to_numpy(dtype=np.float64)
+        # DCT needs complete contours: tokens with unvoiced edges get NaN
+        coefs = f0 @ dct_basis(n_points, n_dct)
+        for k in range(n_dct):
+            table[f'dct{k}'] = coefs[:, k]
+        return pd.concat([contours.tokens, table], axis=1)
+
+
+def load_tone_contours(source=TONE_SOURCE, labels=None, workers=None):
+    # a directory is a sharded corpus: every speaker's export, with Speaker
+    # and Session token columns
+    if os.path.isdir(source):
+        return ToneContours.from_frame(load_shards(source, partial(load_table, labels=labels), TONE_FILE,
+                                                   workers=workers))
+    return ToneContours.from_frame(load_table(source, labels=labels))
+
+
+def partial_label_means(stats, labels=None):
+    # label_means from per-label partials: (labels, means, population SDs, tokens)
+    frame = stats.finalize(['mean', 'std', 'count'], ddof=0)
+    columns = [column for column in stats.columns if column != 'tokens']
+    keys = [str(key) for key in frame.index]
+    frame.index = keys
+    labels = keys if labels is None else list(labels)
+    frame = frame.reindex(labels)
+    means = frame.loc[:, [(column, 'mean') for column in columns]].to_numpy(np.float64)
+    sds = frame.loc[:, [(column, 'std') for column in columns]].to_numpy(np.float64)
+    n_tokens = frame[('tokens', 'count')].fillna(0).to_numpy(np.int64)
+    return labels, means, sds, n_tokens
+
+
+def tone_shard_partial(item, labels=None, normalization='hz', n_points=None, filename=TONE_FILE):
+    # a shard is one speaker (or one session of one): its contours are
+    # normalized on their own before the per-label partials are taken
+    shard_id, directory = item
+    source = os.path.join(directory, filename)
+
+    def build():
+        contours = ToneContours.from_frame(tag_shard(load_table(source, labels=labels), shard_id))
+        contours = contours.normalize(normalization)
+        if n_points is not None:
+            contours = contours.resample(n_points)
+        return contours.partial_stats(SHARD_COLUMNS + ['Label'])
+    params = {'labels': None if labels is None else list(labels), 'normalization': normalization,
+              'n_points': n_points}
+    return cached_partial(directory, f'tones-{normalization}', [source], params, build)
+
+
+def tone_corpus_partial(root, labels=None, normalization='hz', n_points=None, by_speaker=False, workers=None,
+                        filename=TONE_FILE):
+    # per-label contour partials over every speaker shard under root
+    shards = find_shards(root, filename)
+    if not shards:
+        raise ValueError(f"No speaker directories with {filename} under {root}")
+    partials = map_shards(partial(tone_shard_partial, labels=labels, normalization=normalization,
+                                  n_points=n_points, filename=filename), shards, workers)
+    return merge_shards(partials, 'Label', by_speaker)
@@ -0,0 +1,45 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import instrument
+
+# word files are named NN_word.TextGrid; words may contain '-' or '_'
+# (16_elder-brother, 47_dark_room_fog_dance)
+TEXTGRID_PATTERN = r'^\d+_[\w-]+\.TextGrid$'
+
+
+def scan_files(root, pattern=TEXTGRID_PATTERN, recursive=True, skip_hidden=True):
+    regex = re.compile(pattern, re.IGNORECASE)
+    found = []
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if skip_hidden and entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif regex.match(entry.name):
+                    found.append(entry.path)
+    # sorted so that every run (serial or parallel) merges files in the same order
+    return sorted(found)
+
+
+def parallel_map(func, items, workers=None, chunksize=None):
+    items = list(items)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+    if chunksize is None:
+        # about four chunks per worker: few round trips, but still balanced
+        chunksize = max(1, len(items) // (workers * 4))
+    traced = instrument.enabled()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Executor.map yields results in input order regardless of completion order
+        results = pool.map(instrument.wrap(func), items, chunksize=chunksize)
+        return instrument.collect(results) if traced else list(results)
@@ -0,0 +1,107 @@
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from audio import WAV_PATTERN, labelled_intervals, paired_textgrid, read_wav
+from corpus import parallel_map, scan_files
+from spectra import TOKEN_COLUMNS, SpectralCube
+
+WINDOWS = ('hann', 'multitaper')
+# dB re 20 µPa, treating samples as pascals like Praat does
+REFERENCE_POWER = 4e-10
+
+
+def taper_bank(lengths, n_fft, window='hann', n_tapers=4):
+    # (tapers x frames x n_fft) windows for frames of different lengths, zero
+    # beyond each frame's length; every taper has unit energy
+    lengths = np.asarray(lengths, dtype=np.float64)[:, None]
+    n = np.arange(n_fft, dtype=np.float64)[None, :]
+    inside = n < lengths
+    if window == 'hann':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tapers = np.where(lengths > 1, 0.5 - 0.5 * np.cos(2 * np.pi * n / (lengths - 1)), 1.0)[None]
+    elif window == 'multitaper':
+        # sine tapers (Riedel & Sidorenko 1995): orthonormal, closed form
+        k = np.arange(1, n_tapers + 1, dtype=np.float64)[:, None, None]
+        tapers = np.sin(np.pi * k * (n + 1) / (lengths + 1))
+    else:
+        raise ValueError(f"Unknown window: {window} (choose from {list(WINDOWS)})")
+    tapers = np.where(inside, tapers, 0.0)
+    energy = np.sqrt((tapers ** 2).sum(axis=-1, keepdims=True))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(energy > 0, tapers / energy, 0.0)
+
+
+def token_frames(first_samples, n_samples, n_fft, overlap=0.5):
+    # tokens up to n_fft samples are one zero-padded frame; longer ones are
+    # cut into n_fft frames whose spectra are averaged (Welch)
+    hop = max(int(n_fft * (1 - overlap)), 1)
+    counts = np.maximum((n_samples - n_fft) // hop + 1, 1)
+    tokens = np.repeat(np.arange(len(counts)), counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    starts = first_samples[tokens] + within * hop
+    lengths = np.minimum(n_samples[tokens], n_fft)
+    return tokens, starts, lengths
+
+
+def power_spectra(wav, starts, lengths, n_fft, window='hann', n_tapers=4):
+    # one-sided power spectral density of a batch of frames
+    index = starts[:, None] + np.arange(n_fft)[None, :]
+    index = np.where(np.arange(n_fft)[None, :] < lengths[:, None], index, -1)
+    samples = wav.gather(index)
+    tapers = taper_bank(lengths, n_fft, window, n_tapers)
+    spectra = np.fft.rfft(tapers * samples[None], n=n_fft, axis=-1)
+    power = (spectra.real ** 2 + spectra.imag ** 2).mean(axis=0)
+    power[:, 1:-1] *= 2
+    return power / wav.sample_rate
+
+
+def file_envelopes(wav_path, tier_name='fricative', labels=None, n_fft=1024, window='hann',
+                   n_tapers=4, overlap=0.5, batch_size=2048):
+    textgrid_path = paired_textgrid(wav_path)
+    filename = os.path.basename(wav_path)
+    intervals = labelled_intervals(textgrid_path, tier_name, labels) if textgrid_path else None
+    if intervals is None:
+        print(f"No '{tier_name}' intervals for {filename}, skipping")
+        return None
+    texts, starts, ends = intervals
+    wav = read_wav(wav_path)
+    frequencies = np.fft.rfftfreq(n_fft, 1 / wav.sample_rate)
+    first = np.round(starts * wav.sample_rate).astype(np.int64)
+    n_samples = np.maximum(np.round(ends * wav.sample_rate).astype(np.int64) - first, 1)
+    frame_tokens, frame_starts, frame_lengths = token_frames(first, n_samples, n_fft, overlap)
+    sums = np.zeros((len(texts), len(frequencies)))
+    # bounded memory: at most batch_size frames are windowed and transformed at once
+    for lo in range(0, len(frame_tokens), batch_size):
+        hi = min(lo + batch_size, len(frame_tokens))
+        power = power_spectra(wav, frame_starts[lo:hi], frame_lengths[lo:hi], n_fft, window, n_tapers)
+        np.add.at(sums, frame_tokens[lo:hi], power)
+    density = sums / np.bincount(frame_tokens, minlength=len(texts))[:, None]
+    amplitudes = 10 * np.log10(np.maximum(density, np.finfo(np.float64).tiny) / REFERENCE_POWER)
+    tokens = pd.DataFrame({
+        'Filename': filename,
+        'Label': texts.astype(str),
+        'Start': starts,
+        'End': ends,
+        'Duration': ends - starts,
+    }, columns=TOKEN_COLUMNS)
+    return SpectralCube(tokens, frequencies, amplitudes)
+
+
+def extract_spectral_cube(directory='data/fricatives', tier_name='fricative', labels=None, n_fft=1024,
+                          window='hann', n_tapers=4, overlap=0.5, pattern=WAV_PATTERN, workers=None):
+    wav_files = scan_files(directory, pattern)
+    cubes = parallel_map(partial(file_envelopes, tier_name=tier_name, labels=labels, n_fft=n_fft,
+                                 window=window, n_tapers=n_tapers, overlap=overlap),
+                         wav_files, workers=workers, chunksize=4)
+    cubes = [cube for cube in cubes if cube is not None and len(cube)]
+    if not cubes:
+        raise ValueError(f"No WAV files with '{tier_name}' intervals in {directory}")
+    return SpectralCube.concat(cubes)
+
+
+def write_envelope_table(cube, path):
+    cube.to_long().to_csv(path, sep='\t', index=False)
+    print(f"Saved {len(cube)} envelopes to: {path}")
@@ -0,0 +1,214 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from instrument import span
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'tsv', 'parquet')
+# rows converted (and, for parquet, written) at a time; bounds the export's own memory
+CHUNK_ROWS = 20000
+XLSX_MAX_ROWS = 1048576
+SHEET_NAME_LENGTH = 31
+# characters Excel does not allow in a sheet name (and / \ no file name either)
+_ILLEGAL_NAME = re.compile(r'[\[\]:*?/\\]')
+# characters XML 1.0 does not allow, even escaped
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def export_format(path, format=None):
+    # the format named, else the one the path's extension names
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip('.').lower()
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format!r} (choose from {list(EXPORT_FORMATS)})")
+    return format
+
+
+def bundle_directory(path):
+    # fricative_cog.xlsx (or fricative_cog) -> fricative_cog/ for csv, tsv and parquet bundles
+    stem, extension = os.path.splitext(path)
+    return stem if extension.lstrip('.').lower() in EXPORT_FORMATS else path
+
+
+def check_table_names(names):
+    # table names become sheet names (or file names in a bundle): the same
+    # bundle has to be writable in every format
+    seen = set()
+    for name in names:
+        if not name or len(name) > SHEET_NAME_LENGTH or _ILLEGAL_NAME.search(name) \
+                or name.startswith("'") or name.endswith("'"):
+            raise ValueError(f"Invalid sheet name {name!r}: 1 to {SHEET_NAME_LENGTH} characters, none of "
+                             f"[]:*?/\\ and no leading or trailing apostrophe")
+        if name.lower() in seen:
+            raise ValueError(f"Duplicate sheet name {name!r} (sheet names ignore case)")
+        seen.add(name.lower())
+
+
+def _has_index(df):
+    # a named (or multi-level) index is written out, a default RangeIndex is not
+    return not (isinstance(df.index, pd.RangeIndex) and df.index.name is None)
+
+
+def flat_table(df):
+    # csv, tsv and parquet have one header row: the index becomes leading
+    # columns and multi-level column names are joined with '.'
+    if _has_index(df):
+        df = df.reset_index()
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = ['.'.join(str(level) for level in column if str(level) != '') for column in df.columns]
+    else:
+        df = df.rename(columns=str)
+    return df
+
+
+def _cell_values(values):
+    # one column of a chunk as Python values openpyxl writes: missing values
+    # become empty cells and infinities text, as pd.ExcelWriter does
+    if pd.api.types.is_bool_dtype(values.dtype):
+        return values.to_numpy(dtype=object)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        if pd.api.types.is_integer_dtype(values.dtype):
+            cells = values.to_numpy(dtype=object)
+        else:
+            cells = numbers.astype(object)
+        cells[np.isnan(numbers)] = None
+        cells[np.isposinf(numbers)] = 'inf'
+        cells[np.isneginf(numbers)] = '-inf'
+        return cells
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return np.where(values.isna(), None, values.astype(object))
+    missing = values.isna().to_numpy()
+    text = pd.Series(values.astype(str).to_numpy(dtype=object)).str.replace(_ILLEGAL_XML, '', regex=True)
+    return np.where(missing, None, text.to_numpy(dtype=object))
+
+
+def _header_cells(sheet, values, blank=False):
+    # pd.ExcelWriter's header (and index) style: bold, thin borders,
+    # centred; blank=True styles the empty cells too
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+    side = Side(style='thin')
+    font, border = Font(bold=True), Border(left=side, right=side, top=side, bottom=side)
+    alignment = Alignment(horizontal='center', vertical='top')
+    cells = []
+    for value in values:
+        if value is None and not blank:
+            cells.append(None)
+            continue
+        cell = WriteOnlyCell(sheet, value if value is None or isinstance(value, (str, int, float)) else str(value))
+        cell.font, cell.border, cell.alignment = font, border, alignment
+        cells.append(cell)
+    return cells
+
+
+def _write_sheet(sheet, df, chunk_rows):
+    # the layout pd.DataFrame.to_excel gives: a row per column level (the
+    # upper levels merged over their runs), then with multi-level columns a
+    # row of index names; the index as leading bold columns
+    from openpyxl.utils import get_column_letter
+    names = list(df.index.names) if _has_index(df) else []
+    width = len(names)
+    if isinstance(df.columns, pd.MultiIndex):
+        for level in range(df.columns.nlevels):
+            labels = list(df.columns.get_level_values(level))
+            runs = []
+            if level < df.columns.nlevels - 1:
+                start = 0
+                for i in range(1, len(labels) + 1):
+                    # a run ends where this level or any level above it changes
+                    if i == len(labels) or df.columns[i][:level + 1] != df.columns[start][:level + 1]:
+                        if i - start > 1:
+                            runs.append((start, i))
+                        start = i
+            # a column level's name goes over the last index column
+            prefix = [None] * (width - 1) + [df.columns.names[level]] if width else []
+            cells = _header_cells(sheet, prefix, blank=True) + _header_cells(sheet, labels)
+            # only a merged run's first cell holds the label; the rest stay empty but styled
+            for start, end in runs:
+                cells[width + start + 1:width + end] = _header_cells(sheet, [None] * (end - start - 1), blank=True)
+            sheet.append(cells)
+            for start, end in runs:
+                sheet.merged_cells.add(f'{get_column_letter(width + start + 1)}{level + 1}:'
+                                       f'{get_column_letter(width + end)}{level + 1}')
+        if width:
+            sheet.append(_header_cells(sheet, names))
+    else:
+        sheet.append(_header_cells(sheet, names + list(df.columns)))
+    for lo in range(0, len(df), chunk_rows):
+        chunk = df.iloc[lo:lo + chunk_rows]
+        columns = [_cell_values(chunk.iloc[:, i]) for i in range(chunk.shape[1])]
+        labels = [_header_cells(sheet, _cell_values(pd.Series(chunk.index.get_level_values(level))))
+                  for level in range(width)]
+        for row in zip(*labels, *columns):
+            sheet.append(row)
+
+
+def write_xlsx(path, tables, chunk_rows=CHUNK_ROWS):
+    # openpyxl's write-only workbook streams every row into the file as it
+    # is appended, so memory does not grow with the sheet (pd.ExcelWriter
+    # keeps every cell of the workbook until it is saved)
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for name, df in tables.items():
+        header = df.columns.nlevels + (1 if isinstance(df.columns, pd.MultiIndex) and _has_index(df) else 0)
+        if len(df) + header > XLSX_MAX_ROWS:
+            raise ValueError(f"Sheet {name!r} has {len(df)} rows, more than an xlsx sheet holds; "
+                             f"export it as csv, tsv or parquet")
+        _write_sheet(workbook.create_sheet(name), df, chunk_rows)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _write_text(path, df, sep, chunk_rows):
+    df.to_csv(path, sep=sep, index=False, encoding='utf-8', chunksize=chunk_rows)
+
+
+def _write_parquet(path, df, chunk_rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for lo in range(0, max(len(df), 1), chunk_rows):
+            table = pa.Table.from_pandas(df.iloc[lo:lo + chunk_rows], preserve_index=False,
+                                         schema=writer.schema if writer is not None else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_tables(path, tables, format=None, chunk_rows=CHUNK_ROWS):
+    # one bundle of named tables: an .xlsx workbook with a sheet per table
+    # (laid out as pd.DataFrame.to_excel lays it out), or (csv, tsv,
+    # parquet) a directory named after path holding <table>.<format> per
+    # table, flattened to one header row (flat_table)
+    format = export_format(path, format)
+    check_table_names(tables)
+    with span('export/write-tables', path=path, format=format, rows=sum(len(df) for df in tables.values())):
+        if format == 'xlsx':
+            write_xlsx(path, tables, chunk_rows)
+            print(f"Saved to: {path}")
+            return [path]
+        directory = bundle_directory(path)
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name, df in tables.items():
+            out = os.path.join(directory, f'{name}.{format}')
+            tmp_path = f'{out}.{os.getpid()}.tmp'
+            df = flat_table(df)
+            if format == 'parquet':
+                _write_parquet(tmp_path, df, chunk_rows)
+            else:
+                _write_text(tmp_path, df, ',' if format == 'csv' else '\t', chunk_rows)
+            os.replace(tmp_path, out)
+            paths.append(out)
+        print(f"Saved {len(paths)} table(s) to: {directory}")
+        return paths
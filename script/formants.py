@@ -0,0 +1,164 @@
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from audio import WAV_PATTERN, labelled_intervals, paired_textgrid, read_wav
+from corpus import parallel_map, scan_files
+
+# the column layout of data/vowels/*/summary.tsv
+SUMMARY_COLUMNS = ['Filename', 'word', 'vowel', 'F1', 'F2', 'F3', 'Duration', 'Timepoint', 'VowelPercent',
+                   'MeasType']
+CEILINGS = (5500,)
+
+
+def gaussian_window(lengths, n_fft):
+    # Praat-style Gaussian (edges at exp(-3)) for frames of different lengths
+    lengths = np.asarray(lengths, dtype=np.float64)[:, None]
+    n = np.arange(n_fft, dtype=np.float64)[None, :]
+    window = np.exp(-12 * ((n + 0.5) / lengths - 0.5) ** 2)
+    return np.where(n < lengths, window, 0.0)
+
+
+def levinson(r, order):
+    # batched Levinson-Durbin: predictor polynomials (frames x order+1) from
+    # autocorrelations (frames x lags); every frame's recursion runs in lockstep
+    n_frames = r.shape[0]
+    a = np.zeros((n_frames, order + 1))
+    a[:, 0] = 1.0
+    error = r[:, 0].copy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i in range(1, order + 1):
+            acc = r[:, i] + (a[:, 1:i] * r[:, i - 1:0:-1]).sum(axis=1)
+            k = -acc / error
+            a[:, 1:i] = a[:, 1:i] + k[:, None] * a[:, i - 1:0:-1]
+            a[:, i] = k
+            error = error * (1 - k ** 2)
+    return a, error
+
+
+def lpc_roots(a):
+    # roots of every predictor polynomial at once, as eigenvalues of the
+    # stacked companion matrices
+    n_frames, order = a.shape[0], a.shape[1] - 1
+    companion = np.zeros((n_frames, order, order))
+    companion[:, 0, :] = -a[:, 1:]
+    companion[:, np.arange(1, order), np.arange(order - 1)] = 1.0
+    usable = np.isfinite(companion).all(axis=(1, 2))
+    roots = np.full((n_frames, order), np.nan + 0j)
+    if usable.any():
+        roots[usable] = np.linalg.eigvals(companion[usable])
+    return roots
+
+
+def pick_formants(roots, sample_rate, n_formants=3, fmin=90.0, max_bandwidth=600.0):
+    # formant candidates are the upper-half-plane roots; those too low, too
+    # close to Nyquist or too broad are dropped, the rest taken in frequency order
+    frequency = np.angle(roots) * sample_rate / (2 * np.pi)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bandwidth = -np.log(np.abs(roots)) * sample_rate / np.pi
+    keep = ((roots.imag > 0) & (frequency > fmin) & (frequency < sample_rate / 2 - fmin)
+            & (bandwidth < max_bandwidth))
+    candidates = np.sort(np.where(keep, frequency, np.inf), axis=1)[:, :n_formants]
+    if candidates.shape[1] < n_formants:
+        candidates = np.pad(candidates, ((0, 0), (0, n_formants - candidates.shape[1])), constant_values=np.inf)
+    return np.where(np.isinf(candidates), np.nan, candidates)
+
+
+def frame_formants(frames, sample_rate, ceilings=CEILINGS, n_formants=3, lpc_formants=5,
+                   preemphasis_from=50.0, max_bandwidth=600.0):
+    # (ceilings x frames x n_formants) tracks. The ceiling only decides which
+    # band of the power spectrum the LPC sees (band-limiting + downsampling to
+    # 2 x ceiling), so all ceilings share one FFT per frame
+    n_frames, n_fft = frames.shape
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+    alpha = np.exp(-2 * np.pi * preemphasis_from / sample_rate)
+    omega = 2 * np.pi * freqs / sample_rate
+    power *= 1 + alpha ** 2 - 2 * alpha * np.cos(omega)
+    order = 2 * lpc_formants
+    result = np.full((len(ceilings), n_frames, n_formants), np.nan)
+    for c, ceiling in enumerate(ceilings):
+        n_bins = int(np.searchsorted(freqs, ceiling, side='right'))
+        effective_rate = 2 * freqs[n_bins - 1]
+        r = np.fft.irfft(power[:, :n_bins], n=2 * (n_bins - 1), axis=1)[:, :order + 1]
+        r[:, 0] *= 1 + 1e-9
+        a, error = levinson(r, order)
+        a[~(error > 0)] = np.nan
+        result[c] = pick_formants(lpc_roots(a), effective_rate, n_formants, max_bandwidth=max_bandwidth)
+    return result
+
+
+def track_roughness(tracks):
+    # how far each token's F1-F3 tracks stray from a quadratic in time, summed
+    # in log units; the ceiling with the smoothest tracks wins (cf. FastTrack)
+    n_points = tracks.shape[-2]
+    t = np.linspace(-1, 1, n_points)
+    design = np.stack([np.ones_like(t), t, t ** 2], axis=1)
+    projection = design @ np.linalg.pinv(design)
+    logs = np.log(tracks)
+    residual = logs - np.einsum('ij,...jf->...if', projection, np.nan_to_num(logs))
+    missing = np.isnan(logs).sum(axis=(-2, -1))
+    return np.where(missing == 0, np.nansum(residual ** 2, axis=(-2, -1)), np.inf)
+
+
+def file_formants(wav_path, tier_name='vowel', labels=None, n_points=12, ceilings=CEILINGS,
+                  window_length=0.025, n_formants=3, lpc_formants=5, max_bandwidth=600.0, batch_size=1024):
+    textgrid_path = paired_textgrid(wav_path)
+    stem = os.path.splitext(os.path.basename(wav_path))[0]
+    intervals = labelled_intervals(textgrid_path, tier_name, labels) if textgrid_path else None
+    if intervals is None or not len(intervals[0]):
+        print(f"No '{tier_name}' intervals for {stem}, skipping")
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    texts, starts, ends = intervals
+    wav = read_wav(wav_path)
+    # Praat's window length is the effective one: the Gaussian spans twice that
+    frame_length = int(round(2 * window_length * wav.sample_rate))
+    n_fft = 1 << int(np.ceil(np.log2(2 * frame_length)))
+    fractions = np.linspace(0, 1, n_points)
+    centres = starts[:, None] + fractions[None, :] * (ends - starts)[:, None]
+    first = np.round(centres.ravel() * wav.sample_rate).astype(np.int64) - frame_length // 2
+    window = gaussian_window([frame_length], n_fft)
+    tracks = np.empty((len(ceilings), len(first), n_formants))
+    for lo in range(0, len(first), batch_size):
+        hi = min(lo + batch_size, len(first))
+        index = first[lo:hi, None] + np.arange(n_fft)[None, :]
+        frames = wav.gather(index) * window
+        tracks[:, lo:hi] = frame_formants(frames, wav.sample_rate, ceilings, n_formants, lpc_formants,
+                                          max_bandwidth=max_bandwidth)
+    tracks = tracks.reshape(len(ceilings), len(texts), n_points, n_formants)
+    best = np.argmin(track_roughness(tracks), axis=0)
+    chosen = tracks[best, np.arange(len(texts))]
+    rows = np.repeat(np.arange(len(texts)), n_points)
+    table = pd.DataFrame({
+        'Filename': stem,
+        'word': 'Unlabeled',
+        'vowel': texts[rows].astype(str),
+    })
+    for j in range(n_formants):
+        table[f'F{j + 1}'] = chosen[:, :, j].ravel()
+    table['Duration'] = np.round((ends - starts) * 1000).astype(np.int64)[rows]
+    table['Timepoint'] = np.tile(np.arange(1, n_points + 1), len(texts))
+    table['VowelPercent'] = np.round(np.tile(fractions * 100, len(texts)), 2)
+    table['MeasType'] = 'auto'
+    if len(ceilings) > 1:
+        table['Ceiling'] = np.asarray(ceilings)[best][rows]
+    return table
+
+
+def track_formants(directory, tier_name='vowel', labels=None, n_points=12, ceilings=CEILINGS,
+                   window_length=0.025, pattern=WAV_PATTERN, workers=None, **kwargs):
+    wav_files = scan_files(directory, pattern)
+    tables = parallel_map(partial(file_formants, tier_name=tier_name, labels=labels, n_points=n_points,
+                                  ceilings=tuple(ceilings), window_length=window_length, **kwargs),
+                          wav_files, workers=workers, chunksize=4)
+    tables = [table for table in tables if len(table)]
+    if not tables:
+        raise ValueError(f"No WAV files with '{tier_name}' intervals in {directory}")
+    return pd.concat(tables, ignore_index=True)
+
+
+def write_formant_table(df, path):
+    df.to_csv(path, sep='\t', index=False)
+    print(f"Saved {df['Filename'].nunique()} file(s), {len(df)} rows to: {path}")
@@ -1,18 +1,25 @@
+import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 
-# 读取TSV文件
-df = pd.read_csv('data/fricatives/summary.tsv', sep='\t')
+from functools import partial
+from itertools import combinations
 
-# 显示数据的基本信息
-print("数据前几行:")
-print(df.head())
-print("\n数据列名:")
-print(df.columns.tolist())
-print("\n唯一的音标标签:")
-print(df['label'].unique())
+from export import write_tables
+from groupstats import PartialStats
+from instrument import span
+from resampling import N_RESAMPLES, bootstrap_ci, contrast_table
+from shards import (SHARD_COLUMNS, SPEAKER_COLUMN, cached_partial, find_shards, load_shards, map_shards,
+                    merge_shards, tag_shard)
+from spectra import load_spectral_cube
+from spectral_moments import moments_table
+
+# 'praat': 读取Praat导出的矩 (summary.tsv)
+# 'envelope': 直接从 spectral_envolope.tsv 计算谱矩, 参数见 moment_settings
+moment_source = 'praat'
+moment_settings = {'fmin': None, 'fmax': None, 'power': 2.0, 'preemphasis': None}
+# 每个来源在目录(或说话人分片目录)中的文件名
+moment_files = {'praat': 'summary.tsv', 'envelope': 'spectral_envolope.tsv'}
 
 # 更新发音部位分类，考虑卷舌音（curly-tail/r）
 fricative_categories = {
@@ -29,84 +36,181 @@ def get_fricative_poa(label):
         return fricative_categories[label]
     return None
 
-fricative_data = []
-for idx, row in df.iterrows():
-    label = row['label']
-    poa = get_fricative_poa(label)
-    
-    if poa is not None:
-        fricative_data.append({
-            'Filename': row['Filename'],
-            'label': label,
-            'POA': poa,
-            'COG': row['cog'],
-            'duration': row['duration'],
-            'sdev': row['sdev'],
-            'skew': row['skew'],
-            'kurt': row['kurt']
-        })
-
-fricative_df = pd.DataFrame(fricative_data)
-cog_by_poa = fricative_df.groupby('POA')['COG'].agg([
-    'mean', 'std', 'count', 'min', 'max', 
-    lambda x: np.percentile(x, 25),  # Q1
-    lambda x: np.percentile(x, 50),  # Med
-    lambda x: np.percentile(x, 75)   # Q3
-]).round(2)
-
-cog_by_poa.columns = ['Mean_COG', 'Std_COG', 'Count', 'Min_COG', 'Max_COG', 'Q1_COG', 'Median_COG', 'Q3_COG']
-cog_by_poa = cog_by_poa.reset_index()
-
-with pd.ExcelWriter('data/fricatives/fricative_cog.xlsx') as writer:
-    cog_by_poa.to_excel(writer, sheet_name='COG_by_POA', index=False)
-    fricative_df.to_excel(writer, sheet_name='Fricative_Data', index=False)
-    label_stats = fricative_df.groupby('label')['COG'].agg(['mean', 'std', 'count']).round(2)
-    label_stats.to_excel(writer, sheet_name='COG_by_Label')
-
-plt.figure(figsize=(14, 10))
-fig = plt.figure(figsize=(15, 18))
-gs = fig.add_gridspec(2, 2)
-ax1 = fig.add_subplot(gs[0, 0])
-ax2 = fig.add_subplot(gs[0, 1])
-ax3 = fig.add_subplot(gs[1, :])
-
-colors = ['#3498db', '#2ecc71', '#e74c3c', '#f39c18', '#9b59b6', '#1abc9c']
-poa_colors = {poa: color for poa, color in zip(cog_by_poa['POA'], colors)}
-bars = ax1.bar(cog_by_poa['POA'], cog_by_poa['Mean_COG'], 
-               color=[poa_colors[poa] for poa in cog_by_poa['POA']], 
-               alpha=0.7, yerr=cog_by_poa['Std_COG'], capsize=5, edgecolor='black')
-ax1.set_title('Mean COG of Fricatives by Place of Articulation', fontsize=14, fontweight='bold')
-ax1.set_ylabel('Center of Gravity (COG)', fontsize=18)
-ax1.set_xlabel('Place of Articulation', fontsize=18)
-ax1.grid(axis='y', alpha=0.3)
-
-for bar, count, mean_val in zip(bars, cog_by_poa['Count'], cog_by_poa['Mean_COG']):
-    height = bar.get_height()
-    ax1.text(bar.get_x() + bar.get_width()/2., height + 100,
-             f'{mean_val:.0f}\nn={count}', ha='center', va='bottom', 
-             fontweight='bold', fontsize=9)
-
-fricative_df_sorted = fricative_df.copy()
-poa_order = cog_by_poa.sort_values('Mean_COG')['POA'].tolist()
-fricative_df_sorted['POA'] = pd.Categorical(fricative_df_sorted['POA'], categories=poa_order)
-box_plot = sns.boxplot(data=fricative_df_sorted, x='POA', y='COG', ax=ax2, 
-                       palette=[poa_colors[poa] for poa in poa_order])
-sns.stripplot(data=fricative_df_sorted, x='POA', y='COG', ax=ax2, 
-              color='black', alpha=0.6, size=3, jitter=True)
-ax2.set_title('Distribution of COG by Place of Articulation', fontsize=14, fontweight='bold')
-ax2.set_ylabel('Center of Gravity (COG)', fontsize=18)
-ax2.set_xlabel('Place of Articulation', fontsize=18)
-ax2.grid(axis='y', alpha=0.3)
-
-violin_plot = sns.violinplot(data=fricative_df_sorted, x='POA', y='COG', ax=ax3,
-                            palette=[poa_colors[poa] for poa in poa_order], inner="quartile")
-sns.stripplot(data=fricative_df_sorted, x='POA', y='COG', ax=ax3, 
-              color='black', alpha=0.5, size=2, jitter=True)
-ax3.set_title('Density Distribution of COG by Place of Articulation', fontsize=14, fontweight='bold')
-ax3.set_ylabel('Center of Gravity (COG)', fontsize=18)
-ax3.set_xlabel('Place of Articulation', fontsize=18)
-ax3.grid(axis='y', alpha=0.3)
-
-plt.tight_layout()
-plt.savefig('pics/fricative_cog_by_poa.png', dpi=300, bbox_inches='tight')
-plt.show()
+def load_moments(source=moment_source, settings=moment_settings, directory='data/fricatives'):
+    # 读取TSV文件
+    path = os.path.join(directory, moment_files[source])
+    with span('cog/load', path=path, source=source) as stage:
+        if source == 'envelope':
+            df = moments_table(load_spectral_cube(path), **settings)
+        else:
+            df = pd.read_csv(path, sep='\t')
+        stage.count(rows=len(df))
+    return df
+
+def build_fricative_table(df):
+    with span('cog/build-table', rows=len(df)):
+        return _fricative_table(df)
+
+def _fricative_table(df):
+    fricative_data = []
+    for idx, row in df.iterrows():
+        label = row['label']
+        poa = get_fricative_poa(label)
+        
+        if poa is not None:
+            fricative_data.append({
+                'Filename': row['Filename'],
+                'label': label,
+                'POA': poa,
+                'COG': row['cog'],
+                'duration': row['duration'],
+                'sdev': row['sdev'],
+                'skew': row['skew'],
+                'kurt': row['kurt']
+            })
+    return pd.DataFrame(fricative_data)
+
+def cog_tables(cog_partial, by=()):
+    # 两张表都由(POA, label)的部分统计量合并得到; by 可加上 Speaker 等分组
+    by = list(by)
+    cog_by_poa = cog_partial.rollup(by + ['POA']).finalize([
+        'mean', 'std', 'count', 'min', 'max',
+        'q25',  # Q1
+        'q50',  # Med
+        'q75'   # Q3
+    ])['COG'].round(2)
+    cog_by_poa.columns = ['Mean_COG', 'Std_COG', 'Count', 'Min_COG', 'Max_COG', 'Q1_COG', 'Median_COG', 'Q3_COG']
+    cog_by_poa = cog_by_poa.reset_index()
+    label_stats = cog_partial.rollup(by + ['label']).finalize(['mean', 'std', 'count'])['COG'].round(2)
+    return cog_by_poa, label_stats
+
+def summarize_cog(fricative_df):
+    # 按(POA, label)分组计算一次
+    with span('cog/aggregate', rows=len(fricative_df)):
+        return cog_tables(PartialStats.from_frame(fricative_df, ['POA', 'label'], ['COG']))
+
+def cog_shard_partial(item, source=moment_source, settings=moment_settings):
+    # 一个说话人分片: 只在其矩文件变化时重新计算
+    shard_id, directory = item
+
+    def build():
+        fricative_df = tag_shard(build_fricative_table(load_moments(source, settings, directory)), shard_id)
+        return PartialStats.from_frame(fricative_df, SHARD_COLUMNS + ['POA', 'label'], ['COG'])
+    return cached_partial(directory, f'cog-{source}', [os.path.join(directory, moment_files[source])],
+                          {'settings': settings}, build)
+
+def _fricative_rows(path, source=moment_source, settings=moment_settings):
+    return build_fricative_table(load_moments(source, settings, os.path.dirname(path)))
+
+def load_fricative_shards(root, source=moment_source, settings=moment_settings, workers=None):
+    # 各分片的擦音表(带 Speaker/Session 列), 供作图与重抽样使用
+    return load_shards(root, partial(_fricative_rows, source=source, settings=settings), moment_files[source],
+                       workers=workers)
+
+def summarize_cog_shards(root, source=moment_source, settings=moment_settings, by_speaker=False, workers=None):
+    # 多说话人语料: root 下每个说话人目录各有一份矩文件, 合并各分片的部分统计量
+    shards = find_shards(root, moment_files[source])
+    if not shards:
+        raise ValueError(f"No speaker directories with {moment_files[source]} under {root}")
+    partials = map_shards(partial(cog_shard_partial, source=source, settings=settings), shards, workers)
+    return cog_tables(merge_shards(partials, ['POA', 'label'], by_speaker), [SPEAKER_COLUMN] if by_speaker else [])
+
+def cog_contrasts(fricative_df, pairs=None, confidence=0.95, n_resamples=N_RESAMPLES, seed=0):
+    # 默认比较每一对发音部位 (如 alveolar vs alveolo-palatal)
+    if pairs is None:
+        pairs = list(combinations(sorted(fricative_df['POA'].unique()), 2))
+    return contrast_table(fricative_df, 'POA', 'COG', pairs, confidence, n_resamples, seed)
+
+def write_cog_workbook(path, cog_by_poa, fricative_df, label_stats, contrasts=None, format=None):
+    # 逐行流式写出; format 为 csv/tsv/parquet 时每张表一个文件
+    tables = {'COG_by_POA': cog_by_poa, 'Fricative_Data': fricative_df, 'COG_by_Label': label_stats}
+    if contrasts is not None:
+        tables['COG_Contrasts'] = contrasts
+    return write_tables(path, tables, format)
+
+def plot_cog_by_poa(fricative_df, cog_by_poa, save_path='pics/fricative_cog_by_poa.png', dpi=300, show=True,
+                    error='sd', confidence=0.95, n_resamples=N_RESAMPLES, seed=0):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # 误差线: 'sd' 为 ±标准差, 'ci' 为均值的 bootstrap 置信区间
+    if error == 'ci':
+        cis = bootstrap_ci(fricative_df, 'POA', 'COG', confidence, n_resamples, seed).reindex(cog_by_poa['POA'])
+        yerr = np.vstack([cog_by_poa['Mean_COG'].to_numpy() - cis['CI low'].to_numpy(),
+                          cis['CI high'].to_numpy() - cog_by_poa['Mean_COG'].to_numpy()])
+    elif error == 'sd':
+        yerr = cog_by_poa['Std_COG']
+    else:
+        raise ValueError(f"Unknown error bars: {error} (choose 'sd' or 'ci')")
+
+    fig = plt.figure(figsize=(15, 18))
+    gs = fig.add_gridspec(2, 2)
+    ax1 = fig.add_subplot(gs[0, 0])
+    ax2 = fig.add_subplot(gs[0, 1])
+    ax3 = fig.add_subplot(gs[1, :])
+
+    colors = ['#3498db', '#2ecc71', '#e74c3c', '#f39c18', '#9b59b6', '#1abc9c']
+    poa_colors = {poa: color for poa, color in zip(cog_by_poa['POA'], colors)}
+    bars = ax1.bar(cog_by_poa['POA'], cog_by_poa['Mean_COG'], 
+                   color=[poa_colors[poa] for poa in cog_by_poa['POA']], 
+                   alpha=0.7, yerr=yerr, capsize=5, edgecolor='black')
+    ax1.set_title('Mean COG of Fricatives by Place of Articulation', fontsize=14, fontweight='bold')
+    ax1.set_ylabel('Center of Gravity (COG)', fontsize=18)
+    ax1.set_xlabel('Place of Articulation', fontsize=18)
+    ax1.grid(axis='y', alpha=0.3)
+
+    for bar, count, mean_val in zip(bars, cog_by_poa['Count'], cog_by_poa['Mean_COG']):
+        height = bar.get_height()
+        ax1.text(bar.get_x() + bar.get_width()/2., height + 100,
+                 f'{mean_val:.0f}\nn={count}', ha='center', va='bottom', 
+                 fontweight='bold', fontsize=9)
+
+    fricative_df_sorted = fricative_df.copy()
+    poa_order = cog_by_poa.sort_values('Mean_COG')['POA'].tolist()
+    fricative_df_sorted['POA'] = pd.Categorical(fricative_df_sorted['POA'], categories=poa_order)
+    box_plot = sns.boxplot(data=fricative_df_sorted, x='POA', y='COG', ax=ax2, 
+                           palette=[poa_colors[poa] for poa in poa_order])
+    sns.stripplot(data=fricative_df_sorted, x='POA', y='COG', ax=ax2, 
+                  color='black', alpha=0.6, size=3, jitter=True)
+    ax2.set_title('Distribution of COG by Place of Articulation', fontsize=14, fontweight='bold')
+    ax2.set_ylabel('Center of Gravity (COG)', fontsize=18)
+    ax2.set_xlabel('Place of Articulation', fontsize=18)
+    ax2.grid(axis='y', alpha=0.3)
+
+    violin_plot = sns.violinplot(data=fricative_df_sorted, x='POA', y='COG', ax=ax3,
+                                palette=[poa_colors[poa] for poa in poa_order], inner="quartile")
+    sns.stripplot(data=fricative_df_sorted, x='POA', y='COG', ax=ax3, 
+                  color='black', alpha=0.5, size=2, jitter=True)
+    ax3.set_title('Density Distribution of COG by Place of Articulation', fontsize=14, fontweight='bold')
+    ax3.set_ylabel('Center of Gravity (COG)', fontsize=18)
+    ax3.set_xlabel('Place of Articulation', fontsize=18)
+    ax3.grid(axis='y', alpha=0.3)
+
+    plt.tight_layout()
+    with span('cog/savefig', path=save_path, dpi=dpi):
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+
+def plot_figure(save_path, source=moment_source, settings=moment_settings, dpi=300, show=False):
+    fricative_df = build_fricative_table(load_moments(source, settings))
+    cog_by_poa, _ = summarize_cog(fricative_df)
+    plot_cog_by_poa(fricative_df, cog_by_poa, save_path=save_path, dpi=dpi, show=show)
+
+if __name__ == "__main__":
+    df = load_moments()
+
+    # 显示数据的基本信息
+    print("数据前几行:")
+    print(df.head())
+    print("\n数据列名:")
+    print(df.columns.tolist())
+    print("\n唯一的音标标签:")
+    print(df['label'].unique())
+
+    fricative_df = build_fricative_table(df)
+    cog_by_poa, label_stats = summarize_cog(fricative_df)
+    write_cog_workbook('data/fricatives/fricative_cog.xlsx', cog_by_poa, fricative_df, label_stats)
+    plot_cog_by_poa(fricative_df, cog_by_poa)
@@ -0,0 +1,229 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+SKETCH_SIZE = 512
+DEFAULT_STATS = ('count', 'mean', 'std', 'min', 'max')
+
+
+class QuantileSketch:
+    # sorted values with weights; unit weights (None) mean the sketch is still
+    # exact, larger groups are compressed into SKETCH_SIZE weighted centroids
+    __slots__ = ('values', 'weights')
+
+    def __init__(self, values, weights=None):
+        self.values = values
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def combine(cls, sketches, size=SKETCH_SIZE):
+        sketches = [sketch for sketch in sketches if len(sketch)]
+        if not sketches:
+            return cls(np.empty(0))
+        if len(sketches) == 1:
+            return sketches[0].compress(size)
+        values = np.concatenate([sketch.values for sketch in sketches])
+        order = np.argsort(values, kind='stable')
+        weights = None
+        if any(sketch.weights is not None for sketch in sketches):
+            weights = np.concatenate([
+                np.ones(len(sketch)) if sketch.weights is None else sketch.weights
+                for sketch in sketches
+            ])[order]
+        return cls(values[order], weights).compress(size)
+
+    def compress(self, size=SKETCH_SIZE):
+        if len(self.values) <= size:
+            return self
+        weights = np.ones(len(self.values)) if self.weights is None else self.weights
+        cumulative = np.cumsum(weights)
+        buckets = np.minimum(((cumulative - weights / 2) * size / cumulative[-1]).astype(int), size - 1)
+        counts = np.bincount(buckets, weights=weights, minlength=size)
+        sums = np.bincount(buckets, weights=weights * self.values, minlength=size)
+        keep = counts > 0
+        return QuantileSketch(sums[keep] / counts[keep], counts[keep])
+
+    def quantile(self, q):
+        if not len(self.values):
+            return np.nan
+        if self.weights is None:
+            # same linear interpolation as np.percentile
+            return np.quantile(self.values, q)
+        positions = np.cumsum(self.weights) - self.weights / 2
+        return np.interp(q * self.weights.sum(), positions, self.values)
+
+
+def _quantile_of(stat):
+    if isinstance(stat, float):
+        return stat
+    if stat == 'median':
+        return 0.5
+    match = re.fullmatch(r'q(\d+)', stat)
+    return int(match.group(1)) / 100 if match else None
+
+
+class PartialStats:
+    # per-group count/mean/M2 (Welford/Chan), min, max and a quantile sketch for
+    # every column; partials from different shards or chunks merge exactly
+    def __init__(self, by, columns, keys, count, mean, m2, minimum, maximum, sketches,
+                 integer=None, sketch_size=SKETCH_SIZE):
+        self.by = by
+        self.columns = columns
+        self.keys = keys
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+        self.sketches = sketches
+        self.integer = integer or [False] * len(columns)
+        self.sketch_size = sketch_size
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return f"PartialStats(by={self.by}, columns={self.columns}, groups={len(self)})"
+
+    @classmethod
+    def from_frame(cls, df, by, columns, sketch_size=SKETCH_SIZE):
+        by = [by] if isinstance(by, str) else list(by)
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        grouped = df.groupby(by, sort=True, observed=True)
+        codes = grouped.ngroup().to_numpy()
+        keys = grouped.size().index
+        n_groups, n_cols = len(keys), len(columns)
+        count = np.zeros((n_groups, n_cols), dtype=np.int64)
+        mean = np.full((n_groups, n_cols), np.nan)
+        m2 = np.zeros((n_groups, n_cols))
+        minimum = np.full((n_groups, n_cols), np.nan)
+        maximum = np.full((n_groups, n_cols), np.nan)
+        sketches = [[None] * n_cols for _ in range(n_groups)]
+        integer = []
+        for j, col in enumerate(columns):
+            values = pd.to_numeric(df[col], errors='coerce')
+            integer.append(pd.api.types.is_integer_dtype(values))
+            values = values.to_numpy(dtype=np.float64)
+            valid = (codes >= 0) & ~np.isnan(values)
+            group_codes, x = codes[valid], values[valid]
+            # one sort by (group, value) gives min, max and exact quantiles
+            order = np.lexsort((x, group_codes))
+            group_codes, x = group_codes[order], x[order]
+            n = np.bincount(group_codes, minlength=n_groups)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mu = np.bincount(group_codes, weights=x, minlength=n_groups) / n
+            count[:, j] = n
+            mean[:, j] = mu
+            m2[:, j] = np.bincount(group_codes, weights=(x - mu[group_codes]) ** 2, minlength=n_groups)
+            bounds = np.searchsorted(group_codes, np.arange(n_groups + 1))
+            present = n > 0
+            minimum[present, j] = x[bounds[:-1][present]]
+            maximum[present, j] = x[bounds[1:][present] - 1]
+            for g in range(n_groups):
+                sketches[g][j] = QuantileSketch(x[bounds[g]:bounds[g + 1]]).compress(sketch_size)
+        return cls(by, columns, keys, count, mean, m2, minimum, maximum, sketches,
+                   integer, sketch_size)
+
+    def _regroup(self, codes, keys, by):
+        n_groups, n_cols = len(keys), len(self.columns)
+        count = np.zeros((n_groups, n_cols), dtype=np.int64)
+        mean = np.full((n_groups, n_cols), np.nan)
+        m2 = np.zeros((n_groups, n_cols))
+        minimum = np.full((n_groups, n_cols), np.nan)
+        maximum = np.full((n_groups, n_cols), np.nan)
+        for j in range(n_cols):
+            n = self.count[:, j]
+            old_mean = np.nan_to_num(self.mean[:, j])
+            count[:, j] = np.bincount(codes, weights=n, minlength=n_groups).astype(np.int64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean[:, j] = np.bincount(codes, weights=n * old_mean, minlength=n_groups) / count[:, j]
+            # Chan et al.: M2 = sum(M2_i + n_i * (mean_i - mean)^2)
+            shift = np.where(n > 0, old_mean - np.nan_to_num(mean[codes, j]), 0.0)
+            m2[:, j] = np.bincount(codes, weights=self.m2[:, j] + n * shift ** 2, minlength=n_groups)
+            np.fmin.at(minimum[:, j], codes, self.minimum[:, j])
+            np.fmax.at(maximum[:, j], codes, self.maximum[:, j])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(n_groups + 1))
+        sketches = [
+            [QuantileSketch.combine([self.sketches[i][j] for i in order[bounds[g]:bounds[g + 1]]],
+                                    self.sketch_size)
+             for j in range(n_cols)]
+            for g in range(n_groups)
+        ]
+        return PartialStats(by, self.columns, keys, count, mean, m2, minimum, maximum, sketches,
+                            self.integer, self.sketch_size)
+
+    def merge(self, *others):
+        parts = [self, *others]
+        for other in others:
+            if other.by != self.by or other.columns != self.columns:
+                raise ValueError("Can only merge partial stats over the same keys and columns")
+        stacked = PartialStats(
+            self.by, self.columns,
+            self.keys.append([other.keys for other in others]) if others else self.keys,
+            np.vstack([p.count for p in parts]), np.vstack([p.mean for p in parts]),
+            np.vstack([p.m2 for p in parts]), np.vstack([p.minimum for p in parts]),
+            np.vstack([p.maximum for p in parts]), [row for p in parts for row in p.sketches],
+            [any(flags) for flags in zip(*[p.integer for p in parts])], self.sketch_size,
+        )
+        codes, keys = stacked.keys.factorize(sort=True)
+        keys.names = stacked.keys.names
+        return stacked._regroup(codes, keys, self.by)
+
+    def rollup(self, by):
+        by = [by] if isinstance(by, str) else list(by)
+        missing = [level for level in by if level not in self.by]
+        if missing:
+            raise KeyError(f"Cannot roll up to {missing}: partials are grouped by {self.by}")
+        if len(self.by) == 1:
+            levels = [self.keys]
+        else:
+            levels = [self.keys.get_level_values(level) for level in by]
+        if len(by) == 1:
+            new_keys = pd.Index(levels[0], name=by[0])
+        else:
+            new_keys = pd.MultiIndex.from_arrays(levels, names=by)
+        codes, keys = new_keys.factorize(sort=True)
+        keys.names = by
+        return self._regroup(codes, keys, by)
+
+    def finalize(self, stats=DEFAULT_STATS, ddof=1):
+        result = {}
+        for j, col in enumerate(self.columns):
+            n = self.count[:, j]
+            for stat in stats:
+                if stat == 'count':
+                    values = n
+                elif stat == 'mean':
+                    values = self.mean[:, j]
+                elif stat in ('std', 'var'):
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        values = np.where(n > ddof, self.m2[:, j] / (n - ddof), np.nan)
+                    if stat == 'std':
+                        values = np.sqrt(values)
+                elif stat in ('min', 'max'):
+                    values = self.minimum[:, j] if stat == 'min' else self.maximum[:, j]
+                    if self.integer[j] and not np.isnan(values).any():
+                        values = values.astype(np.int64)
+                else:
+                    q = _quantile_of(stat)
+                    if q is None:
+                        raise ValueError(f"Unknown statistic: {stat}")
+                    values = np.array([row[j].quantile(q) for row in self.sketches])
+                result[(col, stat)] = values
+        frame = pd.DataFrame(result, index=self.keys)
+        frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+        return frame
+
+
+def grouped_stats(df, by, columns, stats=DEFAULT_STATS, sketch_size=SKETCH_SIZE):
+    return PartialStats.from_frame(df, by, columns, sketch_size).finalize(stats)
+
+
+def merge_partials(partials):
+    partials = list(partials)
+    return partials[0].merge(*partials[1:])
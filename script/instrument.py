@@ -0,0 +1,221 @@
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: spans carry no peak RSS
+    resource = None
+
+# opt-in: PHONETICS_TRACE=trace.json (or `cli.py --trace trace.json`) records
+# a span per pipeline stage and per input file and writes them, at exit, as
+# a Chrome trace (chrome://tracing, ui.perfetto.dev). PHONETICS_TRACE_MEMORY=1
+# adds tracemalloc peaks, which slows the traced code down noticeably.
+TRACE_ENV = 'PHONETICS_TRACE'
+TRACE_MEMORY_ENV = 'PHONETICS_TRACE_MEMORY'
+SLOWEST_FILES = 10
+
+_events = None
+_memory = False
+_peaks = []
+_trace_path = None
+_owner = None
+
+
+class Span:
+    __slots__ = ('name', 'args')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def count(self, **counts):
+        # rows=..., files=...; repeated calls add up
+        for key, value in counts.items():
+            self.args[key] = self.args.get(key, 0) + int(value)
+
+
+def enabled():
+    return _events is not None
+
+
+def enable(path=None, memory=False):
+    # path=None collects spans without writing them (see events())
+    global _events, _memory, _trace_path, _owner
+    if _events is None:
+        _events = []
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if path is not None:
+        if _trace_path is None:
+            atexit.register(_write_at_exit)
+        _trace_path = path
+        _owner = os.getpid()
+
+
+def events():
+    return list(_events or [])
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+@contextmanager
+def span(name, cat='stage', **args):
+    # wall and CPU time of the block, plus the counts it reports through
+    # Span.count; without tracing this is a bare yield
+    current = Span(name, dict(args))
+    if _events is None:
+        yield current
+        return
+    memory = _memory and tracemalloc.is_tracing()
+    if memory:
+        # nested spans reset the peak, so the enclosing span's running peak
+        # is parked on the stack and folded back in on exit
+        base, peak = tracemalloc.get_traced_memory()
+        if _peaks:
+            _peaks[-1] = max(_peaks[-1], peak)
+        _peaks.append(0)
+        tracemalloc.reset_peak()
+    start_ts = time.time_ns() // 1000
+    start = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield current
+    finally:
+        wall = time.perf_counter() - start
+        record = {'wall_s': round(wall, 6), 'cpu_s': round(time.process_time() - cpu, 6)}
+        if memory:
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, _peaks.pop())
+            if _peaks:
+                _peaks[-1] = max(_peaks[-1], peak)
+            record['peak_mb'] = round((peak - base) / 2 ** 20, 3)
+        rss = _max_rss_mb()
+        if rss is not None:
+            record['max_rss_mb'] = rss
+        record.update(current.args)
+        _events.append({'name': name, 'cat': cat, 'ph': 'X', 'ts': start_ts, 'dur': round(wall * 1e6),
+                        'pid': os.getpid(), 'tid': threading.get_ident(), 'args': record})
+
+
+def file_span(path, **args):
+    return span(os.path.basename(path), cat='file', path=path, **args)
+
+
+class traced:
+    # wraps a parallel_map function so a worker process sends its spans back
+    # with each result; collect() merges them into this process's trace
+    def __init__(self, func, memory=False):
+        self.func = func
+        self.memory = memory
+
+    def __call__(self, item):
+        global _events, _memory
+        # a forked worker starts with a copy of the parent's spans
+        saved = _events, _memory
+        _events, _memory = [], self.memory
+        started = self.memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            return self.func(item), _events
+        finally:
+            if started:
+                tracemalloc.stop()
+            _events, _memory = saved
+
+
+def wrap(func):
+    return traced(func, _memory) if _events is not None else func
+
+
+def collect(results):
+    results = list(results)
+    for _, worker_events in results:
+        _events.extend(worker_events)
+    return [result for result, _ in results]
+
+
+def stage_table(trace_events):
+    df = _frame(trace_events, 'stage')
+    if df.empty:
+        return df
+    agg = {'calls': ('wall_s', 'size'), 'wall_s': ('wall_s', 'sum'), 'cpu_s': ('cpu_s', 'sum')}
+    for column in ['peak_mb', 'max_rss_mb']:
+        if column in df:
+            agg[column] = (column, 'max')
+    for column in ['rows', 'files']:
+        if column in df:
+            # stages that never counted stay blank rather than 0
+            agg[column] = (column, lambda values: values.sum(min_count=1))
+    table = df.groupby('name', sort=False).agg(**agg).reset_index()
+    for column in ['rows', 'files']:
+        if column in table:
+            table[column] = table[column].astype('Int64')
+    return table.sort_values('wall_s', ascending=False, kind='stable', ignore_index=True)
+
+
+def slowest_files(trace_events, n=SLOWEST_FILES):
+    df = _frame(trace_events, 'file')
+    if df.empty:
+        return df
+    columns = [column for column in ['path', 'wall_s', 'cpu_s', 'peak_mb', 'rows', 'pid'] if column in df]
+    return df.sort_values('wall_s', ascending=False, kind='stable', ignore_index=True)[columns].head(n)
+
+
+def _frame(trace_events, cat):
+    import pandas as pd
+    rows = [{'name': event['name'], 'pid': event['pid'], **event['args']}
+            for event in trace_events if event.get('cat') == cat]
+    return pd.DataFrame(rows)
+
+
+def print_summary(trace_events, n=SLOWEST_FILES):
+    stages = stage_table(trace_events)
+    if not stages.empty:
+        print("Stages:")
+        print(stages.to_string(index=False))
+    files = slowest_files(trace_events, n)
+    if not files.empty:
+        print(f"Slowest {len(files)} file(s):")
+        print(files.to_string(index=False))
+
+
+def write_trace(path, trace_events=None):
+    trace_events = events() if trace_events is None else trace_events
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    print(f"Wrote {len(trace_events)} span(s) to: {path}")
+    return path
+
+
+def load_trace(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    return data['traceEvents'] if isinstance(data, dict) else data
+
+
+def _write_at_exit():
+    if _trace_path is None or os.getpid() != _owner or not _events:
+        return
+    write_trace(_trace_path)
+    print_summary(_events)
+
+
+if os.environ.get(TRACE_ENV) and multiprocessing.parent_process() is None:
+    enable(os.environ[TRACE_ENV], memory=os.environ.get(TRACE_MEMORY_ENV, '') not in ('', '0'))
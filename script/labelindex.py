@@ -0,0 +1,155 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from cache import file_digest, relative_key
+from corpus import TEXTGRID_PATTERN, parallel_map, scan_files
+from instrument import file_span
+from textgrid import read_textgrid
+
+INDEX_PATH = 'data/label_index.sqlite'
+# dataset = the TextGrid's directory under the corpus root (fricatives,
+# vowels/tones, ...); word = the file stem, shared by a word's files
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    word TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    file_id INTEGER NOT NULL REFERENCES files(file_id) ON DELETE CASCADE,
+    tier TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    text TEXT NOT NULL,
+    xmin REAL NOT NULL,
+    xmax REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS intervals_label ON intervals(label);
+CREATE INDEX IF NOT EXISTS intervals_file ON intervals(file_id, tier, xmin);
+CREATE INDEX IF NOT EXISTS files_word ON files(word);
+"""
+
+
+def textgrid_rows(file_path):
+    # (tier, seq, label, text, xmin, xmax) of every labelled interval or point;
+    # the label is the text's first word, so "p 16" is found as p
+    rows = []
+    with file_span(file_path) as file:
+        for tier in read_textgrid(file_path).tiers:
+            for seq, (start, end, text) in enumerate(zip(tier.starts, tier.ends, tier.texts), 1):
+                text = text.strip()
+                if text:
+                    rows.append((tier.name, seq, text.split()[0], text, float(start), float(end)))
+        file.count(rows=len(rows))
+    return rows
+
+
+class LabelIndex:
+    def __init__(self, path=INDEX_PATH, root='data'):
+        self.path = path
+        self.root = root
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+
+    def __repr__(self):
+        n_files, n_intervals = self.connection.execute(
+            'SELECT (SELECT COUNT(*) FROM files), (SELECT COUNT(*) FROM intervals)').fetchone()
+        return f"LabelIndex({self.path!r}, files={n_files}, intervals={n_intervals})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, pattern=TEXTGRID_PATTERN, workers=None):
+        # only files whose size/mtime moved are hashed, and only those whose
+        # content hash changed are reparsed
+        stored = {path: (file_id, size, mtime_ns, digest) for file_id, path, size, mtime_ns, digest
+                  in self.connection.execute('SELECT file_id, path, size, mtime_ns, hash FROM files')}
+        changed, touched, seen = [], [], set()
+        for file_path in scan_files(self.root, pattern):
+            key = relative_key(file_path, self.root)
+            seen.add(key)
+            stat = os.stat(file_path)
+            entry = stored.get(key)
+            if entry and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+                continue
+            digest = file_digest(file_path)
+            if entry and entry[3] == digest:
+                touched.append((stat.st_size, stat.st_mtime_ns, entry[0]))
+            else:
+                changed.append((file_path, key, stat, digest))
+        deleted = [stored[key][0] for key in stored if key not in seen]
+        parsed = parallel_map(textgrid_rows, [item[0] for item in changed], workers=workers)
+        with self.connection:
+            self.connection.executemany('UPDATE files SET size = ?, mtime_ns = ? WHERE file_id = ?', touched)
+            self.connection.executemany('DELETE FROM files WHERE file_id = ?', [(file_id,) for file_id in deleted])
+            for (file_path, key, stat, digest), rows in zip(changed, parsed):
+                self.connection.execute('DELETE FROM files WHERE path = ?', (key,))
+                dataset = os.path.dirname(key) or '.'
+                word = os.path.splitext(os.path.basename(key))[0]
+                file_id = self.connection.execute(
+                    'INSERT INTO files (dataset, path, word, size, mtime_ns, hash) VALUES (?, ?, ?, ?, ?, ?)',
+                    (dataset, key, word, stat.st_size, stat.st_mtime_ns, digest)).lastrowid
+                self.connection.executemany(
+                    'INSERT INTO intervals (file_id, tier, seq, label, text, xmin, xmax) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(file_id,) + row for row in rows])
+        print(f"Indexed {len(changed)} changed file(s), dropped {len(deleted)} deleted file(s): {self.path}")
+        return self
+
+    def sql(self, query, params=()):
+        return pd.read_sql_query(query, self.connection, params=params)
+
+    def find(self, label=None, dataset=None, tier=None, word=None, path=None, start=None, end=None):
+        # every condition is optional; label, dataset, tier and word also take
+        # lists. start/end keep the intervals overlapping [start, end]
+        clauses, params = [], []
+        for column, value in [('i.label', label), ('f.dataset', dataset), ('i.tier', tier),
+                              ('f.word', word), ('f.path', path)]:
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += values
+        if start is not None:
+            clauses.append('i.xmax > ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('i.xmin < ?')
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.sql(f"""
+            SELECT f.dataset, f.path, f.word, i.tier, i.seq, i.label, i.text, i.xmin, i.xmax
+            FROM intervals i JOIN files f USING (file_id) {where}
+            ORDER BY f.path, i.tier, i.xmin""", params)
+
+    def file_intervals(self, path, tier=None):
+        # tier -> (starts, ends, texts) arrays sorted by start, for one file
+        # (path relative to the corpus root)
+        df = self.find(path=path, tier=tier)
+        return {name: (group['xmin'].to_numpy(np.float64), group['xmax'].to_numpy(np.float64),
+                       group['text'].to_numpy(object))
+                for name, group in df.groupby('tier', sort=True)}
+
+    def labels(self, dataset=None):
+        where, params = ('WHERE f.dataset = ?', (dataset,)) if dataset is not None else ('', ())
+        return self.sql(f"""
+            SELECT f.dataset, i.tier, i.label, COUNT(*) AS n
+            FROM intervals i JOIN files f USING (file_id) {where}
+            GROUP BY f.dataset, i.tier, i.label ORDER BY f.dataset, i.tier, i.label""", params)
+
+
+def build_label_index(root='data', path=INDEX_PATH, workers=None):
+    return LabelIndex(path, root).update(workers=workers)
@@ -1,15 +1,80 @@
+import os
+from functools import partial
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Ellipse
+
+from groupstats import PartialStats, grouped_stats
+from instrument import span
+from shards import (SHARD_COLUMNS, cached_partial, find_shards, load_shards, map_shards,
+                    merge_shards, tag_shard)
+from store import load_table
+from vowelnorm import UNITS, covariance_ellipses, normalize_formants
+
+# the export inside each speaker shard of a sharded corpus
+VOWEL_FILE = 'summary.tsv'
+VOWEL_STATS = ['count', 'max', 'min', 'mean', 'std']
+
+
+def valid_formants(df):
+    vowel_data = df[df['vowel'].notna()].copy()
+    vowel_data['F1'] = pd.to_numeric(vowel_data['F1'], errors='coerce')
+    vowel_data['F2'] = pd.to_numeric(vowel_data['F2'], errors='coerce')
+    return vowel_data[vowel_data['F1'].notna() & vowel_data['F2'].notna()]
+
+
+def vowel_table(stats):
+    grouped = stats.drop(columns=[('F2', 'count')]).round(2)
+    grouped.columns = [
+        'count', 'F1_max', 'F1_min', 'F1_mean', 'F1_sd',
+        'F2_max', 'F2_min', 'F2_mean', 'F2_sd'
+    ]
+    return grouped.reset_index()
+
+
+def vowel_shard_partial(item, normalization='hz', filename=VOWEL_FILE):
+    # a shard is one speaker (or one session of one), so speaker-extrinsic
+    # normalization is done inside it before the partials are taken
+    shard_id, directory = item
+    source = os.path.join(directory, filename)
+
+    def build():
+        vowel_data = valid_formants(tag_shard(load_table(source, float64=True), shard_id))
+        vowel_data = normalize_formants(vowel_data, normalization)
+        return PartialStats.from_frame(vowel_data, SHARD_COLUMNS + ['vowel'], ['F1', 'F2'])
+    return cached_partial(directory, f'vowels-{normalization}', [source], {'normalization': normalization}, build)
+
+
+def vowel_corpus_stats(root, normalization='hz', by_speaker=False, workers=None, filename=VOWEL_FILE):
+    # transform_by_label's table over every speaker shard under root
+    shards = find_shards(root, filename)
+    if not shards:
+        raise ValueError(f"No speaker directories with {filename} under {root}")
+    with span('vowels/shards', files=len(shards)):
+        partials = map_shards(partial(vowel_shard_partial, normalization=normalization, filename=filename),
+                              shards, workers)
+    return vowel_table(merge_shards(partials, 'vowel', by_speaker).finalize(VOWEL_STATS))
+
 
 class VowelSpacePlotter:
-    def __init__(self, tsv_path):
+    def __init__(self, tsv_path, normalization='hz', speaker_column=None, workers=None):
+        # tsv_path may also be a directory of speaker shards with a summary.tsv
+        # each; their tokens are then normalized per shard (Speaker and
+        # Session), as vowel_corpus_stats does, unless told otherwise
         self.tsv_path = tsv_path
+        self.normalization = normalization
+        self.sharded = os.path.isdir(tsv_path)
+        self.speaker_column = speaker_column or (SHARD_COLUMNS if self.sharded else None)
+        self.workers = workers
         self.df = self.load_tsv_data()
     
     def load_tsv_data(self):
-        df = pd.read_csv(self.tsv_path, sep='\t')
+        with span('vowels/load', path=self.tsv_path) as stage:
+            if self.sharded:
+                df = load_shards(self.tsv_path, partial(load_table, float64=True), VOWEL_FILE, workers=self.workers)
+            else:
+                df = load_table(self.tsv_path, float64=True)
+            stage.count(rows=len(df))
         df.rename(columns={
             'Filename': 'filename',
             'vowel': 'vowel',
@@ -19,49 +84,40 @@ class VowelSpacePlotter:
         return df
     
     def transform_by_label(self):
-        vowel_data = self.df[self.df['vowel'].notna()].copy()
-        vowel_data['F1'] = pd.to_numeric(vowel_data['F1'], errors='coerce')
-        vowel_data['F2'] = pd.to_numeric(vowel_data['F2'], errors='coerce')
-        vowel_data = vowel_data[vowel_data['F1'].notna() & vowel_data['F2'].notna()]
-        grouped = vowel_data.groupby('vowel').agg({
-            'F1': ['count', 'max', 'min', 'mean', 'std'],
-            'F2': ['max', 'min', 'mean', 'std']
-        }).round(2)
-        grouped.columns = [
-            'count', 'F1_max', 'F1_min', 'F1_mean', 'F1_sd',
-            'F2_max', 'F2_min', 'F2_mean', 'F2_sd'
-        ]
-        result_df = grouped.reset_index()
+        with span('vowels/aggregate', rows=len(self.df), normalization=self.normalization):
+            vowel_data = valid_formants(self.df)
+            vowel_data = normalize_formants(vowel_data, self.normalization, by=self.speaker_column)
+            result_df = vowel_table(grouped_stats(vowel_data, 'vowel', ['F1', 'F2'], VOWEL_STATS))
         print("Summary Statics:")
         print(result_df)
         return result_df, vowel_data
     
-    def plot_vowel_space(self, save_path=None, figsize=(12, 8)):
+    def plot_vowel_space(self, save_path=None, figsize=(12, 8), dpi=300, show=True, confidence=None):
+        # ellipses at 1 and 2 SD, or at up to two confidence levels (e.g. (0.5, 0.95))
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import EllipseCollection
+
         vowel_stats, plot_data = self.transform_by_label()
         fig = plt.figure(figsize=figsize)
         gs = fig.add_gridspec(2, 2, width_ratios=[3, 1], height_ratios=[3, 1])
         ax_main = fig.add_subplot(gs[0, 0])
-        vowels = sorted(plot_data['vowel'].unique())
+        if confidence is not None and len(confidence) > 2:
+            raise ValueError(f"At most two confidence levels, got {list(confidence)}")
+        ellipses = covariance_ellipses(plot_data, x='F2', y='F1', by='vowel', scales=(1, 2), confidence=confidence)
+        keys = (1, 2) if confidence is None else sorted(confidence)
+        vowels = list(ellipses.index)
         colors = plt.cm.viridis(np.linspace(0, 1, len(vowels)))
+        # row positions of every vowel from one grouping pass
+        vowel_rows = plot_data.groupby('vowel', observed=True).indices
+        f1 = plot_data['F1'].to_numpy()
+        f2 = plot_data['F2'].to_numpy()
         for i, vowel in enumerate(vowels):
-            vowel_data = plot_data[plot_data['vowel'] == vowel]
-            if vowel in vowel_stats['vowel'].values:
-                stats = vowel_stats[vowel_stats['vowel'] == vowel].iloc[0]
-                mean_f1 = stats['F1_mean']
-                mean_f2 = stats['F2_mean']
-                std_f1 = stats['F1_sd']
-                std_f2 = stats['F2_sd']
-                count = stats['count']
-            else:
-                mean_f1 = vowel_data['F1'].mean()
-                mean_f2 = vowel_data['F2'].mean()
-                std_f1 = vowel_data['F1'].std()
-                std_f2 = vowel_data['F2'].std()
-                count = len(vowel_data)
+            rows = vowel_rows[vowel]
+            count = ellipses.at[vowel, 'count']
             point_size = min(30, 10 + count)
             scatter = ax_main.scatter(
-                vowel_data['F2'],
-                vowel_data['F1'],
+                f2[rows],
+                f1[rows],
                 c=[colors[i]], 
                 label=f"{vowel} (n={count})", 
                 s=point_size,
@@ -69,20 +125,25 @@ class VowelSpacePlotter:
                 edgecolors='white', 
                 linewidth=1
             )
-            
-            for scale, linestyle, alpha in [(1, '--', 0.5), (2, ':', 0.3)]:
-                ellipse = Ellipse(
-                    xy=(mean_f2, mean_f1),
-                    width=std_f2 * scale * 2, 
-                    height=std_f1 * scale * 2,
-                    edgecolor=colors[i], 
-                    facecolor='none', 
-                    linestyle=linestyle, 
-                    linewidth=1.5,
-                    alpha=alpha
-                )
-                ax_main.add_patch(ellipse)
-            
+        
+        centres = ellipses[['F2_mean', 'F1_mean']].to_numpy()
+        drawable = ellipses['major_sd'].notna().to_numpy()
+        for key, linestyle, alpha in zip(keys, ['--', ':'], [0.5, 0.3]):
+            ax_main.add_collection(EllipseCollection(
+                ellipses[f'width_{key}'].to_numpy()[drawable],
+                ellipses[f'height_{key}'].to_numpy()[drawable],
+                ellipses['angle'].to_numpy()[drawable],
+                units='xy',
+                offsets=centres[drawable],
+                offset_transform=ax_main.transData,
+                edgecolors=colors[drawable], 
+                facecolors='none', 
+                linestyles=linestyle, 
+                linewidths=1.5,
+                alpha=alpha
+            ))
+        
+        for vowel, (mean_f2, mean_f1) in zip(vowels, centres):
             ax_main.annotate(
                 vowel, 
                 (mean_f2, mean_f1),
@@ -95,8 +156,9 @@ class VowelSpacePlotter:
                 bbox=dict(boxstyle="round,pad=0.3", facecolor='white', alpha=0.9)
             )
         
-        ax_main.set_xlabel('F2 (Hz)', fontsize=18, fontweight='bold')
-        ax_main.set_ylabel('F1 (Hz)', fontsize=18, fontweight='bold')
+        unit = UNITS[self.normalization]
+        ax_main.set_xlabel(f'F2 ({unit})', fontsize=18, fontweight='bold')
+        ax_main.set_ylabel(f'F1 ({unit})', fontsize=18, fontweight='bold')
         ax_main.grid(True, alpha=0.3)
         
         ax_main.xaxis.tick_top()
@@ -114,13 +176,23 @@ class VowelSpacePlotter:
         
         plt.tight_layout()
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            with span('vowels/savefig', path=save_path, dpi=dpi):
+                plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
             print(f"saved to: {save_path}")
         
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
         return fig, ax_main
 
 
+def plot_figure(save_path, tsv_path="data/vowels/monothongs/summary.tsv", normalization='hz',
+                dpi=300, show=False, confidence=None):
+    plotter = VowelSpacePlotter(tsv_path, normalization=normalization)
+    plotter.plot_vowel_space(save_path=save_path, dpi=dpi, show=show, confidence=confidence)
+
+
 if __name__ == "__main__":
     tsv_path = "data/vowels/monothongs/summary.tsv"
     plotter = VowelSpacePlotter(tsv_path)
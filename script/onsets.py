@@ -0,0 +1,121 @@
+import numpy as np
+
+from pitch import cmnd
+
+# burst = sharpest rise of high-passed energy; voicing = first stretch of
+# frames that stay periodic. Times in seconds, thresholds as in the comments.
+ONSET_SETTINGS = {
+    'margin': 0.02,             # searched beyond each labelled interval, both sides
+    'time_step': 0.001,
+    'burst_window': 0.005,      # energy compared over this much before vs. after
+    'min_rise': 10.0,           # dB; weaker transients are flagged 'no burst'
+    'floor': 100.0, 'ceiling': 500.0,
+    'voicing_threshold': 0.3,   # YIN normalized difference
+    'silence_threshold': 0.05,  # RMS relative to the token's loudest frame
+    'min_voiced': 0.015,        # voicing has to last this long to count
+    'batch_frames': 20000,
+}
+
+
+def frame_energy(wav, first, width):
+    # dB energy of the first-differenced (high-passed) signal in frames
+    # starting at the sample index array first
+    samples = wav.gather(first[..., None] + np.arange(width + 1))
+    power = (np.diff(samples, axis=-1) ** 2).mean(axis=-1)
+    return 10 * np.log10(power + 1e-12)
+
+
+def refine_burst(wav, onsets, width, factor=5.0):
+    # the energy comparison places the burst within a window; its first
+    # sample is where the high-passed amplitude first jumps well above the
+    # level of the window before
+    offsets = np.arange(-2 * width, width + 1)
+    amplitude = np.abs(np.diff(wav.gather(onsets[:, None] + offsets[None, :]), axis=1))
+    level = np.sqrt((amplitude[:, :width] ** 2).mean(axis=1, keepdims=True))
+    jumps = amplitude[:, width:] > factor * level
+    first = np.where(jumps.any(axis=1), np.argmax(jumps, axis=1), width)
+    return onsets - width + first + 1
+
+
+# a frame reads as periodic once about two thirds of it is, so frames
+# start this fraction of their length before the candidate onset they decide for
+VOICING_OFFSET = 0.35
+
+
+def voiced_frames(wav, onsets, floor, ceiling, voicing_threshold, silence_threshold, lengths):
+    # (tokens x frames) periodicity decisions at candidate onset sample
+    # indices; two periods of the floor per frame
+    sample_rate = wav.sample_rate
+    width = int(round(2 / floor * sample_rate))
+    max_lag = min(int(np.ceil(sample_rate / floor)), width - 2)
+    first = onsets.reshape(-1, 1) - int(round(VOICING_OFFSET * width))
+    frames = wav.gather(first + np.arange(width)[None, :])
+    frames -= frames.mean(axis=1, keepdims=True)
+    normalized = cmnd(frames, max_lag + 1)
+    lo = max(int(np.floor(sample_rate / ceiling)), 1)
+    depth = normalized[:, lo:max_lag + 1].min(axis=1).reshape(onsets.shape)
+    rms = np.sqrt((frames ** 2).mean(axis=1)).reshape(onsets.shape)
+    inside = np.arange(onsets.shape[1])[None, :] < lengths[:, None]
+    peak = np.max(np.where(inside, rms, 0.0), axis=1, keepdims=True)
+    return (depth < voicing_threshold) & (rms >= silence_threshold * peak) & inside
+
+
+def onset_batch(wav, starts, ends, margin=0.02, time_step=0.001, burst_window=0.005, min_rise=10.0,
+                floor=100.0, ceiling=500.0, voicing_threshold=0.3, silence_threshold=0.05, min_voiced=0.015):
+    # all tokens of a batch share one (tokens x frames) grid of candidate
+    # onset times, padded to the longest search window
+    sample_rate = wav.sample_rate
+    lo = starts - margin
+    lengths = np.ceil((ends - starts + 2 * margin) / time_step).astype(np.int64) + 1
+    n_frames = lengths.max()
+    steps = np.arange(n_frames)
+    times = lo[:, None] + steps[None, :] * time_step
+    inside = steps[None, :] < lengths[:, None]
+    onset = np.round(times * sample_rate).astype(np.int64)
+
+    # burst: energy just after a candidate onset against energy just before it
+    width = max(int(round(burst_window * sample_rate)), 1)
+    rise = frame_energy(wav, onset, width) - frame_energy(wav, onset - width, width)
+    rise = np.where(inside, rise, -np.inf)
+    burst = np.argmax(rise, axis=1)
+    rows = np.arange(len(starts))
+    strength = rise[rows, burst]
+    burst_time = refine_burst(wav, onset[rows, burst], width) / sample_rate
+
+    # voicing onset: first frame after the burst that opens a long enough voiced run
+    voiced = voiced_frames(wav, onset, floor, ceiling, voicing_threshold, silence_threshold, lengths)
+    run = max(int(round(min_voiced / time_step)), 1)
+    counts = np.concatenate([np.zeros((len(starts), 1), dtype=np.int64), np.cumsum(voiced, axis=1)], axis=1)
+    ahead = np.minimum(steps + run, n_frames)
+    opens_run = (counts[:, ahead] - counts[:, steps] == run) & voiced
+    after = opens_run & (steps[None, :] > burst[:, None])
+    voicing = np.where(after.any(axis=1), np.argmax(after, axis=1), -1)
+
+    # prevoicing: a voiced run still going in the last frame that ends before
+    # the burst (frames overlapping the burst itself never read as periodic)
+    last_unvoiced = np.maximum.accumulate(np.where(voiced, -1, steps[None, :]), axis=1)
+    before = burst - int(np.ceil((1 - VOICING_OFFSET) * 2 / floor / time_step))
+    run_start = last_unvoiced[rows, np.maximum(before, 0)] + 1
+    lead = (before >= 0) & voiced[rows, np.maximum(before, 0)] & (before - run_start + 1 >= run)
+    voicing = np.where(lead, run_start, voicing)
+
+    voicing_time = np.where(voicing >= 0, times[rows, np.maximum(voicing, 0)], np.nan)
+    return burst_time, voicing_time, strength
+
+
+def measure_onsets(wav, starts, ends, settings=None):
+    # burst and voicing-onset times (s), burst strength (dB) and a flag for
+    # every interval, in batches of about batch_frames candidate frames
+    settings = {**ONSET_SETTINGS, **(settings or {})}
+    batch_frames = settings.pop('batch_frames')
+    burst = np.full(len(starts), np.nan)
+    voicing = np.full(len(starts), np.nan)
+    strength = np.full(len(starts), np.nan)
+    n_frames = (ends - starts + 2 * settings['margin']) / settings['time_step']
+    batch = np.cumsum(n_frames) // batch_frames
+    for b in np.unique(batch):
+        rows = np.flatnonzero(batch == b)
+        burst[rows], voicing[rows], strength[rows] = onset_batch(wav, starts[rows], ends[rows], **settings)
+    flags = np.where(strength < settings['min_rise'], 'no burst', '')
+    flags = np.where(np.isnan(voicing), 'no voicing', flags)
+    return burst, voicing, strength, flags.astype(object)
@@ -0,0 +1,183 @@
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from audio import WAV_PATTERN, labelled_intervals, paired_textgrid, read_wav
+from corpus import parallel_map, scan_files
+
+TOKEN_COLUMNS = ['Filename', 'Segment label', 'Start (s)', 'End (s)', 'Duration (s)', 'Mean pitch (Hz)']
+# path costs in the spirit of Praat's pitch settings
+PITCH_SETTINGS = {
+    'floor': 75.0, 'ceiling': 500.0, 'time_step': 0.01, 'candidates': 4,
+    'voicing_threshold': 0.35, 'silence_threshold': 0.03,
+    'octave_jump_cost': 0.35, 'voicing_transition_cost': 0.14,
+}
+
+
+def cmnd(frames, max_lag):
+    # YIN cumulative-mean-normalized difference for a batch of frames; the
+    # lag products come from one FFT autocorrelation per frame
+    n_frames, width = frames.shape
+    n_fft = 1 << int(np.ceil(np.log2(2 * width)))
+    spectrum = np.fft.rfft(frames, n=n_fft, axis=1)
+    r = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_fft, axis=1)[:, :max_lag + 1]
+    energy = np.concatenate([np.zeros((n_frames, 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+    lags = np.arange(max_lag + 1)
+    # d(tau) = sum over the overlap of (x_j - x_{j+tau})^2
+    diff = energy[:, width - lags] + (energy[:, width:width + 1] - energy[:, lags]) - 2 * r
+    diff = np.maximum(diff, 0.0)
+    running = np.cumsum(diff[:, 1:], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        normalized = np.where(running > 0, diff[:, 1:] * lags[1:] / running, 1.0)
+    return np.concatenate([np.ones((n_frames, 1)), normalized], axis=1)
+
+
+def pitch_candidates(normalized, sample_rate, floor, ceiling, n_candidates):
+    # the deepest local minima of the normalized difference inside the lag
+    # range, refined by parabolic interpolation: (frames x n) frequencies and costs
+    n_frames, n_lags = normalized.shape
+    lo = max(int(np.floor(sample_rate / ceiling)), 1)
+    hi = min(int(np.ceil(sample_rate / floor)), n_lags - 2)
+    lags = np.arange(lo, hi + 1)
+    centre = normalized[:, lags]
+    minima = (centre < normalized[:, lags - 1]) & (centre <= normalized[:, lags + 1])
+    scores = np.where(minima, centre, np.inf)
+    n_candidates = min(n_candidates, len(lags))
+    best = np.argpartition(scores, n_candidates - 1, axis=1)[:, :n_candidates]
+    rows = np.arange(n_frames)[:, None]
+    cost = scores[rows, best]
+    tau = lags[best]
+    left, mid, right = normalized[rows, tau - 1], normalized[rows, tau], normalized[rows, tau + 1]
+    curvature = left - 2 * mid + right
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shift = np.where(curvature > 0, 0.5 * (left - right) / curvature, 0.0)
+    frequency = sample_rate / (tau + np.clip(shift, -0.5, 0.5))
+    return np.where(np.isfinite(cost), frequency, np.nan), cost
+
+
+def viterbi_paths(frequency, cost, lengths, octave_jump_cost, voicing_transition_cost):
+    # best voiced/unvoiced path for many tokens in lockstep: (tokens x frames x
+    # states) candidates, last state unvoiced; padded frames cost nothing
+    n_tokens, n_frames, n_states = cost.shape
+    voiced = ~np.isnan(frequency)
+    logf = np.log2(np.where(voiced, frequency, 1.0))
+    total = cost[:, 0].copy()
+    back = np.zeros((n_tokens, n_frames, n_states), dtype=np.int64)
+    for t in range(1, n_frames):
+        jump = octave_jump_cost * np.abs(logf[:, t - 1, :, None] - logf[:, t, None, :])
+        switch = voiced[:, t - 1, :, None] != voiced[:, t, None, :]
+        transition = np.where(voiced[:, t - 1, :, None] & voiced[:, t, None, :], jump, 0.0)
+        transition = np.where(switch, voicing_transition_cost, transition)
+        padded = (t >= lengths)[:, None, None]
+        transition = np.where(padded, 0.0, transition)
+        candidates = total[:, :, None] + transition
+        back[:, t] = np.argmin(candidates, axis=1)
+        total = np.min(candidates, axis=1) + np.where(padded[:, :, 0], 0.0, cost[:, t])
+    path = np.zeros((n_tokens, n_frames), dtype=np.int64)
+    path[:, -1] = np.argmin(total, axis=1)
+    rows = np.arange(n_tokens)
+    for t in range(n_frames - 1, 0, -1):
+        path[:, t - 1] = back[rows, t, path[:, t]]
+    return np.take_along_axis(frequency, path[:, :, None], axis=2)[:, :, 0]
+
+
+def track_tokens(wav, starts, ends, floor=75.0, ceiling=500.0, time_step=0.01, candidates=4,
+                 voicing_threshold=0.35, silence_threshold=0.03, octave_jump_cost=0.35,
+                 voicing_transition_cost=0.14, min_frames=1):
+    # F0 (tokens x frames, NaN unvoiced) and frame times for one batch of
+    # intervals; frames are spread evenly over each interval, at most
+    # time_step apart and at least min_frames of them
+    sample_rate = wav.sample_rate
+    width = int(round(3 / floor * sample_rate))
+    max_lag = min(int(np.ceil(sample_rate / floor)) + 2, width - 1)
+    durations = ends - starts
+    lengths = np.maximum(np.ceil(durations / time_step - 1e-9).astype(np.int64), min_frames)
+    n_frames = lengths.max()
+    times = starts[:, None] + (np.arange(n_frames)[None, :] + 0.5) * (durations / lengths)[:, None]
+    first = np.round(times * sample_rate).astype(np.int64) - width // 2
+    frames = wav.gather(first.reshape(-1, 1) + np.arange(width)[None, :])
+    frames -= frames.mean(axis=1, keepdims=True)
+    normalized = cmnd(frames, max_lag)
+    frequency, cost = pitch_candidates(normalized, sample_rate, floor, ceiling, candidates)
+    frequency = frequency.reshape(len(starts), n_frames, -1)
+    cost = cost.reshape(len(starts), n_frames, -1)
+    # quiet frames (relative to the token's loudest) lean towards unvoiced
+    rms = np.sqrt((frames ** 2).mean(axis=1)).reshape(len(starts), n_frames)
+    inside = np.arange(n_frames)[None, :] < lengths[:, None]
+    peak = np.max(np.where(inside, rms, 0.0), axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        quiet = rms < silence_threshold * peak
+    cost = np.where(quiet[:, :, None], cost + 1.0, cost)
+    frequency = np.concatenate([frequency, np.full(frequency.shape[:2] + (1,), np.nan)], axis=2)
+    cost = np.concatenate([np.where(np.isnan(frequency[:, :, :-1]), np.inf, cost),
+                           np.full(cost.shape[:2] + (1,), voicing_threshold)], axis=2)
+    f0 = viterbi_paths(frequency, cost, lengths, octave_jump_cost, voicing_transition_cost)
+    return np.where(inside, f0, np.nan), times
+
+
+def contour_points(f0, times, starts, ends, n_points):
+    # mean voiced F0 in each of n equal stretches of every interval
+    n_tokens = f0.shape[0]
+    fraction = (times - starts[:, None]) / (ends - starts)[:, None]
+    chunk = np.clip((fraction * n_points).astype(np.int64), 0, n_points - 1)
+    slot = (np.arange(n_tokens)[:, None] * n_points + chunk).ravel()
+    voiced = ~np.isnan(f0).ravel()
+    sums = np.bincount(slot[voiced], f0.ravel()[voiced], minlength=n_tokens * n_points)
+    counts = np.bincount(slot[voiced], minlength=n_tokens * n_points)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums / counts).reshape(n_tokens, n_points)
+
+
+def file_pitch(wav_path, tier_name='vowel', labels=None, n_points=20, batch_frames=20000, settings=None):
+    settings = {**PITCH_SETTINGS, **(settings or {})}
+    textgrid_path = paired_textgrid(wav_path)
+    stem = os.path.splitext(os.path.basename(wav_path))[0]
+    columns = TOKEN_COLUMNS + [f'F0_{i}' for i in range(1, n_points + 1)]
+    intervals = labelled_intervals(textgrid_path, tier_name, labels) if textgrid_path else None
+    if intervals is None or not len(intervals[0]):
+        print(f"No '{tier_name}' intervals for {stem}, skipping")
+        return pd.DataFrame(columns=columns)
+    texts, starts, ends = intervals
+    wav = read_wav(wav_path)
+    points = np.full((len(texts), n_points), np.nan)
+    means = np.full(len(texts), np.nan)
+    # bounded memory: intervals are tracked in batches of about batch_frames frames
+    n_frames = np.maximum((ends - starts) / settings['time_step'], n_points)
+    batch = np.cumsum(n_frames) // batch_frames
+    for b in np.unique(batch):
+        rows = np.flatnonzero(batch == b)
+        # one frame per contour point at least, so no point is left empty
+        f0, times = track_tokens(wav, starts[rows], ends[rows], min_frames=n_points, **settings)
+        points[rows] = contour_points(f0, times, starts[rows], ends[rows], n_points)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[rows] = np.nansum(f0, axis=1) / (~np.isnan(f0)).sum(axis=1)
+    table = pd.DataFrame({
+        'Filename': stem,
+        'Segment label': texts.astype(str),
+        'Start (s)': starts,
+        'End (s)': ends,
+        'Duration (s)': ends - starts,
+        'Mean pitch (Hz)': means,
+    })
+    for i in range(n_points):
+        table[f'F0_{i + 1}'] = points[:, i]
+    return table[columns]
+
+
+def track_pitch(directory='data/vowels/tones', tier_name='vowel', labels=None, n_points=20,
+                pattern=WAV_PATTERN, workers=None, settings=None):
+    wav_files = scan_files(directory, pattern)
+    tables = parallel_map(partial(file_pitch, tier_name=tier_name, labels=labels, n_points=n_points,
+                                  settings=settings),
+                          wav_files, workers=workers, chunksize=4)
+    tables = [table for table in tables if len(table)]
+    if not tables:
+        raise ValueError(f"No WAV files with '{tier_name}' intervals in {directory}")
+    return pd.concat(tables, ignore_index=True)
+
+
+def write_pitch_table(df, path):
+    df.to_csv(path, sep='\t', index=False)
+    print(f"Saved {len(df)} contours to: {path}")
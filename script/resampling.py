@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+N_RESAMPLES = 10000
+# index-matrix cells drawn per chunk (resamples x values); bounds memory
+# without changing the result, since a seeded stream is the same however
+# it is split into chunks
+CHUNK_CELLS = 1 << 22
+CONTRAST_COLUMNS = ['Contrast', 'Group A', 'Group B', 'N A', 'N B', 'Mean A', 'Mean B', 'Difference',
+                    'CI low', 'CI high', 'p']
+
+
+def _chunk_rows(n_resamples, n_values, chunk_cells):
+    rows = max(chunk_cells // max(n_values, 1), 1)
+    for lo in range(0, n_resamples, rows):
+        yield lo, min(lo + rows, n_resamples)
+
+
+def _grouped(values, codes, n_groups):
+    # values sorted by group, with each group's first row and size
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return values[order], starts, counts
+
+
+def bootstrap_means(values, codes, n_groups, n_resamples=N_RESAMPLES, seed=0, chunk_cells=CHUNK_CELLS):
+    # (resamples x groups) bootstrap means. Every resample is one row of a
+    # stratified index matrix: each group's slots draw with replacement from
+    # that group's own rows, then one reduceat gives all group means
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.asarray(codes)
+    valid = ~np.isnan(values) & (codes >= 0)
+    values, starts, counts = _grouped(values[valid], codes[valid], n_groups)
+    present = counts > 0
+    slot_group = np.repeat(np.arange(n_groups), counts)
+    means = np.full((n_resamples, n_groups), np.nan)
+    if not present.any():
+        return means
+    rng = np.random.default_rng(seed)
+    for lo, hi in _chunk_rows(n_resamples, len(values), chunk_cells):
+        draws = rng.random((hi - lo, len(values)))
+        index = starts[slot_group] + (draws * counts[slot_group]).astype(np.int64)
+        sums = np.add.reduceat(values[index], starts[present], axis=1)
+        means[lo:hi, present] = sums / counts[present]
+    return means
+
+
+def percentile_interval(samples, confidence=0.95):
+    # groups without data stay NaN
+    alpha = (1 - confidence) / 2
+    return np.quantile(samples, [alpha, 1 - alpha], axis=0)
+
+
+def bootstrap_ci(df, by, value, confidence=0.95, n_resamples=N_RESAMPLES, seed=0, chunk_cells=CHUNK_CELLS):
+    # percentile CI of the mean of `value` for every group of `by`
+    values = pd.to_numeric(df[value], errors='coerce').to_numpy(np.float64)
+    codes, keys = pd.factorize(df[by], sort=True)
+    means = bootstrap_means(values, codes, len(keys), n_resamples, seed, chunk_cells)
+    low, high = percentile_interval(means, confidence)
+    valid = ~np.isnan(values) & (codes >= 0)
+    counts = np.bincount(codes[valid], minlength=len(keys))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        observed = np.bincount(codes[valid], weights=values[valid], minlength=len(keys)) / counts
+    return pd.DataFrame({'N': counts, 'Mean': observed, 'CI low': low, 'CI high': high},
+                        index=pd.Index(keys, name=by))
+
+
+def permutation_test(a, b, n_permutations=N_RESAMPLES, seed=0, alternative='two-sided', chunk_cells=CHUNK_CELLS):
+    # difference in means (a - b) and its permutation p-value; each chunk of
+    # permutations is one (permutations x values) matrix of shuffled labels
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    a, b = a[~np.isnan(a)], b[~np.isnan(b)]
+    if not len(a) or not len(b):
+        return np.nan, np.nan
+    pooled = np.concatenate([a, b])
+    total = pooled.sum()
+    observed = a.mean() - b.mean()
+    rng = np.random.default_rng(seed)
+    extreme = 0
+    # float noise must not turn the identity permutation into a 'less extreme' one
+    tolerance = 1e-12 * max(np.abs(pooled).max(), 1.0)
+    for lo, hi in _chunk_rows(n_permutations, len(pooled), chunk_cells):
+        shuffled = rng.permuted(np.broadcast_to(pooled, (hi - lo, len(pooled))), axis=1)
+        sum_a = shuffled[:, :len(a)].sum(axis=1)
+        diffs = sum_a / len(a) - (total - sum_a) / len(b)
+        if alternative == 'two-sided':
+            extreme += np.count_nonzero(np.abs(diffs) >= abs(observed) - tolerance)
+        elif alternative == 'greater':
+            extreme += np.count_nonzero(diffs >= observed - tolerance)
+        elif alternative == 'less':
+            extreme += np.count_nonzero(diffs <= observed + tolerance)
+        else:
+            raise ValueError(f"Unknown alternative: {alternative}")
+    return observed, (extreme + 1) / (n_permutations + 1)
+
+
+def contrast_table(df, by, value, contrasts, confidence=0.95, n_resamples=N_RESAMPLES, seed=0,
+                   alternative='two-sided', chunk_cells=CHUNK_CELLS):
+    # bootstrap CI of the difference in means and a permutation p-value for
+    # each (A, B) pair of groups. One stratified bootstrap matrix serves all
+    # contrasts; pairs with a group missing come out as NaN
+    contrasts = list(contrasts)
+    df = df[df[by].isin([group for pair in contrasts for group in pair])]
+    values = pd.to_numeric(df[value], errors='coerce').to_numpy(np.float64)
+    codes, keys = pd.factorize(df[by], sort=True)
+    keys = list(keys)
+    means = bootstrap_means(values, codes, len(keys), n_resamples, seed, chunk_cells)
+    rows = []
+    for a, b in contrasts:
+        ia = keys.index(a) if a in keys else None
+        ib = keys.index(b) if b in keys else None
+        xa = values[codes == ia] if ia is not None else np.array([])
+        xb = values[codes == ib] if ib is not None else np.array([])
+        xa, xb = xa[~np.isnan(xa)], xb[~np.isnan(xb)]
+        low = high = np.nan
+        if ia is not None and ib is not None:
+            low, high = percentile_interval(means[:, ia] - means[:, ib], confidence)
+        difference, p = permutation_test(xa, xb, n_resamples, seed, alternative, chunk_cells)
+        rows.append([f'{a} vs {b}', a, b, len(xa), len(xb), xa.mean() if len(xa) else np.nan,
+                     xb.mean() if len(xb) else np.nan, difference, low, high, p])
+    return pd.DataFrame(rows, columns=CONTRAST_COLUMNS)
@@ -0,0 +1,115 @@
+import os
+import pickle
+import re
+from functools import partial
+
+import pandas as pd
+
+from cache import relative_key
+from corpus import parallel_map
+from groupstats import merge_partials
+
+# many speakers run the same elicitation list: data/<category>/<speaker>/ or
+# data/<category>/<speaker>/<session>/, each laid out like a one-speaker
+# category directory. A shard is one such directory.
+SPEAKER_COLUMN = 'Speaker'
+SESSION_COLUMN = 'Session'
+SHARD_COLUMNS = [SPEAKER_COLUMN, SESSION_COLUMN]
+
+
+def _subdirectories(directory):
+    with os.scandir(directory) as entries:
+        return sorted(entry.name for entry in entries
+                      if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'))
+
+
+def find_shards(root, filename=None, pattern=None):
+    # shard id ('S01' or 'S01/session2') -> directory, for every speaker (or,
+    # one level down, session) directory holding `filename` or files matching
+    # `pattern`; files directly under root are not a shard
+    regex = re.compile(pattern, re.IGNORECASE) if pattern is not None else None
+
+    def holds(directory):
+        if filename is not None:
+            return os.path.isfile(os.path.join(directory, filename))
+        return any(regex.match(name) for name in os.listdir(directory))
+
+    shards = {}
+    if not os.path.isdir(root):
+        return shards
+    for speaker in _subdirectories(root):
+        path = os.path.join(root, speaker)
+        if holds(path):
+            shards[speaker] = path
+            continue
+        for session in _subdirectories(path):
+            if holds(os.path.join(path, session)):
+                shards[f'{speaker}/{session}'] = os.path.join(path, session)
+    return shards
+
+
+def shard_labels(shard_id):
+    speaker, _, session = shard_id.partition('/')
+    return speaker, session
+
+
+def tag_shard(df, shard_id):
+    # Speaker and Session as the first columns of a shard's rows
+    speaker, session = shard_labels(shard_id)
+    df = df.copy()
+    df.insert(0, SESSION_COLUMN, session)
+    df.insert(0, SPEAKER_COLUMN, speaker)
+    return df
+
+
+def map_shards(func, shards, workers=None):
+    # func((shard_id, directory)) for every shard, one shard per task
+    return parallel_map(func, list(shards.items()), workers=workers, chunksize=1)
+
+
+def _load_shard(item, loader, filename):
+    shard_id, directory = item
+    return tag_shard(loader(os.path.join(directory, filename) if filename is not None else directory), shard_id)
+
+
+def load_shards(root, loader, filename=None, pattern=None, workers=None):
+    # the rows of every shard as one table, for figures and resampling that
+    # need the tokens themselves; loader reads the shard's `filename`, or the shard
+    # directory when shards are found by `pattern`
+    shards = find_shards(root, filename, pattern)
+    if not shards:
+        raise ValueError(f"No speaker directories with {filename or pattern} under {root}")
+    frames = map_shards(partial(_load_shard, loader=loader, filename=filename), shards, workers)
+    return pd.concat(frames, ignore_index=True)
+
+
+def cached_partial(directory, name, sources, params, build):
+    # a shard's PartialStats, rebuilt only when the size/mtime of one of its
+    # source files or the params change; kept as <directory>/.<name>.partials.pkl
+    cache_path = os.path.join(directory, f'.{name}.partials.pkl')
+    files = {}
+    for path in sources:
+        stat = os.stat(path)
+        files[relative_key(path, directory)] = (stat.st_size, stat.st_mtime_ns)
+    key = {'params': params, 'files': files}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as file:
+            stored_key, stats = pickle.load(file)
+        if stored_key == key:
+            return stats
+    stats = build()
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        pickle.dump((key, stats), file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return stats
+
+
+def merge_shards(partials, by, by_speaker=False):
+    # shard partials are grouped by Speaker, Session and `by`; the corpus
+    # table rolls them up to `by`, or to Speaker + `by`
+    by = [by] if isinstance(by, str) else list(by)
+    partials = [shard for shard in partials if len(shard)]
+    if not partials:
+        raise ValueError("No shard has any rows to summarize")
+    return merge_partials(partials).rollup(([SPEAKER_COLUMN] if by_speaker else []) + by)
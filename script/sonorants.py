@@ -1,33 +1,109 @@
-# read .txt file as TSV
+import os
+from functools import partial
+
 import pandas as pd
-df = pd.read_csv('data/sonorants/output.txt',sep='\t')
-# filter out NA
-df_filtered = df[df['soe'].notna()]
-print(f"df rows:{len(df)}")
-print(f"df_filtered rows:{len(df_filtered)}")
-df_filtered.head()
-# make IPA and group columns
-print(df_filtered.columns.tolist())
-df_filtered['IPA']=df_filtered['Label']
-df_filtered['group_glottalization']=df_filtered['Label'].apply(lambda x: 'glottalization' if 'ʔ' in x else 'no')
-df_filtered['group_POA']=df_filtered['IPA'].apply(lambda x: x.replace("ʔ",""))
-df_filtered['duration']=df_filtered['seg_End'] - df_filtered['seg_Start']
-df_clean = df_filtered[['Filename','duration','HNR05','soe','IPA','group_glottalization','group_POA']]
-df_clean.head()
-# descriptive statistics
-with pd.ExcelWriter('sonorants.xlsx') as writer:    
+from corpus import scan_files
+from export import write_tables
+from groupstats import PartialStats
+from instrument import span
+from resampling import N_RESAMPLES, contrast_table
+from shards import (SHARD_COLUMNS, SPEAKER_COLUMN, cached_partial, find_shards, load_shards, map_shards,
+                    merge_shards, tag_shard)
+from store import load_table
+from voicesauce import MAT_PATTERN, load_voicesauce_frames
+
+# a directory is read straight from the VoiceSauce .mat tracks and the
+# TextGrids beside them; a file is a VoiceSauce text export (output.txt)
+SONORANT_SOURCE = 'data/sonorants'
+
+
+def load_sonorants(source=SONORANT_SOURCE, tier_name='sonorant', workers=None):
+    columns = ['Filename', 'Label', 'seg_Start', 'seg_End', 'HNR05', 'soe']
+    with span('sonorants/load', path=source) as stage:
+        if os.path.isdir(source):
+            df = load_voicesauce_frames(source, tier_name=tier_name, variables=['HNR05', 'soe'],
+                                        workers=workers)[columns]
+        else:
+            df = load_table(source, columns=columns, float64=True)
+        stage.count(rows=len(df))
+    # filter out NA
+    df_filtered = df[df['soe'].notna()].copy()
+    print(f"df rows:{len(df)}")
+    print(f"df_filtered rows:{len(df_filtered)}")
+    # make IPA and group columns
+    print(df_filtered.columns.tolist())
+    with span('sonorants/derive-columns', rows=len(df_filtered)):
+        df_filtered['IPA']=df_filtered['Label']
+        df_filtered['group_glottalization']=df_filtered['Label'].apply(lambda x: 'glottalization' if 'ʔ' in x else 'no')
+        df_filtered['group_POA']=df_filtered['IPA'].apply(lambda x: x.replace("ʔ",""))
+        df_filtered['duration']=df_filtered['seg_End'] - df_filtered['seg_Start']
+    return df_filtered[['Filename','duration','HNR05','soe','IPA','group_glottalization','group_POA']]
+
+
+def sonorant_tables(stats, by=()):
+    # both sheets are roll-ups of the (POA, IPA) partials; by adds e.g. Speaker
+    by = list(by)
     # group by POA
-    numeric_stats_poa = df_clean.groupby(['group_POA']).agg({
-        'duration': ['mean', 'std', 'min', 'max'],
-        'HNR05': ['mean', 'std', 'min', 'max'],
-        'soe': ['mean', 'std', 'min', 'max']
-    }).round(1)
-    numeric_stats_poa.to_excel(writer, sheet_name='By_POA')
+    numeric_stats_poa = stats.rollup(by + ['group_POA']).finalize(['mean', 'std', 'min', 'max']).round(1)
     # group by IPA
-    numeric_stats_ipa = df_clean.groupby(['IPA']).agg({
-        'duration': ['mean', 'std', 'min', 'max'],
-        'HNR05': ['mean', 'std', 'min', 'max'],
-        'soe': ['mean', 'std', 'min', 'max']
-    }).round(1)
-    numeric_stats_ipa.to_excel(writer, sheet_name='By_IPA')
-print("Saved to: sonorants.xlsx")
\ No newline at end of file
+    numeric_stats_ipa = stats.rollup(by + ['IPA']).finalize(['mean', 'std', 'min', 'max']).round(1)
+    return numeric_stats_poa, numeric_stats_ipa
+
+
+def sonorant_stats(df_clean):
+    # descriptive statistics
+    # one pass over the rows by (POA, IPA)
+    with span('sonorants/aggregate', rows=len(df_clean)):
+        return sonorant_tables(PartialStats.from_frame(df_clean, ['group_POA', 'IPA'], ['duration', 'HNR05', 'soe']))
+
+
+def sonorant_shard_partial(item, tier_name='sonorant'):
+    # one speaker shard of VoiceSauce tracks, re-read only when one of its
+    # .mat files or TextGrids changes
+    shard_id, directory = item
+    sources = scan_files(directory, r'.*\.(mat|TextGrid)$')
+
+    def build():
+        df_clean = tag_shard(load_sonorants(directory, tier_name=tier_name, workers=1), shard_id)
+        return PartialStats.from_frame(df_clean, SHARD_COLUMNS + ['group_POA', 'IPA'], ['duration', 'HNR05', 'soe'])
+    return cached_partial(directory, 'sonorants', sources, {'tier_name': tier_name}, build)
+
+
+def load_sonorant_shards(root, tier_name='sonorant', workers=None):
+    # the cleaned rows of every speaker shard, with Speaker and Session columns
+    return load_shards(root, partial(load_sonorants, tier_name=tier_name, workers=1), pattern=MAT_PATTERN,
+                       workers=workers)
+
+
+def sonorant_shard_stats(root, tier_name='sonorant', by_speaker=False, workers=None):
+    # sonorant_stats over every speaker directory of .mat files under root
+    shards = find_shards(root, pattern=MAT_PATTERN)
+    if not shards:
+        raise ValueError(f"No speaker directories with VoiceSauce .mat files under {root}")
+    with span('sonorants/shards', files=len(shards)):
+        partials = map_shards(partial(sonorant_shard_partial, tier_name=tier_name), shards, workers)
+    return sonorant_tables(merge_shards(partials, ['group_POA', 'IPA'], by_speaker),
+                           [SPEAKER_COLUMN] if by_speaker else [])
+
+
+def sonorant_contrasts(df_clean, by='group_glottalization', pairs=(('glottalization', 'no'),),
+                       measures=('duration', 'HNR05', 'soe'), confidence=0.95, n_resamples=N_RESAMPLES, seed=0):
+    # glottalized vs plain sonorants by default, one block of rows per measure
+    tables = []
+    for measure in measures:
+        table = contrast_table(df_clean, by, measure, pairs, confidence, n_resamples, seed)
+        table.insert(0, 'Measure', measure)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def write_sonorant_workbook(path, numeric_stats_poa, numeric_stats_ipa, contrasts=None, format=None):
+    # an xlsx workbook, or with format csv/tsv/parquet one file per sheet
+    tables = {'By_POA': numeric_stats_poa, 'By_IPA': numeric_stats_ipa}
+    if contrasts is not None:
+        tables['Contrasts'] = contrasts
+    return write_tables(path, tables, format)
+
+
+if __name__ == "__main__":
+    write_sonorant_workbook('sonorants.xlsx', *sonorant_stats(load_sonorants()))
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from store import load_table
+
+TOKEN_COLUMNS = ['Filename', 'Label', 'Start', 'End', 'Duration']
+
+
+class SpectralCube:
+    def __init__(self, tokens, frequencies, amplitudes):
+        self.tokens = tokens.reset_index(drop=True)
+        self.frequencies = np.asarray(frequencies, dtype=np.float32)
+        self.amplitudes = np.asarray(amplitudes, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __repr__(self):
+        return f"SpectralCube(tokens={len(self)}, bins={len(self.frequencies)})"
+
+    @classmethod
+    def from_long(cls, df):
+        # one token per (file, label, start); bins share one frequency axis
+        token_ids = df.groupby(['Filename', 'Label', 'Start'], sort=False, observed=True).ngroup().to_numpy()
+        first = np.unique(token_ids, return_index=True)[1]
+        tokens = df.iloc[first][TOKEN_COLUMNS]
+        bin_ids, frequencies = pd.factorize(df['Frequency'], sort=True)
+        amplitudes = np.full((len(tokens), len(frequencies)), np.nan, dtype=np.float32)
+        amplitudes[token_ids, bin_ids] = df['Amplitude'].to_numpy()
+        return cls(tokens, frequencies.to_numpy(), amplitudes)
+
+    @classmethod
+    def concat(cls, cubes):
+        cubes = [cube for cube in cubes if len(cube)]
+        if not cubes:
+            raise ValueError("No tokens to concatenate")
+        frequencies = cubes[0].frequencies
+        if any(not np.array_equal(cube.frequencies, frequencies) for cube in cubes[1:]):
+            raise ValueError("Cubes have different frequency axes (sample rate or FFT size differ)")
+        tokens = pd.concat([cube.tokens for cube in cubes], ignore_index=True)
+        return cls(tokens, frequencies, np.concatenate([cube.amplitudes for cube in cubes]))
+
+    def to_long(self):
+        # the envelope table layout: one row per token and bin, bins numbered from 1
+        n_tokens, n_bins = self.amplitudes.shape
+        table = self.tokens.loc[np.repeat(np.arange(n_tokens), n_bins), TOKEN_COLUMNS].reset_index(drop=True)
+        table['Bin'] = np.tile(np.arange(1, n_bins + 1), n_tokens)
+        table['Frequency'] = np.tile(self.frequencies.astype(np.float64), n_tokens)
+        table['Amplitude'] = self.amplitudes.astype(np.float64).ravel()
+        return table
+
+    def select(self, mask):
+        mask = np.asarray(mask)
+        return SpectralCube(self.tokens[mask], self.frequencies, self.amplitudes[mask])
+
+    def label_means(self, labels=None):
+        if len(self) == 0:
+            return [], np.empty((0, len(self.frequencies)), dtype=np.float32)
+        codes, uniques = pd.factorize(self.tokens['Label'].astype(str), sort=True)
+        order = np.argsort(codes, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+        valid = ~np.isnan(self.amplitudes[order])
+        sums = np.add.reduceat(np.where(valid, self.amplitudes[order], 0), starts, axis=0, dtype=np.float64)
+        counts = np.add.reduceat(valid, starts, axis=0)
+        with np.errstate(invalid='ignore'):
+            means = (sums / counts).astype(np.float32)
+        uniques = list(uniques)
+        if labels is not None:
+            means = means[[uniques.index(label) for label in labels]]
+            uniques = list(labels)
+        return uniques, means
+
+    def peaks(self, spectra, fmin=None, fmax=None):
+        spectra = np.atleast_2d(spectra)
+        band = np.ones(len(self.frequencies), dtype=bool)
+        if fmin is not None:
+            band &= self.frequencies >= fmin
+        if fmax is not None:
+            band &= self.frequencies <= fmax
+        masked = np.where(band, spectra, -np.inf)
+        peak_bins = np.argmax(np.nan_to_num(masked, nan=-np.inf), axis=1)
+        rows = np.arange(len(spectra))
+        return self.frequencies[peak_bins], spectra[rows, peak_bins]
+
+    def save(self, path):
+        columns = {f'token_{col}': self.tokens[col].to_numpy(dtype=str if col in ('Filename', 'Label') else np.float64)
+                   for col in TOKEN_COLUMNS}
+        np.savez(path, frequencies=self.frequencies, amplitudes=self.amplitudes, **columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            tokens = pd.DataFrame({col: data[f'token_{col}'] for col in TOKEN_COLUMNS})
+            return cls(tokens, data['frequencies'], data['amplitudes'])
+
+
+def load_spectral_cube(source='data/fricatives/spectral_envolope.tsv', labels=None):
+    cube_path = os.path.splitext(source)[0] + '.cube.npz'
+    if os.path.exists(cube_path) and os.path.getmtime(cube_path) >= os.path.getmtime(source):
+        cube = SpectralCube.load(cube_path)
+    else:
+        df = load_table(source, columns=TOKEN_COLUMNS + ['Frequency', 'Amplitude'])
+        cube = SpectralCube.from_long(df)
+        cube.save(cube_path)
+    if labels is not None:
+        cube = cube.select(cube.tokens['Label'].isin(labels))
+    return cube
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+MOMENT_COLUMNS = ['cog', 'sdev', 'skew', 'kurt']
+
+
+def preemphasis_gain(frequencies, corner):
+    # first-order (+6 dB/octave) pre-emphasis above the corner frequency, in dB
+    return 10 * np.log10(1 + (np.asarray(frequencies, dtype=np.float64) / corner) ** 2)
+
+
+def spectral_moments(frequencies, amplitudes, fmin=None, fmax=None, power=2.0,
+                     preemphasis=None, chunk_size=4096):
+    # amplitudes are dB spectra (tokens x bins); bins are weighted by |S|^power
+    # like Praat's "Get centre of gravity", i.e. power=2 weights by energy
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    amplitudes = np.atleast_2d(amplitudes)
+    band = np.ones(len(frequencies), dtype=bool)
+    if fmin is not None:
+        band &= frequencies >= fmin
+    if fmax is not None:
+        band &= frequencies <= fmax
+    freqs = frequencies[band]
+    offset = preemphasis_gain(freqs, preemphasis) if preemphasis else 0.0
+
+    result = np.full((len(amplitudes), 4), np.nan)
+    for start in range(0, len(amplitudes), chunk_size):
+        db = amplitudes[start:start + chunk_size, band].astype(np.float64) + offset
+        # scale by each token's maximum first so 10**(dB/...) cannot overflow
+        db -= np.nanmax(db, axis=1, keepdims=True)
+        weights = np.nan_to_num(10 ** (db * power / 20), nan=0.0)
+        total = weights.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cog = weights @ freqs / total
+            dev = freqs[None, :] - cog[:, None]
+            m2 = (weights * dev ** 2).sum(axis=1) / total
+            m3 = (weights * dev ** 3).sum(axis=1) / total
+            m4 = (weights * dev ** 4).sum(axis=1) / total
+            result[start:start + chunk_size] = np.column_stack([
+                cog, np.sqrt(m2), m3 / m2 ** 1.5, m4 / m2 ** 2 - 3
+            ])
+    return result
+
+
+def moments_table(cube, **kwargs):
+    moments = spectral_moments(cube.frequencies, cube.amplitudes, **kwargs)
+    table = pd.DataFrame({
+        'Filename': cube.tokens['Filename'].to_numpy(),
+        'label': cube.tokens['Label'].astype(str).to_numpy(),
+        'start': cube.tokens['Start'].to_numpy(),
+        'duration': cube.tokens['Duration'].to_numpy() * 1000,
+    })
+    table[MOMENT_COLUMNS] = moments
+    return table
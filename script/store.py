@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrument import file_span, span
+
+NA_VALUES = ['NA', 'undefined', '--undefined--']
+ROW_GROUP_ROWS = 1 << 20
+
+# Praat/VoiceSauce exports read by the scripts. 'label' is the column the row
+# groups are partitioned by; time columns stay float64 since they key tokens.
+TABLE_SPECS = {
+    'data/fricatives/spectral_envolope.tsv': {
+        'label': 'Label', 'file': 'Filename',
+        'categorical': ['Filename', 'Label'],
+        'float64': ['Start', 'End', 'Duration'],
+    },
+    'data/vowels/monothongs/summary.tsv': {
+        'label': 'vowel', 'file': 'Filename',
+        'categorical': ['Filename', 'word', 'vowel', 'MeasType'],
+        'float64': [],
+    },
+    'data/vowels/dipthongs/summary.tsv': {
+        'label': 'vowel', 'file': 'Filename',
+        'categorical': ['Filename', 'word', 'vowel', 'MeasType'],
+        'float64': [],
+    },
+    'data/vowels/tones/mean_f0_results.tsv': {
+        'label': 'Segment label', 'file': 'Filename',
+        'categorical': ['Filename', 'Segment label'],
+        'float64': ['Start (s)', 'End (s)', 'Duration (s)'],
+    },
+    'data/sonorants/output.txt': {
+        'label': 'Label', 'file': 'Filename',
+        'categorical': ['Filename', 'Label'],
+        'float64': ['seg_Start', 'seg_End', 't_ms'],
+    },
+}
+
+
+def table_spec(source):
+    key = os.path.normpath(source).replace(os.sep, '/')
+    for path, spec in TABLE_SPECS.items():
+        if os.path.normpath(path).replace(os.sep, '/') == key:
+            return spec
+    # a speaker shard's export (.../vowels/monothongs/S01/summary.tsv) reads
+    # like the one-speaker file of its category
+    directory = f'/{os.path.dirname(key)}/'
+    for path, spec in TABLE_SPECS.items():
+        category, name = os.path.split(path.replace('data/', '', 1))
+        if os.path.basename(key) == name and f'/{category}/' in directory:
+            return spec
+    return {'label': None, 'file': None, 'categorical': None, 'float64': []}
+
+
+def columnar_path(source):
+    return os.path.splitext(source)[0] + '.parquet'
+
+
+def read_source(source, spec=None):
+    spec = spec or table_spec(source)
+    with file_span(source) as file:
+        df = pd.read_csv(source, sep='\t', na_values=NA_VALUES)
+        file.count(rows=len(df))
+    # Praat scripts leave a trailing tab on every line
+    df = df.loc[:, ~df.columns.str.startswith('Unnamed:')]
+    categorical = spec['categorical']
+    for col in df.columns:
+        values = df[col]
+        if categorical is not None and col in categorical:
+            df[col] = values.astype('category')
+        elif pd.api.types.is_numeric_dtype(values):
+            pass
+        else:
+            numeric = pd.to_numeric(values, errors='coerce')
+            if categorical is None and numeric.isna().all():
+                df[col] = values.astype('category')
+            else:
+                df[col] = numeric
+    for col in df.columns:
+        if col in spec['float64'] or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype(np.float32)
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = df[col].astype(np.int32)
+    return df
+
+
+def _arrow():
+    # pyarrow is imported on first use so that importing this module stays cheap
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # without pyarrow every load falls back to parsing the TSV
+        return None, None
+    return pa, pq
+
+
+def _by_label(df, label):
+    # the Parquet copy is stored grouped by label (one row group per label),
+    # so the TSV fallback is put in the same order: both return one frame
+    if label is None:
+        return df
+    return df.sort_values(label, kind='stable', ignore_index=True)
+
+
+def convert_table(source):
+    pa, pq = _arrow()
+    if pa is None:
+        raise ImportError(f"Converting {source} to Parquet needs pyarrow (pip install pyarrow)")
+    spec = table_spec(source)
+    df = read_source(source, spec)
+    label = spec['label']
+    df = _by_label(df, label)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if label is not None:
+        codes = df[label].cat.codes.to_numpy()
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(df)]])
+    else:
+        starts, ends = [0], [len(df)]
+    path = columnar_path(source)
+    tmp_path = path + '.tmp'
+    with span('store/write-parquet', path=path, rows=len(df)), pq.ParquetWriter(tmp_path, table.schema) as writer:
+        # one row group (or more, for huge labels) per label so filters skip the rest
+        for start, end in zip(starts, ends):
+            writer.write_table(table.slice(start, end - start), row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp_path, path)
+    print(f"Converted {source} -> {path} ({len(df)} rows)")
+    return path
+
+
+def ensure_columnar(source):
+    path = columnar_path(source)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+        convert_table(source)
+    return path
+
+
+def load_table(source, columns=None, labels=None, files=None, float64=False):
+    spec = table_spec(source)
+    conditions = []
+    if labels is not None:
+        conditions.append((spec['label'], list(labels)))
+    if files is not None:
+        conditions.append((spec['file'], list(files)))
+    if any(col is None for col, _ in conditions):
+        raise ValueError(f"No label/file column registered for {source}")
+
+    _, pq = _arrow()
+    if pq is None:
+        df = _by_label(read_source(source, spec), spec['label'])
+        for col, values in conditions:
+            df = df[df[col].isin(values)]
+        if columns is not None:
+            df = df[list(columns)]
+    else:
+        filters = [(col, 'in', values) for col, values in conditions]
+        path = ensure_columnar(source)
+        with span('store/read-parquet', path=path) as stage:
+            df = pq.read_table(path, columns=columns, filters=filters or None).to_pandas()
+            stage.count(rows=len(df))
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+        elif float64 and df[col].dtype == np.float32:
+            # summaries that get rounded and exported should not show float32 noise
+            df[col] = df[col].astype(np.float64)
+    return df.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    for source in TABLE_SPECS:
+        if os.path.exists(source):
+            convert_table(source)
@@ -0,0 +1,344 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from corpus import parallel_map
+from textgrid import TextGrid, interval_tier, write_textgrid
+
+# a corpus laid out like data/, with every category's TextGrids and
+# measurement tables, for timing the pipeline at sizes the real corpus
+# never reaches. Values follow the real exports closely enough that every
+# script runs on them unchanged; they are not meant to be analysed.
+SYNTH_ROOT = 'synth'
+# bumped whenever the same parameters start producing a different corpus
+SYNTH_VERSION = 2
+# written into every generated root: only a directory carrying it is ever deleted
+SYNTH_MARKER = '.synth.json'
+CATEGORIES = ('vot', 'vowels/monothongs', 'vowels/dipthongs', 'vowels/tones', 'fricatives', 'sonorants')
+TIERS = {'vot': 'vot', 'vowels/monothongs': 'vowel', 'vowels/dipthongs': 'vowel', 'vowels/tones': 'vowel',
+         'fricatives': 'fricative', 'sonorants': 'sonorant'}
+# tokens per written chunk of a row-level table, and TextGrids per write task
+CHUNK_TOKENS = 50000
+FILES_PER_TASK = 500
+WORDS = ['stem', 'crawl', 'hemp', 'tiger', 'house', 'hit', 'he', 'mud', 'only', 'eat', 'this', 'sun-or-day',
+         'chicken', 'seven', 'west', 'elder-brother', 'subject', 'drink', 'shore', 'head-up', 'not', 'fish']
+
+# VOT mean and SD (ms)
+VOT_LABELS = {'p': (15, 4), 'pʰ': (160, 20), 't': (25, 5), 'tʰ': (104, 15), 'k': (38, 8), 'kʰ': (123, 15),
+              'ts': (103, 12), 'tsʰ': (200, 35), 'tɕ': (97, 10), 'tɕʰ': (208, 30)}
+# F1, F2 targets (Hz)
+VOWEL_FORMANTS = {'a': (750, 1250), 'i': (300, 2250), 'o': (480, 800), 'u': (350, 750), 'y': (300, 1850),
+                  'ɛ': (550, 1800), 'ə': (500, 1400)}
+MONOPHTHONGS = ['a', 'i', 'o', 'u', 'y', 'ɛ']
+# glided through their letters' targets; three-letter ones go in the second panel
+DIPHTHONGS = ['ai', 'au', 'ia', 'ua', 'iɛ', 'uɛ', 'yu', 'iau', 'uai', 'iəu']
+# F0 (Hz) at onset, midpoint and offset
+TONE_SHAPES = {'T1': (125, 124, 123), 'T2': (110, 104, 145), 'T3': (130, 98, 112), 'T4': (152, 126, 94)}
+# spectral centre of gravity (Hz)
+FRICATIVE_COG = {'f': 2500, 'v': 2000, 's': 5500, 'z': 5000, 'ɕ': 4700, 'x': 2100}
+SONORANTS = ['m', 'n', 'l', 'N', 'ʔm', 'ʔn', 'ʔl', 'ʔN']
+TIMEPOINTS = 12
+F0_POINTS = 20
+# the envelope exports' FFT grid: 1024 points at 44.1 kHz
+BIN_HZ = 44100 / 1024
+
+
+def word_names(n_files):
+    return [f'{i + 1:02d}_{WORDS[i % len(WORDS)]}' for i in range(n_files)]
+
+
+def layout_tokens(n_tokens, tokens_per_file, durations, rng):
+    # tokens fill the files in order, one every 0.8 s with some jitter
+    file_ids = np.arange(n_tokens) // tokens_per_file
+    slot = np.arange(n_tokens) % tokens_per_file
+    starts = np.round(0.5 + 0.8 * slot + rng.uniform(0, 0.2, n_tokens), 4)
+    ends = np.round(starts + np.clip(durations, 0.02, 0.55), 4)
+    return file_ids, starts, ends
+
+
+def _write_textgrid_batch(batch):
+    directory, tier_name, names, starts, ends, texts = batch
+    for name, file_starts, file_ends, file_texts in zip(names, starts, ends, texts):
+        xmax = float(file_ends[-1]) + 0.5
+        tier = interval_tier(tier_name, 0.0, xmax, file_starts, file_ends, file_texts)
+        write_textgrid(TextGrid(None, 0.0, xmax, [tier], []), os.path.join(directory, f'{name}.TextGrid'))
+    return len(names)
+
+
+def write_textgrids(directory, tier_name, names, file_ids, starts, ends, texts, workers=None):
+    bounds = np.searchsorted(file_ids, np.arange(len(names) + 1))
+    texts = np.asarray(texts, dtype=object)
+    per_file = [(starts[lo:hi], ends[lo:hi], texts[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    batches = []
+    for lo in range(0, len(names), FILES_PER_TASK):
+        chunk = per_file[lo:lo + FILES_PER_TASK]
+        batches.append((directory, tier_name, names[lo:lo + FILES_PER_TASK], [item[0] for item in chunk],
+                        [item[1] for item in chunk], [item[2] for item in chunk]))
+    parallel_map(_write_textgrid_batch, batches, workers=workers, chunksize=1)
+
+
+def write_chunks(path, n_tokens, make_rows, chunk_tokens=CHUNK_TOKENS):
+    # row-level tables are built and appended a chunk of tokens at a time
+    n_rows = 0
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        for lo in range(0, max(n_tokens, 1), chunk_tokens):
+            rows = make_rows(np.arange(lo, min(lo + chunk_tokens, n_tokens)))
+            rows.to_csv(file, sep='\t', index=False, header=lo == 0)
+            n_rows += len(rows)
+    print(f"Wrote {n_rows} rows to: {path}")
+
+
+def _labels(n_tokens, choices, rng):
+    return np.asarray(choices, dtype=object)[rng.integers(0, len(choices), n_tokens)]
+
+
+def _file_labels(n_tokens, tokens_per_file, choices, rng):
+    # no label twice in one file: (Filename, vowel) is a token's key
+    # (trajectory.TOKEN_KEYS), as in the real exports
+    n_files = -(-n_tokens // tokens_per_file)
+    picks = rng.random((n_files, len(choices))).argsort(axis=1)[:, :tokens_per_file]
+    return np.asarray(choices, dtype=object)[picks.ravel()[:n_tokens]]
+
+
+def synth_vot(directory, n_tokens, tokens_per_file, rng, workers=None):
+    labels = _labels(n_tokens, list(VOT_LABELS), rng)
+    mean = np.array([VOT_LABELS[label][0] for label in labels], dtype=np.float64)
+    sd = np.array([VOT_LABELS[label][1] for label in labels], dtype=np.float64)
+    vot = np.maximum(np.round(rng.normal(mean, sd)), 1).astype(np.int64)
+    file_ids, starts, ends = layout_tokens(n_tokens, tokens_per_file, vot / 1000 + rng.uniform(0.03, 0.08, n_tokens),
+                                           rng)
+    texts = [f'{label} {value}' for label, value in zip(labels, vot)]
+    names = word_names(file_ids[-1] + 1 if n_tokens else 0)
+    write_textgrids(directory, TIERS['vot'], names, file_ids, starts, ends, texts, workers)
+
+
+def _formant_rows(tokens, names, file_ids, labels, durations, targets, rng, meas_types):
+    # TIMEPOINTS measurement rows per token, moving through the label's targets
+    n_tokens = len(tokens)
+    percent = np.round(np.linspace(0, 100, TIMEPOINTS), 2)
+    rows = np.repeat(tokens, TIMEPOINTS)
+    step = np.tile(np.arange(TIMEPOINTS), n_tokens)
+    f1 = np.empty(len(rows))
+    f2 = np.empty(len(rows))
+    for label in np.unique(labels[tokens]):
+        mask = labels[rows] == label
+        points = np.array([VOWEL_FORMANTS[vowel] for vowel in targets[label]], dtype=np.float64)
+        where = np.linspace(0, 100, len(points))
+        f1[mask] = np.interp(percent[step[mask]], where, points[:, 0])
+        f2[mask] = np.interp(percent[step[mask]], where, points[:, 1])
+    speaker = rng.normal(1.0, 0.04, n_tokens)
+    f1 = f1 * np.repeat(speaker, TIMEPOINTS) + rng.normal(0, 35, len(rows))
+    f2 = f2 * np.repeat(speaker, TIMEPOINTS) + rng.normal(0, 80, len(rows))
+    return pd.DataFrame({
+        'Filename': np.asarray(names, dtype=object)[file_ids[rows]],
+        'word': 'Unlabeled',
+        'vowel': labels[rows],
+        'F1': np.round(f1, 2),
+        'F2': np.round(f2, 2),
+        'F3': np.round(f2 + 900 + rng.normal(0, 120, len(rows)), 2),
+        'Duration': np.round(durations[rows] * 1000).astype(np.int64),
+        'Timepoint': step + 1,
+        'VowelPercent': percent[step],
+        'MeasType': _labels(n_tokens, meas_types, rng)[np.repeat(np.arange(n_tokens), TIMEPOINTS)],
+    })
+
+
+def synth_vowels(directory, n_tokens, tokens_per_file, rng, diphthongs=False, workers=None):
+    if diphthongs:
+        targets = {label: list(label) for label in DIPHTHONGS}
+    else:
+        targets = {label: [label] for label in MONOPHTHONGS}
+    # at most one token of each vowel per file (six for the monophthongs)
+    tokens_per_file = min(tokens_per_file, len(targets))
+    labels = _file_labels(n_tokens, tokens_per_file, list(targets), rng)
+    file_ids, starts, ends = layout_tokens(n_tokens, tokens_per_file, rng.uniform(0.12, 0.4, n_tokens), rng)
+    names = word_names(file_ids[-1] + 1 if n_tokens else 0)
+    write_textgrids(directory, 'vowel', names, file_ids, starts, ends, labels, workers)
+    durations = ends - starts
+    write_chunks(os.path.join(directory, 'summary.tsv'), n_tokens,
+                 lambda tokens: _formant_rows(tokens, names, file_ids, labels, durations, targets, rng,
+                                              ['auto'] * 18 + ['verify', 'hand']))
+
+
+def synth_tones(directory, n_tokens, tokens_per_file, rng, workers=None):
+    labels = _labels(n_tokens, list(TONE_SHAPES), rng)
+    file_ids, starts, ends = layout_tokens(n_tokens, tokens_per_file, rng.uniform(0.15, 0.35, n_tokens), rng)
+    names = word_names(file_ids[-1] + 1 if n_tokens else 0)
+    write_textgrids(directory, 'vowel', names, file_ids, starts, ends, labels, workers)
+    times = np.linspace(0, 1, F0_POINTS)
+    shapes = np.array([np.interp(times, [0, 0.5, 1], TONE_SHAPES[label]) for label in TONE_SHAPES])
+    codes = pd.Categorical(labels, categories=list(TONE_SHAPES)).codes
+    f0 = shapes[codes] * rng.normal(1.0, 0.05, (n_tokens, 1)) + rng.normal(0, 2.5, (n_tokens, F0_POINTS))
+    # creaky or devoiced stretches at the edges come out undefined
+    f0[rng.random((n_tokens, F0_POINTS)) < 0.02] = np.nan
+
+    def rows(tokens):
+        table = pd.DataFrame({
+            'Filename': np.asarray(names, dtype=object)[file_ids[tokens]],
+            'Segment label': labels[tokens],
+            'Start (s)': starts[tokens],
+            'End (s)': ends[tokens],
+            'Duration (s)': np.round(ends[tokens] - starts[tokens], 4),
+            'Mean pitch (Hz)': np.nanmean(f0[tokens], axis=1),
+        })
+        for i in range(F0_POINTS):
+            table[f'F0_{i + 1}'] = f0[tokens, i]
+        return table
+    write_chunks(os.path.join(directory, 'mean_f0_results.tsv'), n_tokens, rows)
+
+
+def synth_fricatives(directory, n_tokens, tokens_per_file, rng, frame_tokens, n_bins=653, workers=None):
+    labels = _labels(n_tokens, list(FRICATIVE_COG), rng)
+    file_ids, starts, ends = layout_tokens(n_tokens, tokens_per_file, rng.uniform(0.05, 0.25, n_tokens), rng)
+    names = word_names(file_ids[-1] + 1 if n_tokens else 0)
+    write_textgrids(directory, 'fricative', names, file_ids, starts, ends, labels, workers)
+    cog = np.array([FRICATIVE_COG[label] for label in labels], dtype=np.float64) * rng.normal(1.0, 0.12, n_tokens)
+    wav_names = np.asarray([f'{name}.wav' for name in names], dtype=object)
+
+    def moments(tokens):
+        return pd.DataFrame({
+            'Filename': wav_names[file_ids[tokens]],
+            'label': labels[tokens],
+            'start': starts[tokens],
+            'duration': ends[tokens] - starts[tokens],
+            'intensity': rng.normal(62, 4, len(tokens)),
+            'cog': cog[tokens],
+            'sdev': rng.normal(1700, 300, len(tokens)),
+            'skew': rng.normal(1.5, 0.8, len(tokens)),
+            'kurt': rng.gamma(2.0, 3.0, len(tokens)),
+        })
+    write_chunks(os.path.join(directory, 'summary.tsv'), n_tokens, moments)
+
+    # the long-format envelope table: n_bins rows per token, for the first frame_tokens tokens
+    frequencies = np.arange(n_bins) * BIN_HZ
+
+    def envelopes(tokens):
+        rows = np.repeat(tokens, n_bins)
+        peak = np.repeat(cog[tokens], n_bins)
+        frequency = np.tile(frequencies, len(tokens))
+        amplitude = 35 * np.exp(-((frequency - peak) / 2500) ** 2) - 10 + rng.normal(0, 3, len(rows))
+        return pd.DataFrame({
+            'Filename': wav_names[file_ids[rows]],
+            'Label': labels[rows],
+            'Start': starts[rows],
+            'End': ends[rows],
+            'Duration': ends[rows] - starts[rows],
+            'Bin': np.tile(np.arange(1, n_bins + 1), len(tokens)),
+            'Frequency': frequency,
+            'Amplitude': amplitude,
+        })
+    write_chunks(os.path.join(directory, 'spectral_envolope.tsv'), min(frame_tokens, n_tokens), envelopes,
+                 chunk_tokens=max(CHUNK_TOKENS // n_bins * 8, 1))
+
+
+def synth_sonorants(directory, n_tokens, tokens_per_file, rng, frame_tokens, workers=None):
+    labels = _labels(n_tokens, SONORANTS, rng)
+    file_ids, starts, ends = layout_tokens(n_tokens, tokens_per_file, rng.uniform(0.05, 0.2, n_tokens), rng)
+    names = word_names(file_ids[-1] + 1 if n_tokens else 0)
+    write_textgrids(directory, 'sonorant', names, file_ids, starts, ends, labels, workers)
+    mat_names = np.asarray([f'{name}.mat' for name in names], dtype=object)
+    glottal = np.array(['ʔ' in label for label in labels])
+
+    # the VoiceSauce text export: one row per millisecond of every token
+    def frames(tokens):
+        start_ms = np.round(starts[tokens] * 1000, 3)
+        end_ms = np.round(ends[tokens] * 1000, 3)
+        counts = np.floor(end_ms - start_ms).astype(np.int64) + 1
+        rows = np.repeat(tokens, counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        offset = np.arange(len(rows)) - first
+        hnr = np.where(glottal[rows], 12.0, 22.0) + rng.normal(0, 4, len(rows))
+        soe = np.abs(rng.normal(0.022, 0.008, len(rows)))
+        # the first frames of a token have no epoch estimate yet
+        soe[offset < 5] = np.nan
+        return pd.DataFrame({
+            'Filename': mat_names[file_ids[rows]],
+            'Label': labels[rows],
+            'seg_Start': np.repeat(start_ms, counts),
+            'seg_End': np.repeat(end_ms, counts),
+            't_ms': np.floor(np.repeat(start_ms, counts)) + offset + 1,
+            'CPP': rng.normal(15, 2.5, len(rows)),
+            'Energy': np.abs(rng.normal(0.7, 0.2, len(rows))),
+            'HNR05': hnr,
+            'soe': soe,
+        })
+    write_chunks(os.path.join(directory, 'output.txt'), min(frame_tokens, n_tokens), frames,
+                 chunk_tokens=max(CHUNK_TOKENS // 100, 1))
+
+
+def corpus_params(n_tokens, tokens_per_file, frame_tokens, seed):
+    return {'tokens': n_tokens, 'tokens_per_file': tokens_per_file, 'frame_tokens': frame_tokens, 'seed': seed,
+            'version': SYNTH_VERSION}
+
+
+def read_marker(root):
+    # the parameters a synthetic root was generated with, None for any other directory
+    marker = os.path.join(root, SYNTH_MARKER)
+    if not os.path.exists(marker):
+        return None
+    with open(marker, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _write_marker(root, params):
+    with open(os.path.join(root, SYNTH_MARKER), 'w', encoding='utf-8') as file:
+        json.dump(params, file)
+
+
+def generate_corpus(root=SYNTH_ROOT, n_tokens=1000, tokens_per_file=10, frame_tokens=10000, categories=CATEGORIES,
+                    seed=0, workers=None):
+    # n_tokens labelled intervals per category; the frame-level tables
+    # (spectral envelopes, VoiceSauce frames) cover the first frame_tokens
+    unknown = [category for category in categories if category not in CATEGORIES]
+    if unknown:
+        raise ValueError(f"Unknown category: {unknown[0]} (choose from {list(CATEGORIES)})")
+    existing = [os.path.join(root, category) for category in categories if os.path.isdir(os.path.join(root, category))]
+    if existing and read_marker(root) is None:
+        # e.g. --root data: these are real recordings, not an earlier run
+        raise ValueError(f"{existing[0]} exists and {root} has no {SYNTH_MARKER}; "
+                         f"refusing to replace a directory this script did not generate")
+    os.makedirs(root, exist_ok=True)
+    # marked before anything is written, so an interrupted run can be replaced;
+    # the parameters are recorded once the corpus is complete
+    _write_marker(root, {'partial': True})
+    rng = np.random.default_rng(seed)
+    for category in categories:
+        directory = os.path.join(root, category)
+        # a fresh directory, so no TextGrid of a bigger earlier run lingers
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+        if category == 'vot':
+            synth_vot(directory, n_tokens, tokens_per_file, rng, workers)
+        elif category == 'vowels/monothongs':
+            synth_vowels(directory, n_tokens, tokens_per_file, rng, workers=workers)
+        elif category == 'vowels/dipthongs':
+            synth_vowels(directory, n_tokens, tokens_per_file, rng, diphthongs=True, workers=workers)
+        elif category == 'vowels/tones':
+            synth_tones(directory, n_tokens, tokens_per_file, rng, workers)
+        elif category == 'fricatives':
+            synth_fricatives(directory, n_tokens, tokens_per_file, rng, frame_tokens, workers=workers)
+        else:
+            synth_sonorants(directory, n_tokens, tokens_per_file, rng, frame_tokens, workers)
+        print(f"Generated {n_tokens} '{TIERS[category]}' tokens in: {directory}")
+    _write_marker(root, corpus_params(n_tokens, tokens_per_file, frame_tokens, seed))
+    return root
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic corpus laid out like data/")
+    parser.add_argument('--root', default=SYNTH_ROOT)
+    parser.add_argument('--tokens', type=int, default=1000, help="labelled intervals per category (1e3 to 1e6)")
+    parser.add_argument('--tokens-per-file', type=int, default=10)
+    parser.add_argument('--frame-tokens', type=int, default=10000,
+                        help="tokens covered by the frame-level tables (spectral envelopes, VoiceSauce frames)")
+    parser.add_argument('--categories', nargs='+', default=list(CATEGORIES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    generate_corpus(args.root, args.tokens, args.tokens_per_file, args.frame_tokens, args.categories, args.seed,
+                    args.workers)
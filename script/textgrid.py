@@ -0,0 +1,241 @@
+import codecs
+import os
+import re
+from array import array
+
+import numpy as np
+
+# Praat's text formats (long and short) carry the same value sequence; the long
+# format only adds "name =" labels and "[n]" indices around it, so both are read
+# by pulling quoted strings, <flags> and numbers in order and skipping the rest.
+_TOKEN = re.compile(
+    r'"((?:[^"]|"")*)"'
+    r'|<(exists|absent)>'
+    r'|\[[^\]]*\]'
+    r'|(?<![\w.])([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+)
+
+INTERVAL_TIER = 'IntervalTier'
+POINT_TIER = 'TextTier'
+
+
+class Tier:
+    def __init__(self, name, kind, xmin, xmax, starts, ends, label_ids, labels):
+        self.name = name
+        self.kind = kind
+        self.xmin = xmin
+        self.xmax = xmax
+        self.starts = starts
+        self.ends = ends
+        self.label_ids = label_ids
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __repr__(self):
+        return f"Tier(name={self.name!r}, kind={self.kind!r}, size={len(self)})"
+
+    @property
+    def is_point_tier(self):
+        return self.kind == POINT_TIER
+
+    @property
+    def texts(self):
+        return np.asarray(self.labels, dtype=object)[self.label_ids]
+
+
+class TextGrid:
+    def __init__(self, path, xmin, xmax, tiers, labels):
+        self.path = path
+        self.xmin = xmin
+        self.xmax = xmax
+        self.tiers = tiers
+        self.labels = labels
+
+    def __repr__(self):
+        return f"TextGrid(path={self.path!r}, tiers={self.tier_names})"
+
+    @property
+    def tier_names(self):
+        return [tier.name for tier in self.tiers]
+
+    def tier(self, name):
+        for tier in self.tiers:
+            if tier.name == name:
+                return tier
+        return None
+
+
+def detect_encoding(head):
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+    # UTF-16 written without a BOM still shows up as NUL bytes next to ASCII
+    if len(head) >= 2 and b'\x00' in head:
+        return 'utf-16-be' if head[0] == 0 else 'utf-16-le'
+    return 'utf-8'
+
+
+def iter_tokens(lines):
+    pending = ''
+    for line in lines:
+        if pending:
+            line = pending + line
+            pending = ''
+        # an odd number of quotes means a label continues on the next line
+        if line.count('"') % 2:
+            pending = line
+            continue
+        for match in _TOKEN.finditer(line):
+            text, flag, number = match.groups()
+            if text is not None:
+                yield text.replace('""', '"')
+            elif flag is not None:
+                yield flag
+            elif number is not None:
+                yield number
+    if pending:
+        raise ValueError("Unterminated string in TextGrid")
+
+
+def parse_tokens(tokens, path=None):
+    def take():
+        try:
+            return next(tokens)
+        except StopIteration:
+            raise ValueError(f"Unexpected end of TextGrid: {path}") from None
+
+    file_type = take()
+    if not file_type.startswith('ooTextFile'):
+        raise ValueError(f"Not a Praat text file: {path}")
+    object_class = take()
+    if object_class != 'TextGrid':
+        raise ValueError(f"Not a TextGrid ({object_class}): {path}")
+
+    xmin = float(take())
+    xmax = float(take())
+    tiers = []
+    labels = ['']
+    label_index = {'': 0}
+    if take() != 'exists':
+        return TextGrid(path, xmin, xmax, tiers, labels)
+
+    for _ in range(int(take())):
+        kind = take()
+        name = take()
+        tier_xmin = float(take())
+        tier_xmax = float(take())
+        size = int(take())
+        starts = array('d')
+        ends = array('d')
+        label_ids = array('i')
+        for _ in range(size):
+            start = float(take())
+            end = float(take()) if kind == INTERVAL_TIER else start
+            text = take()
+            label_id = label_index.get(text)
+            if label_id is None:
+                label_id = label_index[text] = len(labels)
+                labels.append(text)
+            starts.append(start)
+            ends.append(end)
+            label_ids.append(label_id)
+        tiers.append(Tier(
+            name, kind, tier_xmin, tier_xmax,
+            np.frombuffer(starts, dtype=np.float64),
+            np.frombuffer(ends, dtype=np.float64),
+            np.frombuffer(label_ids, dtype=np.int32),
+            labels,
+        ))
+    return TextGrid(path, xmin, xmax, tiers, labels)
+
+
+def read_textgrid(path):
+    with open(path, 'rb') as raw:
+        encoding = detect_encoding(raw.read(4))
+    with open(path, 'r', encoding=encoding) as file:
+        return parse_tokens(iter_tokens(file), path)
+
+
+def _tier_labels(texts):
+    labels, label_ids = np.unique(np.asarray(texts, dtype=str), return_inverse=True)
+    return label_ids.astype(np.int32), [str(label) for label in labels]
+
+
+def interval_tier(name, xmin, xmax, starts, ends, texts):
+    # Praat interval tiers cover [xmin, xmax] without gaps, so the stretches
+    # between the given intervals become empty ones
+    order = np.argsort(starts, kind='stable')
+    bounds, gap_texts = [xmin], []
+    for start, end, text in zip(np.asarray(starts)[order], np.asarray(ends)[order],
+                                np.asarray(texts, dtype=object)[order]):
+        if start < bounds[-1] or end <= start:
+            raise ValueError(f"Overlapping or empty interval on tier '{name}': {start}-{end}")
+        if start > bounds[-1]:
+            gap_texts.append('')
+            bounds.append(start)
+        gap_texts.append(text)
+        bounds.append(end)
+    if xmax > bounds[-1]:
+        gap_texts.append('')
+        bounds.append(xmax)
+    bounds = np.asarray(bounds, dtype=np.float64)
+    label_ids, labels = _tier_labels(gap_texts)
+    return Tier(name, INTERVAL_TIER, xmin, xmax, bounds[:-1], bounds[1:], label_ids, labels)
+
+
+def point_tier(name, xmin, xmax, times, texts):
+    order = np.argsort(times, kind='stable')
+    times = np.asarray(times, dtype=np.float64)[order]
+    label_ids, labels = _tier_labels(np.asarray(texts, dtype=object)[order])
+    return Tier(name, POINT_TIER, xmin, xmax, times, times, label_ids, labels)
+
+
+def _number(value):
+    text = repr(float(value))
+    return text[:-2] if text.endswith('.0') else text
+
+
+def _quoted(text):
+    return '"' + str(text).replace('"', '""') + '"'
+
+
+def format_textgrid(textgrid):
+    # Praat's long text format
+    lines = ['File type = "ooTextFile"', 'Object class = "TextGrid"', '',
+             f'xmin = {_number(textgrid.xmin)} ', f'xmax = {_number(textgrid.xmax)} ']
+    if not textgrid.tiers:
+        lines.append('tiers? <absent> ')
+        return '\n'.join(lines) + '\n'
+    lines += ['tiers? <exists> ', f'size = {len(textgrid.tiers)} ', 'item []: ']
+    for i, tier in enumerate(textgrid.tiers, 1):
+        lines += [f'    item [{i}]:', f'        class = "{tier.kind}" ', f'        name = {_quoted(tier.name)} ',
+                  f'        xmin = {_number(tier.xmin)} ', f'        xmax = {_number(tier.xmax)} ']
+        if tier.is_point_tier:
+            lines.append(f'        points: size = {len(tier)} ')
+            for j, (time, text) in enumerate(zip(tier.starts, tier.texts), 1):
+                lines += [f'        points [{j}]:', f'            number = {_number(time)} ',
+                          f'            mark = {_quoted(text)} ']
+        else:
+            lines.append(f'        intervals: size = {len(tier)} ')
+            for j, (start, end, text) in enumerate(zip(tier.starts, tier.ends, tier.texts), 1):
+                lines += [f'        intervals [{j}]:', f'            xmin = {_number(start)} ',
+                          f'            xmax = {_number(end)} ', f'            text = {_quoted(text)} ']
+    return '\n'.join(lines) + '\n'
+
+
+def write_textgrid(textgrid, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(format_textgrid(textgrid))
+    os.replace(tmp_path, path)
+
+
+def replace_tier(textgrid, tier):
+    # swap in a tier of the same name, or append it
+    tiers = [tier if existing.name == tier.name else existing for existing in textgrid.tiers]
+    if tier.name not in textgrid.tier_names:
+        tiers.append(tier)
+    return TextGrid(textgrid.path, textgrid.xmin, textgrid.xmax, tiers, textgrid.labels)
@@ -0,0 +1,190 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from corpus import TEXTGRID_PATTERN, parallel_map, scan_files
+from labelindex import INDEX_PATH, LabelIndex, textgrid_rows
+
+RELATIONS = ('overlap', 'contains', 'within', 'preceding', 'following')
+INTERVAL_FIELDS = ['tier', 'seq', 'label', 'text', 'xmin', 'xmax']
+
+
+def interval_pairs(left_starts, left_ends, right_starts, right_ends, relation='overlap', max_gap=None):
+    # (left, right) index pairs plus the overlap (or, for preceding/following,
+    # the gap) in seconds. The right side has to be one tier: sorted by start
+    # its ends are sorted too, so every relation is a pair of binary searches
+    # per left interval, O((n + m) log m + pairs) instead of n x m comparisons
+    if relation not in RELATIONS:
+        raise ValueError(f"Unknown relation: {relation} (choose from {list(RELATIONS)})")
+    left_starts = np.asarray(left_starts, dtype=np.float64)
+    left_ends = np.asarray(left_ends, dtype=np.float64)
+    order = np.argsort(right_starts, kind='stable')
+    starts = np.asarray(right_starts, dtype=np.float64)[order]
+    ends = np.asarray(right_ends, dtype=np.float64)[order]
+    if np.any(starts[1:] < ends[:-1]):
+        raise ValueError("Right-hand intervals overlap each other; join against one tier at a time")
+    empty = np.array([], dtype=np.int64)
+    if not len(starts) or not len(left_starts):
+        return empty, empty, np.array([])
+
+    if relation == 'preceding':
+        nearest = np.searchsorted(ends, left_starts, side='right') - 1
+        found = nearest >= 0
+        gap = left_starts - ends[np.maximum(nearest, 0)]
+    elif relation == 'following':
+        nearest = np.searchsorted(starts, left_ends, side='left')
+        found = nearest < len(starts)
+        gap = starts[np.minimum(nearest, len(starts) - 1)] - left_ends
+    if relation in ('preceding', 'following'):
+        if max_gap is not None:
+            found &= gap <= max_gap
+        rows = np.flatnonzero(found)
+        return rows, order[nearest[rows]], gap[rows]
+
+    # candidates end after the left start and start before the left end;
+    # points (zero-length) count as inside [start, end)
+    right_points = bool(np.all(starts == ends))
+    lo = np.searchsorted(ends, left_starts, side='left' if right_points else 'right')
+    hi = np.where(left_starts == left_ends, np.searchsorted(starts, left_ends, side='right'),
+                  np.searchsorted(starts, left_ends, side='left'))
+    counts = np.maximum(hi - lo, 0)
+    rows = np.repeat(np.arange(len(left_starts)), counts)
+    within_run = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    matches = lo[rows] + within_run
+    if relation == 'contains':
+        keep = (starts[matches] >= left_starts[rows]) & (ends[matches] <= left_ends[rows])
+    elif relation == 'within':
+        keep = (starts[matches] <= left_starts[rows]) & (ends[matches] >= left_ends[rows])
+    else:
+        keep = np.ones(len(rows), dtype=bool)
+    rows, matches = rows[keep], matches[keep]
+    overlap = np.minimum(ends[matches], left_ends[rows]) - np.maximum(starts[matches], left_starts[rows])
+    return rows, order[matches], overlap
+
+
+def join_intervals(left, right, relation='overlap', by=None, max_gap=None, prefix='right_', how='inner'):
+    # relate the xmin/xmax intervals of two frames, separately within each
+    # group of the `by` column(s) (a file path, or a word across datasets).
+    # The result has the left columns, the right ones prefixed, and the
+    # prefixed overlap/gap; how='left' keeps unmatched left rows
+    by = [] if by is None else [by] if isinstance(by, str) else list(by)
+    left = left.reset_index(drop=True)
+    right = right.reset_index(drop=True)
+    if by:
+        codes = pd.concat([left[by], right[by]], ignore_index=True).groupby(by, sort=False, dropna=False).ngroup()
+        left_codes, right_codes = codes.to_numpy()[:len(left)], codes.to_numpy()[len(left):]
+    else:
+        left_codes, right_codes = np.zeros(len(left), dtype=np.int64), np.zeros(len(right), dtype=np.int64)
+    left_order = np.argsort(left_codes, kind='stable')
+    right_order = np.argsort(right_codes, kind='stable')
+    n_groups = int(max(left_codes.max(initial=-1), right_codes.max(initial=-1))) + 1
+    left_bounds = np.searchsorted(left_codes[left_order], np.arange(n_groups + 1))
+    right_bounds = np.searchsorted(right_codes[right_order], np.arange(n_groups + 1))
+    left_starts, left_ends = left['xmin'].to_numpy(np.float64), left['xmax'].to_numpy(np.float64)
+    right_starts, right_ends = right['xmin'].to_numpy(np.float64), right['xmax'].to_numpy(np.float64)
+    left_rows, right_rows, measures = [], [], []
+    for g in range(n_groups):
+        lrows = left_order[left_bounds[g]:left_bounds[g + 1]]
+        rrows = right_order[right_bounds[g]:right_bounds[g + 1]]
+        if not len(lrows) or not len(rrows):
+            continue
+        li, ri, measure = interval_pairs(left_starts[lrows], left_ends[lrows], right_starts[rrows],
+                                         right_ends[rrows], relation, max_gap)
+        left_rows.append(lrows[li])
+        right_rows.append(rrows[ri])
+        measures.append(measure)
+    left_rows = np.concatenate(left_rows) if left_rows else np.array([], dtype=np.int64)
+    right_rows = np.concatenate(right_rows) if right_rows else np.array([], dtype=np.int64)
+    measures = np.concatenate(measures) if measures else np.array([])
+    if how == 'left':
+        unmatched = np.setdiff1d(np.arange(len(left)), left_rows)
+        left_rows = np.concatenate([left_rows, unmatched])
+        right_rows = np.concatenate([right_rows, np.full(len(unmatched), -1)])
+        measures = np.concatenate([measures, np.full(len(unmatched), np.nan)])
+    elif how != 'inner':
+        raise ValueError(f"Unknown join: {how} (choose 'inner' or 'left')")
+    # left rows in their original order, each one's matches in time order
+    order = np.lexsort((right_starts[right_rows] if len(right) else right_rows, left_rows))
+    left_rows, right_rows, measures = left_rows[order], right_rows[order], measures[order]
+    table = left.iloc[left_rows].reset_index(drop=True)
+    matched = right.drop(columns=by).reindex(np.where(right_rows >= 0, right_rows, -1)).reset_index(drop=True)
+    table = pd.concat([table, matched.add_prefix(prefix)], axis=1)
+    table[prefix + ('gap' if relation in ('preceding', 'following') else 'overlap')] = measures
+    return table
+
+
+def align(anchor, others, by=None, how='left'):
+    # chain joins from the anchor intervals: others is a list of
+    # (name, frame, relation); each one adds name_* columns
+    table = anchor
+    for name, frame, relation in others:
+        table = join_intervals(table, frame, relation, by=by, prefix=f'{name}_', how=how)
+    return table
+
+
+def textgrid_intervals(path):
+    return pd.DataFrame(textgrid_rows(path), columns=INTERVAL_FIELDS)
+
+
+def align_textgrid(path, anchor, others, how='left'):
+    # one TextGrid: anchor is a tier name, others maps tier name -> relation
+    frame = textgrid_intervals(path)
+    tiers = {name: group.drop(columns='tier') for name, group in frame.groupby('tier', sort=False)}
+    empty = frame.iloc[:0].drop(columns='tier')
+    if anchor not in tiers:
+        print(f"No labelled intervals on tier '{anchor}' in {path}, skipping")
+    table = align(tiers.get(anchor, empty),
+                  [(name, tiers.get(name, empty), relation) for name, relation in others.items()], how=how)
+    table.insert(0, 'path', path)
+    return table
+
+
+def align_directory(directory, anchor, others, pattern=TEXTGRID_PATTERN, workers=None, how='left'):
+    # align_textgrid over every TextGrid of a directory tree, as one table
+    files = scan_files(directory, pattern)
+    tables = parallel_map(partial(align_textgrid, anchor=anchor, others=others, how=how), files, workers=workers)
+    tables = [table for table in tables if len(table)]
+    if not tables:
+        raise ValueError(f"No TextGrids with tier '{anchor}' in {directory}")
+    return pd.concat(tables, ignore_index=True)
+
+
+def split_spec(spec):
+    # 'vowels/tones:vowel' -> ('vowels/tones', 'vowel'); a bare tier name
+    # has no dataset (see align_corpus)
+    dataset, _, tier = spec.rpartition(':')
+    return dataset or None, tier
+
+
+def spec_name(spec):
+    dataset, tier = split_spec(spec)
+    return dataset.split('/')[-1] if dataset else tier
+
+
+def align_corpus(anchor, others, index=None, by='word', how='left'):
+    # across datasets: tiers are 'dataset:tier' specs and intervals of
+    # different TextGrids are related when they share `by` (the word, i.e.
+    # the file stem); intervals come from the label index, not a reparse.
+    # A bare tier name on the right is joined once per dataset that has the
+    # tier (columns <dataset>_*): one word's recordings in different
+    # datasets overlap each other, so they cannot be one right-hand side
+    close = index is None
+    index = index or LabelIndex(INDEX_PATH)
+    try:
+        def intervals(spec):
+            dataset, tier = split_spec(spec)
+            return index.find(dataset=dataset, tier=tier)
+        frames = []
+        for spec, relation in others.items():
+            dataset, tier = split_spec(spec)
+            found = intervals(spec)
+            if dataset is None and found['dataset'].nunique() > 1:
+                frames += [(f"{name.split('/')[-1]}_{tier}", group.drop(columns=['path', 'dataset']), relation)
+                           for name, group in found.groupby('dataset', sort=True)]
+            else:
+                frames.append((spec_name(spec), found.drop(columns=['path', 'dataset']), relation))
+        return align(intervals(anchor), frames, by=by, how=how)
+    finally:
+        if close:
+            index.close()
@@ -1,44 +1,72 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
+
 import numpy as np
+import pandas as pd
+
+from contours import UNITS, load_tone_contours, partial_label_means, tone_corpus_partial
+from instrument import span
 
-df = pd.read_csv('data/vowels/tones/mean_f0_results.tsv', sep='\t')
 tone_categories = ['T1', 'T2', 'T3', 'T4']
-df_filtered = df[df['Segment label'].isin(tone_categories)]
-f0_columns = [f'F0_{i}' for i in range(1, 21)]
-for col in f0_columns:
-    df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce')
-normalized_time = np.linspace(0, 1, 20)
-plt.figure(figsize=(12, 8))
-colors = {'T1': 'red', 'T2': 'blue', 'T3': 'green', 'T4': 'purple'}
-sample_counts = df_filtered['Segment label'].value_counts()
-for tone in tone_categories:
-    tone_data = df_filtered[df_filtered['Segment label'] == tone]
-    f0_values = tone_data[f0_columns].values
-    mean_f0 = np.nanmean(f0_values, axis=0)
-    std_f0 = np.nanstd(f0_values, axis=0)
-    count = sample_counts.get(tone, 0)
-    plt.plot(normalized_time, mean_f0, 
-             color=colors[tone], 
-             linewidth=2, 
-             label=f'{tone} (n={count})',
-             marker='o', 
-             markersize=4)
-    plt.fill_between(normalized_time, 
-                     mean_f0 - std_f0, 
-                     mean_f0 + std_f0, 
-                     alpha=0.3, 
-                     color='gray')
-plt.xlabel('Normalized Duration', fontsize=20)
-plt.ylabel('Pitch (Hz)', fontsize=20)
-# plt.title('Mean F0 with Error Bars (±1 SD) for Tone Categories', fontsize=20, pad=20)
-plt.legend(title='Tone Category', fontsize=14, title_fontsize=16, loc='upper right')
-plt.grid(True, alpha=0.3)
-plt.xticks(fontsize=18)
-plt.yticks(fontsize=18)
-# plt.ylim(bottom=120)
-plt.tight_layout()
-plt.savefig('pics/tones.png', dpi=300, bbox_inches='tight')
-plt.show()
-print("Number of segments per tone category:")
-print(df_filtered['Segment label'].value_counts().sort_index())
\ No newline at end of file
+
+
+def plot_tones(save_path='pics/tones.png', source='data/vowels/tones/mean_f0_results.tsv',
+               normalization='hz', speaker_column=None, n_points=None, dpi=300, show=True, workers=None):
+    import matplotlib.pyplot as plt
+
+    if os.path.isdir(source):
+        # a sharded corpus: each speaker is normalized within its shard and
+        # the mean/SD contours come from the merged per-shard partials
+        with span('tones/shards', path=source):
+            stats = tone_corpus_partial(source, tone_categories, normalization, n_points, workers=workers)
+        unit = normalization
+        normalized_time = np.linspace(0, 1, len(stats.columns) - 1)
+        _, mean_f0s, std_f0s, counts = partial_label_means(stats, tone_categories)
+        token_counts = pd.Series(counts, index=pd.Index(tone_categories, name='Label'), name='count')
+    else:
+        with span('tones/load', path=source) as stage:
+            contours = load_tone_contours(source, labels=tone_categories)
+            stage.count(rows=len(contours))
+        with span('tones/aggregate', rows=len(contours), normalization=normalization):
+            contours = contours.normalize(normalization, by=speaker_column)
+            if n_points is not None:
+                contours = contours.resample(n_points)
+            # every tone's mean/SD contour in one pass over the F0 matrix
+            _, mean_f0s, std_f0s, counts = contours.label_means(tone_categories)
+        unit = contours.unit
+        normalized_time = contours.times
+        token_counts = contours.tokens['Label'].value_counts().sort_index()
+    plt.figure(figsize=(12, 8))
+    colors = {'T1': 'red', 'T2': 'blue', 'T3': 'green', 'T4': 'purple'}
+    for tone, mean_f0, std_f0, count in zip(tone_categories, mean_f0s, std_f0s, counts):
+        plt.plot(normalized_time, mean_f0, 
+                 color=colors[tone], 
+                 linewidth=2, 
+                 label=f'{tone} (n={count})',
+                 marker='o', 
+                 markersize=4)
+        plt.fill_between(normalized_time, 
+                         mean_f0 - std_f0, 
+                         mean_f0 + std_f0, 
+                         alpha=0.3, 
+                         color='gray')
+    plt.xlabel('Normalized Duration', fontsize=20)
+    plt.ylabel(f'Pitch ({UNITS[unit]})', fontsize=20)
+    # plt.title('Mean F0 with Error Bars (±1 SD) for Tone Categories', fontsize=20, pad=20)
+    plt.legend(title='Tone Category', fontsize=14, title_fontsize=16, loc='upper right')
+    plt.grid(True, alpha=0.3)
+    plt.xticks(fontsize=18)
+    plt.yticks(fontsize=18)
+    # plt.ylim(bottom=120)
+    plt.tight_layout()
+    with span('tones/savefig', path=save_path, dpi=dpi):
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
+    if show:
+        plt.show()
+    else:
+        plt.close()
+    print("Number of segments per tone category:")
+    print(token_counts)
+
+
+if __name__ == "__main__":
+    plot_tones()
@@ -0,0 +1,109 @@
+import numpy as np
+
+TOKEN_KEYS = ['Filename', 'vowel']
+
+
+def _token_order(df, by, time):
+    grouped = df.groupby(by, sort=True, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    times = df[time].to_numpy(dtype=np.float64)
+    order = np.lexsort((times, codes))
+    bounds = np.searchsorted(codes[order], np.arange(grouped.ngroups + 1))
+    return order, bounds, times[order]
+
+
+def extract_timepoints(df, timepoints=(25, 50, 75), by=TOKEN_KEYS, time='VowelPercent',
+                       columns=('F1', 'F2'), method='nearest'):
+    # one row per token and requested timepoint; 'nearest' picks the measured
+    # frame closest to it (earlier frame on ties), 'interp' interpolates linearly
+    by = list(by)
+    columns = list(columns)
+    df = df.dropna(subset=by + [time])
+    order, bounds, times = _token_order(df, by, time)
+    starts, ends = bounds[:-1], bounds[1:]
+    targets = np.asarray(timepoints, dtype=np.float64)
+    n_tokens, n_points = len(starts), len(targets)
+    lo = np.repeat(starts, n_points)
+    hi = np.repeat(ends, n_points)
+    target = np.tile(targets, n_tokens)
+    if n_tokens:
+        # offset each token's sorted times by its slot so that a single global
+        # searchsorted never leaves the token
+        t_min = times.min()
+        span = times.max() - t_min + 1
+        slots = np.repeat(np.arange(n_tokens), ends - starts)
+        keys = slots * span + (times - t_min)
+        query = np.repeat(np.arange(n_tokens), n_points) * span + (np.clip(target, t_min, times.max()) - t_min)
+        right = np.clip(np.searchsorted(keys, query), lo, hi - 1)
+    else:
+        right = lo
+    left = np.clip(right - 1, lo, hi - 1)
+
+    token_rows = df.iloc[order[starts]][by].reset_index(drop=True)
+    if method == 'nearest':
+        pick = np.where(np.abs(times[left] - target) <= np.abs(times[right] - target), left, right)
+        result = df.iloc[order[pick]].reset_index(drop=True)
+    elif method == 'interp':
+        span = times[right] - times[left]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(span > 0, (target - times[left]) / span, 0.0)
+        weight = np.clip(weight, 0.0, 1.0)
+        result = token_rows.loc[np.repeat(np.arange(n_tokens), n_points)].reset_index(drop=True)
+        result[time] = np.clip(target, times[lo], times[hi - 1])
+        for col in columns:
+            values = df[col].to_numpy(dtype=np.float64)[order]
+            result[col] = values[left] + weight * (values[right] - values[left])
+    else:
+        raise ValueError(f"Unknown method: {method}")
+    result['timepoint'] = target
+    return result
+
+
+def trajectory_array(points, timepoints=(25, 50, 75), by=TOKEN_KEYS, columns=('F2', 'F1')):
+    # (tokens x timepoints x columns) array from extract_timepoints output
+    n_points = len(timepoints)
+    tokens = points[list(by)].iloc[::n_points].reset_index(drop=True)
+    coords = points[list(columns)].to_numpy(dtype=np.float64).reshape(len(tokens), n_points, len(columns))
+    return tokens, coords
+
+
+def arrow_polygons(starts, ends, head_width, head_length, width=0.001):
+    # vertices of matplotlib's FancyArrow (shape='full', length_includes_head=True)
+    # for many arrows at once
+    delta = ends - starts
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    hw, hl, lw = head_width / 2, head_length, width / 2
+    along = np.stack([
+        np.zeros_like(length), np.full_like(length, -hl), np.full_like(length, -hl), -length,
+        -length, np.full_like(length, -hl), np.full_like(length, -hl), np.zeros_like(length),
+    ], axis=1)
+    across = np.array([0.0, -hw, -lw, -lw, lw, lw, hw, 0.0])[None, :].repeat(len(length), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos = np.where(length > 0, delta[:, 0] / length, 0.0)[:, None]
+        sin = np.where(length > 0, delta[:, 1] / length, 1.0)[:, None]
+    x = along * cos - across * sin + ends[:, 0:1]
+    y = along * sin + across * cos + ends[:, 1:2]
+    return np.stack([x, y], axis=2)
+
+
+def draw_trajectories(ax, tokens, coords, color_dict, category='vowel', point_size=1,
+                      head_width=10, head_length=12, max_token_labels=20, fontsize=25):
+    from matplotlib.collections import PolyCollection
+
+    categories = tokens[category].astype(str).to_numpy()
+    for name, color in color_dict.items():
+        mask = categories == name
+        if not mask.any():
+            continue
+        paths = coords[mask]
+        flat = paths.reshape(-1, paths.shape[-1])
+        ax.scatter(flat[:, 0], flat[:, 1], color=color, s=point_size, zorder=3)
+        starts = paths[:, :-1].reshape(-1, 2)
+        ends = paths[:, 1:].reshape(-1, 2)
+        arrows = arrow_polygons(starts, ends, head_width, head_length)
+        ax.add_collection(PolyCollection(arrows, facecolors=[color], edgecolors=[color], zorder=2))
+        # one label per token while that stays readable, else one at the mean onset
+        onsets = paths[:, 0] if mask.sum() <= max_token_labels else np.nanmean(paths[:, 0], axis=0, keepdims=True)
+        for x, y in onsets:
+            ax.text(x, y, name, fontsize=fontsize, fontweight='bold',
+                    color=color, ha='center', va='center')
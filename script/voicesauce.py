@@ -0,0 +1,97 @@
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from corpus import parallel_map, scan_files
+from instrument import file_span
+from textgrid import read_textgrid
+
+MAT_PATTERN = r'^\d+_[\w-]+\.mat$'
+MEASURES = ['HNR05', 'soe']
+FRAME_COLUMNS = ['Filename', 'Label', 'seg_Start', 'seg_End', 't_ms']
+
+
+def read_voicesauce(path, variables=MEASURES):
+    # only the requested tracks are read; VoiceSauce stores one column vector
+    # per measure plus the frame shift in ms
+    from scipy.io import loadmat
+    names = list(variables) + ['frameshift']
+    try:
+        data = loadmat(path, variable_names=names, squeeze_me=True)
+    except NotImplementedError:
+        # MATLAB v7.3 files are HDF5: datasets are read lazily through h5py
+        import h5py
+        with h5py.File(path, 'r') as file:
+            data = {name: np.asarray(file[name]).ravel() for name in names if name in file}
+    missing = [name for name in names if name not in data]
+    if missing:
+        raise KeyError(f"{os.path.basename(path)} has no {missing}")
+    frameshift = float(np.asarray(data['frameshift']).ravel()[0])
+    tracks = {name: np.atleast_1d(np.asarray(data[name], dtype=np.float64)).ravel() for name in variables}
+    return tracks, frameshift
+
+
+def interval_frames(starts_ms, ends_ms, frameshift, n_frames):
+    # VoiceSauce frame k (1-based) sits at k * frameshift ms; like its text
+    # export, a segment runs from the frame nearest its start to the frame
+    # nearest its end (MATLAB round, halves away from zero)
+    first = np.maximum(np.floor(np.asarray(starts_ms) / frameshift + 0.5).astype(np.int64), 1)
+    last = np.minimum(np.floor(np.asarray(ends_ms) / frameshift + 0.5).astype(np.int64), n_frames)
+    counts = np.clip(last - first + 1, 0, None)
+    segments = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return segments, first[segments] + offsets
+
+
+def mat_frame_table(mat_path, tier_name='sonorant', variables=MEASURES):
+    # frame-level rows in the layout of the VoiceSauce text export
+    with file_span(mat_path) as file:
+        table = _mat_frame_table(mat_path, tier_name, variables)
+        file.count(rows=len(table))
+    return table
+
+
+def _mat_frame_table(mat_path, tier_name, variables):
+    filename = os.path.basename(mat_path)
+    textgrid_path = os.path.splitext(mat_path)[0] + '.TextGrid'
+    columns = FRAME_COLUMNS + list(variables)
+    if not os.path.exists(textgrid_path):
+        print(f"No TextGrid next to {filename}, skipping")
+        return pd.DataFrame(columns=columns)
+    tier = read_textgrid(textgrid_path).tier(tier_name)
+    if tier is None or tier.is_point_tier:
+        print(f"No interval tier '{tier_name}' for {filename}, skipping")
+        return pd.DataFrame(columns=columns)
+    labelled = np.array([text.strip() != '' for text in tier.texts], dtype=bool)
+    labels = np.array([text.strip() for text in tier.texts], dtype=object)[labelled]
+    starts_ms = tier.starts[labelled] * 1000
+    ends_ms = tier.ends[labelled] * 1000
+    tracks, frameshift = read_voicesauce(mat_path, variables)
+    n_frames = min(len(track) for track in tracks.values())
+    segments, frames = interval_frames(starts_ms, ends_ms, frameshift, n_frames)
+    table = pd.DataFrame({
+        'Filename': filename,
+        'Label': labels[segments],
+        'seg_Start': starts_ms[segments],
+        'seg_End': ends_ms[segments],
+        't_ms': frames * frameshift,
+    })
+    for name in variables:
+        table[name] = tracks[name][frames - 1]
+    return table[columns]
+
+
+def load_voicesauce_frames(directory='data/sonorants', tier_name='sonorant', variables=MEASURES,
+                           pattern=MAT_PATTERN, workers=None):
+    mat_files = scan_files(directory, pattern)
+    frames = parallel_map(partial(mat_frame_table, tier_name=tier_name, variables=list(variables)),
+                          mat_files, workers=workers)
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=FRAME_COLUMNS + list(variables))
+    df = pd.concat(frames, ignore_index=True)
+    for col in ('Filename', 'Label'):
+        df[col] = df[col].astype('category')
+    return df
@@ -1,83 +1,338 @@
 import os
-import re
+from functools import partial
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
+
+from audio import paired_wav, read_wav
+from cache import FileManifest, relative_key
+from corpus import TEXTGRID_PATTERN, parallel_map, scan_files
+from groupstats import PartialStats, grouped_stats
+from instrument import file_span, span
+from onsets import measure_onsets
+from resampling import N_RESAMPLES, bootstrap_ci, contrast_table
+from shards import SHARD_COLUMNS, SPEAKER_COLUMN, cached_partial, find_shards, map_shards, merge_shards, tag_shard
+from textgrid import interval_tier, point_tier, read_textgrid, replace_tier, write_textgrid
+
+INTERVAL_COLUMNS = ['filename', 'interval_sequence', 'xmin', 'xmax', 'text']
+MEASURE_COLUMNS = ['label', 'vot', 'vot_manual', 'burst', 'voicing', 'burst_rise', 'flag']
+MEASURES = ('manual', 'auto')
+# unaspirated vs aspirated at each place
+VOT_CONTRASTS = [('p', 'pʰ'), ('t', 'tʰ'), ('k', 'kʰ'), ('ts', 'tsʰ'), ('tɕ', 'tɕʰ')]
+# tiers added by TextGridProcessor.write_tiers
+AUTO_TIER = 'vot-auto'
+CHECK_TIER = 'vot-check'
+
+def parse_tier_frame(file_path, tier_name):
+    with file_span(file_path) as file:
+        frame = _tier_frame(file_path, tier_name)
+        file.count(rows=len(frame))
+    return frame
+
+def _tier_frame(file_path, tier_name):
+    filename = os.path.basename(file_path)
+    tier = read_textgrid(file_path).tier(tier_name)
+    if tier is None or tier.is_point_tier:
+        print(f"No interval tier '{tier_name}' in {filename}, skipping")
+        return pd.DataFrame(columns=INTERVAL_COLUMNS)
+    texts = pd.Series(tier.texts, dtype=str)
+    return pd.DataFrame({
+        'filename': filename,
+        'interval_sequence': np.arange(1, len(tier) + 1),
+        'xmin': tier.starts,
+        'xmax': tier.ends,
+        'text': texts.where(texts.str.strip() != '', np.nan)
+    }, columns=INTERVAL_COLUMNS)
+
+def split_labels(df):
+    # "p 16" -> label p, vot 16; a label typed without a number keeps an empty vot
+    parts = df['text'].str.strip().str.partition(' ')
+    df['label'] = parts[0]
+    number = parts[2].str.strip()
+    df['vot'] = number.where(number != '')
+    return df
+
+def measure_tier_frame(file_path, tier_name, settings=None, tolerance=10.0):
+    # the labelled intervals of one TextGrid with VOT measured from the WAV
+    # next to it; the typed value, if any, is kept as vot_manual
+    frame = parse_tier_frame(file_path, tier_name)
+    frame = split_labels(frame[frame['text'].notna()].reset_index(drop=True))
+    frame['vot_manual'] = frame['vot']
+    wav_path = paired_wav(file_path)
+    if wav_path is None or not len(frame):
+        if len(frame):
+            print(f"No WAV next to {os.path.basename(file_path)}, keeping the typed VOT")
+        for column in ['burst', 'voicing', 'burst_rise']:
+            frame[column] = np.nan
+        frame['flag'] = 'no audio'
+        return frame
+    burst, voicing, rise, flags = measure_onsets(read_wav(wav_path), frame['xmin'].to_numpy(np.float64),
+                                                 frame['xmax'].to_numpy(np.float64), settings)
+    vot = np.round((voicing - burst) * 1000)
+    manual = pd.to_numeric(frame['vot_manual'], errors='coerce').to_numpy(np.float64)
+    flags = np.where((flags == '') & (np.abs(vot - manual) > tolerance), 'mismatch', flags)
+    frame['vot'] = vot
+    frame['burst'] = burst
+    frame['voicing'] = voicing
+    frame['burst_rise'] = np.round(rise, 2)
+    frame['flag'] = flags
+    return frame
 
 class TextGridProcessor:
-    def __init__(self, directory_path, output_path=None):
+    def __init__(self, directory_path, output_path=None, tier_name='vot',
+                 pattern=TEXTGRID_PATTERN, recursive=True, workers=None,
+                 measure='manual', onset_settings=None, tolerance=10.0, shard=None):
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown VOT measure: {measure} (choose from {list(MEASURES)})")
         self.directory_path = directory_path
+        self.tier_name = tier_name
+        self.measure = measure
+        self.onset_settings = onset_settings
+        self.tolerance = tolerance
+        self.pattern = pattern
+        self.recursive = recursive
+        self.workers = workers
+        # a speaker shard ('S01' or 'S01/session2') tags its rows with Speaker and Session
+        self.shard = shard
         self.voiced_stops = ['p','t','k']
         self.voiceless_stops = ['pʰ','tʰ','kʰ']
         if output_path is None:
-            self.output_path = os.path.join(self.directory_path, "textgrid_summary.csv")
+            filename = "textgrid_summary.csv" if measure == 'manual' else f"textgrid_summary_{measure}.csv"
+            self.output_path = os.path.join(self.directory_path, filename)
         else:
             self.output_path = output_path
-        if os.path.exists(self.output_path):
-            self.df = pd.read_csv(self.output_path)
-        else:
-            print(f"No summary file found. Calling TextGridProcessor.process_directory()...")
-            self.df = self.process_directory()
-            self.df.to_csv(self.output_path, index=False, encoding='utf-8')
-            print(f"Saving summary stat to: {self.output_path}")
+        self.manifest_path = os.path.splitext(self.output_path)[0] + '.manifest.json'
+        # (manifest, entries) of rows update_files(save=False) has not written yet
+        self.unsaved = None
+        self.df = self.load_summary()
+        if shard is not None:
+            self.df = tag_shard(self.df, shard)
     
+    def manifest(self):
+        params = {'tier_name': self.tier_name}
+        if self.measure != 'manual':
+            params.update(measure=self.measure, onset_settings=self.onset_settings, tolerance=self.tolerance)
+        return FileManifest(self.manifest_path, self.directory_path, params)
+
+    def load_summary(self):
+        manifest = self.manifest()
+        cached = None
+        if manifest.entries and manifest.output_matches(self.output_path):
+            with span('vot/read-summary', path=self.output_path) as stage:
+                cached = pd.read_csv(self.output_path, dtype={'vot': str, 'vot_manual': str},
+                                     float_precision='round_trip')
+                stage.count(rows=len(cached))
+            # a summary from an older version of this script lacks columns
+            # (path, the auto measures) the incremental update relies on
+            if not set(self.summary_columns()) <= set(cached.columns):
+                cached = None
+        if cached is None:
+            manifest.entries = {}
+            if os.path.exists(self.output_path):
+                print(f"{self.output_path} has no matching manifest, checking it against the TextGrids...")
+            else:
+                print(f"No summary file found. Calling TextGridProcessor.process_directory()...")
+        textgrid_files = self.find_textgrid_files()
+        audio = self.find_audio_files(textgrid_files)
+        entries, changed, deleted = manifest.compare(textgrid_files + list(audio))
+        # a new, edited or removed recording means remeasuring its TextGrid
+        stems = {os.path.splitext(relative_key(path, self.directory_path))[0]: path for path in textgrid_files}
+        changed = sorted({audio.get(path, path) for path in changed}
+                         | {stems[os.path.splitext(key)[0]] for key in deleted
+                            if os.path.splitext(key)[0] in stems})
+        if cached is not None and not changed and not deleted:
+            manifest.save(entries, [self.output_path])
+            return cached
+        df = self.process_directory(changed)
+        if cached is not None:
+            print(f"Reparsed {len(changed)} changed file(s), dropped {len(deleted)} deleted file(s)")
+            stale = set(deleted) | {relative_key(path, self.directory_path) for path in changed}
+            cached = cached[~cached['path'].isin(stale)]
+            df = pd.concat([frame for frame in (cached, df) if len(frame)] or [df], ignore_index=True)
+            df = df.sort_values(['path', 'interval_sequence'], kind='stable', ignore_index=True)
+        self.save_summary(df, manifest, entries)
+        return df
+
+    def save_summary(self, df, manifest, entries):
+        with span('vot/write-summary', path=self.output_path, rows=len(df)):
+            text = df.to_csv(index=False)
+            # a summary that already holds these rows (e.g. the tracked CSV in
+            # a fresh clone, which has no manifest yet) is adopted, not rewritten
+            if os.path.exists(self.output_path):
+                with open(self.output_path, 'r', encoding='utf-8', newline='') as file:
+                    if file.read() == text:
+                        manifest.save(entries, [self.output_path])
+                        return
+            # write then rename so concurrent builds never read a half-written summary
+            tmp_path = f'{self.output_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as file:
+                file.write(text)
+        os.replace(tmp_path, self.output_path)
+        manifest.save(entries, [self.output_path])
+        print(f"Saving summary stat to: {self.output_path}")
+
+    def update_files(self, paths, save=True):
+        # reparse just these TextGrids (a missing one drops out) instead of
+        # checking the whole directory; returns whether the rows changed.
+        # save=False leaves writing the summary to flush_summary()
+        manifest = self.manifest()
+        entries = dict(manifest.entries)
+        present = [path for path in paths if os.path.exists(path)]
+        removed = [relative_key(path, self.directory_path) for path in paths if not os.path.exists(path)]
+        removed = [key for key in removed if key in entries]
+        current, changed, _ = manifest.compare(present)
+        entries.update(current)
+        for key in removed:
+            del entries[key]
+        if not changed and not removed:
+            return False
+        df = self.process_directory(changed)
+        if self.shard is not None:
+            df = tag_shard(df, self.shard)
+        stale = set(removed) | {relative_key(path, self.directory_path) for path in changed}
+        kept = self.df[~self.df['path'].isin(stale)]
+        df = pd.concat([frame for frame in (kept, df) if len(frame)] or [df], ignore_index=True)
+        self.df = df.sort_values(['path', 'interval_sequence'], kind='stable', ignore_index=True)
+        print(f"Reparsed {len(changed)} changed file(s), dropped {len(removed)} deleted file(s)")
+        self.unsaved = (manifest, entries)
+        if save:
+            self.flush_summary()
+        return True
+
+    def flush_summary(self):
+        if self.unsaved is None:
+            return
+        manifest, entries = self.unsaved
+        summary = self.df.drop(columns=SHARD_COLUMNS) if self.shard is not None else self.df
+        self.save_summary(summary, manifest, entries)
+        self.unsaved = None
+    
+    def summary_columns(self):
+        columns = INTERVAL_COLUMNS[:1] + ['path'] + INTERVAL_COLUMNS[1:]
+        return columns + (MEASURE_COLUMNS if self.measure == 'auto' else ['label', 'vot'])
+
     def find_textgrid_files(self):
-        pattern = re.compile(r'^\d+_[a-zA-Z_]+\.TextGrid$', re.IGNORECASE)
-        textgrid_files = []
-        for file in os.listdir(self.directory_path):
-            if pattern.match(file):
-                textgrid_files.append(os.path.join(self.directory_path, file))
-        return textgrid_files
+        return scan_files(self.directory_path, self.pattern, recursive=self.recursive)
+
+    def find_audio_files(self, textgrid_files):
+        # WAV path -> its TextGrid; only automatic measurements depend on audio
+        if self.measure == 'manual':
+            return {}
+        audio = {}
+        for path in textgrid_files:
+            wav_path = paired_wav(path)
+            if wav_path is not None:
+                audio[wav_path] = path
+        return audio
     
     def parse_textgrid_file(self, file_path):
-        intervals_data = []
-        filename = os.path.basename(file_path)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        vot_pattern = r'name = "vot".*?intervals: size = (\d+)(.*?)(?=item \[|\Z)'
-        vot_match = re.search(vot_pattern, content, re.DOTALL)
-        intervals_content = vot_match.group(2)
-        interval_pattern = r'intervals \[(\d+)\]:\s*xmin = ([\d.]+)\s*xmax = ([\d.]+)\s*text = "([^"]*)"'
-        intervals = re.findall(interval_pattern, intervals_content)
-        for seq, xmin, xmax, text in intervals:
-            intervals_data.append({
-                'filename': filename,
-                'interval_sequence': int(seq),
-                'xmin': float(xmin),
-                'xmax': float(xmax),
-                'text': text if text.strip() != '' else np.nan
-            })
-        return intervals_data
+        return parse_tier_frame(file_path, self.tier_name)
     
-    def process_directory(self):
-        textgrid_files = self.find_textgrid_files()
-        total_intervals = 0
-        data = []
-        for file_path in textgrid_files:
-            intervals = self.parse_textgrid_file(file_path)
-            data.extend(intervals)
-            total_intervals += len(intervals)
-        df = pd.DataFrame(data, columns=['filename', 'interval_sequence', 'xmin', 'xmax', 'text'])
+    def process_directory(self, textgrid_files=None):
+        if textgrid_files is None:
+            textgrid_files = self.find_textgrid_files()
+        if self.measure == 'auto':
+            parse = partial(measure_tier_frame, tier_name=self.tier_name, settings=self.onset_settings,
+                            tolerance=self.tolerance)
+        else:
+            parse = partial(parse_tier_frame, tier_name=self.tier_name)
+        with span('vot/parse', files=len(textgrid_files)) as stage:
+            frames = parallel_map(parse, textgrid_files, workers=self.workers)
+            stage.count(rows=sum(len(frame) for frame in frames))
+        for file_path, frame in zip(textgrid_files, frames):
+            frame.insert(1, 'path', relative_key(file_path, self.directory_path))
+        frames = [frame for frame in frames if len(frame)]
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+        else:
+            # nothing to parse (e.g. only deletions): the empty frame already has every column
+            return pd.DataFrame(columns=self.summary_columns())
         df = df[df['text'].notna()]
-        df['label'] = df['text'].apply(lambda x: x.split(' ')[0])
-        df['vot'] = df['text'].apply(lambda x: x.split(' ')[1])
+        if self.measure == 'manual':
+            with span('vot/split-labels', rows=len(df)):
+                df = split_labels(df)
         return df
+
+    def flagged(self):
+        if 'flag' not in self.df:
+            return self.df.iloc[:0]
+        return self.df[self.df['flag'].fillna('') != '']
+
+    def write_tiers(self, output_directory=None):
+        # the measured VOT as an interval tier (burst to voicing onset, "p 16"
+        # labels) plus a point tier marking the tokens to check, written into
+        # copies of the TextGrids under output_directory (default: in place)
+        if self.measure != 'auto':
+            raise ValueError("write_tiers needs measure='auto'")
+        output_directory = output_directory or self.directory_path
+        for path, rows in self.df.groupby('path', sort=False):
+            textgrid = read_textgrid(os.path.join(self.directory_path, path))
+            measured = rows[rows['burst'].notna() & rows['voicing'].notna()]
+            starts = np.minimum(measured['burst'], measured['voicing']).to_numpy(np.float64)
+            ends = np.maximum(measured['burst'], measured['voicing']).to_numpy(np.float64)
+            texts = [f"{label} {vot:.0f}" for label, vot in zip(measured['label'], measured['vot'].astype(float))]
+            flags = rows[rows['flag'].fillna('') != '']
+            times = flags['burst'].fillna(flags['xmin']).to_numpy(np.float64)
+            notes = [f"{label}: {flag}" for label, flag in zip(flags['label'], flags['flag'])]
+            try:
+                textgrid = replace_tier(textgrid, interval_tier(AUTO_TIER, textgrid.xmin, textgrid.xmax,
+                                                                starts, ends, texts))
+            except ValueError as error:
+                print(f"Skipping {path}: {error}")
+                continue
+            textgrid = replace_tier(textgrid, point_tier(CHECK_TIER, textgrid.xmin, textgrid.xmax, times, notes))
+            out_path = os.path.join(output_directory, path)
+            os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+            write_textgrid(textgrid, out_path)
+        print(f"Wrote '{AUTO_TIER}' and '{CHECK_TIER}' tiers for {self.df['path'].nunique()} file(s) "
+              f"to: {output_directory}")
     
-    def calculate_statistics(self):
-        self.df['vot'] = pd.to_numeric(self.df['vot'], errors='coerce')
-        stats = self.df.groupby('label').agg(
-            N=('vot', 'count'),
-            Mean=('vot', 'mean'),
-            SD=('vot', 'std'),
-            Minimum=('vot', 'min'),
-            Maximum=('vot', 'max')
-        ).reset_index()
-        stats.columns = ['Phoneme', 'N', 'Mean', 'SD', 'Minimum', 'Maximum']
+    def calculate_statistics(self, confidence=None, n_resamples=N_RESAMPLES, seed=0):
+        # with a confidence level, bootstrap percentile CIs of the mean are added
+        with span('vot/aggregate', rows=len(self.df)):
+            self.df['vot'] = pd.to_numeric(self.df['vot'], errors='coerce')
+            stats = grouped_stats(self.df, 'label', ['vot'])['vot'].reset_index()
+            stats.columns = ['Phoneme', 'N', 'Mean', 'SD', 'Minimum', 'Maximum']
+        if confidence is not None:
+            with span('vot/bootstrap', rows=len(self.df), resamples=n_resamples):
+                cis = bootstrap_ci(self.df, 'label', 'vot', confidence, n_resamples, seed)
+            stats['CI low'] = cis['CI low'].reindex(stats['Phoneme']).to_numpy()
+            stats['CI high'] = cis['CI high'].reindex(stats['Phoneme']).to_numpy()
         return stats
+
+    def partial_stats(self):
+        # mergeable per-label VOT stats (per Speaker/Session too for a shard),
+        # cached beside the summary until the summary itself is rewritten
+        by = (SHARD_COLUMNS if self.shard is not None else []) + ['label']
+
+        def build():
+            df = self.df.assign(vot=pd.to_numeric(self.df['vot'], errors='coerce'))
+            return PartialStats.from_frame(df, by, ['vot'])
+        name = os.path.splitext(os.path.basename(self.output_path))[0]
+        return cached_partial(os.path.dirname(self.output_path) or '.', name, [self.output_path],
+                              {'by': by, 'shard': self.shard}, build)
+
+    def contrasts(self, pairs=VOT_CONTRASTS, confidence=0.95, n_resamples=N_RESAMPLES, seed=0):
+        self.df['vot'] = pd.to_numeric(self.df['vot'], errors='coerce')
+        return contrast_table(self.df, 'label', 'vot', pairs, confidence, n_resamples, seed)
+
+    def _error_bar(self, row, error):
+        # +-SD, or the bootstrap CI around the mean; none for single tokens
+        if row['N'] <= 1:
+            return None
+        if error == 'ci':
+            if pd.isna(row['CI low']):
+                return None
+            return [[row['Mean'] - row['CI low']], [row['CI high'] - row['Mean']]]
+        return None if pd.isna(row['SD']) else row['SD']
     
-    def plot_vot_bar(self, save_path="vot_bar_plot.png"):
-        stats = self.calculate_statistics()
+    def plot_vot_bar(self, save_path="vot_bar_plot.png", dpi=300, show=True,
+                     error='sd', confidence=0.95, n_resamples=N_RESAMPLES, seed=0):
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Patch
+
+        if error not in ('sd', 'ci'):
+            raise ValueError(f"Unknown error bars: {error} (choose 'sd' or 'ci')")
+        stats = self.calculate_statistics(confidence if error == 'ci' else None, n_resamples, seed)
         plosives = ['p', 'pʰ', 't', 'tʰ', 'k', 'kʰ']
         stats = stats[stats['Phoneme'].isin(plosives)].reset_index()
         place_mapping = {
@@ -111,8 +366,9 @@ class TextGridProcessor:
             labels.append(row['Phoneme'])
             
             # error bar
-            if not pd.isna(row['SD']) and row['N'] > 1:  # only when N > 1
-                plt.errorbar(idx, row['Mean'], yerr=row['SD'], 
+            yerr = self._error_bar(row, error)
+            if yerr is not None:
+                plt.errorbar(idx, row['Mean'], yerr=yerr, 
                             color='black', capsize=5, capthick=1.5, linewidth=1.5)
             
             plt.text(idx, row['Mean'] + (2 if row['Mean'] > 0 else -10), 
@@ -143,12 +399,22 @@ class TextGridProcessor:
         ]
         plt.legend(handles=legend_elements, fontsize=18)
         plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        with span('vot/savefig', path=save_path, dpi=dpi):
+            plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
         print(f"Bar plot saved to: {save_path}")
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close()
+
+    def plot_affricates_bar(self, save_path="affricates_bar_plot.png", dpi=300, show=True,
+                            error='sd', confidence=0.95, n_resamples=N_RESAMPLES, seed=0):
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Patch
 
-    def plot_affricates_bar(self, save_path="affricates_bar_plot.png"):
-        stats = self.calculate_statistics()
+        if error not in ('sd', 'ci'):
+            raise ValueError(f"Unknown error bars: {error} (choose 'sd' or 'ci')")
+        stats = self.calculate_statistics(confidence if error == 'ci' else None, n_resamples, seed)
         affricates = ['ts', 'tsʰ', 'tɕ', 'tɕʰ']
         stats = stats[stats['Phoneme'].isin(affricates)].reset_index()
         
@@ -183,8 +449,9 @@ class TextGridProcessor:
             labels.append(row['Phoneme'])
             
             # error bar
-            if not pd.isna(row['SD']) and row['N'] > 1:  # only when N > 1
-                plt.errorbar(idx, row['Mean'], yerr=row['SD'], 
+            yerr = self._error_bar(row, error)
+            if yerr is not None:
+                plt.errorbar(idx, row['Mean'], yerr=yerr, 
                             color='black', capsize=5, capthick=1.5, linewidth=1.5)
             
             plt.text(idx, row['Mean'] + (2 if row['Mean'] > 0 else -10), 
@@ -216,9 +483,45 @@ class TextGridProcessor:
         ]
         plt.legend(handles=legend_elements, fontsize=18)
         plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        with span('vot/savefig', path=save_path, dpi=dpi):
+            plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
         print(f"Affricates bar plot saved to: {save_path}")
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close()
+
+def shard_partial(item, tier_name='vot', pattern=TEXTGRID_PATTERN, measure='manual', onset_settings=None,
+                  tolerance=10.0):
+    # one speaker shard: its own summary CSV and manifest, then its partials
+    shard_id, directory = item
+    processor = TextGridProcessor(directory, tier_name=tier_name, pattern=pattern, recursive=False, workers=1,
+                                  measure=measure, onset_settings=onset_settings, tolerance=tolerance,
+                                  shard=shard_id)
+    return processor.partial_stats()
+
+def corpus_statistics(root, tier_name='vot', by_speaker=False, workers=None, pattern=TEXTGRID_PATTERN,
+                      measure='manual', onset_settings=None, tolerance=10.0):
+    # the calculate_statistics table over every speaker shard under root,
+    # merged from per-shard partials; a new speaker only costs its own shard
+    shards = find_shards(root, pattern=pattern)
+    if not shards:
+        raise ValueError(f"No speaker directories with TextGrids under {root}")
+    with span('vot/shards', files=len(shards)):
+        partials = map_shards(partial(shard_partial, tier_name=tier_name, pattern=pattern, measure=measure,
+                                      onset_settings=onset_settings, tolerance=tolerance), shards, workers)
+    stats = merge_shards(partials, 'label', by_speaker).finalize()['vot'].reset_index()
+    stats.columns = ([SPEAKER_COLUMN] if by_speaker else []) + ['Phoneme', 'N', 'Mean', 'SD', 'Minimum', 'Maximum']
+    return stats
+
+def plot_figure(save_path, kind='plosives', directory="./data/vot/", dpi=300, show=False):
+    processor = TextGridProcessor(directory)
+    if kind == 'plosives':
+        processor.plot_vot_bar(save_path=save_path, dpi=dpi, show=show)
+    elif kind == 'affricates':
+        processor.plot_affricates_bar(save_path=save_path, dpi=dpi, show=show)
+    else:
+        raise ValueError(f"Unknown VOT figure: {kind}")
 
 if __name__ == "__main__":
     processor = TextGridProcessor("./data/vot/")
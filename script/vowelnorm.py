@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+FORMANTS = ['F1', 'F2']
+UNITS = {'hz': 'Hz', 'lobanov': 'z', 'nearey': 'log-mean', 'bark': 'Bark', 'erb': 'ERB'}
+
+
+def hz_to_bark(f):
+    # Traunmüller (1990)
+    return 26.81 * f / (1960 + f) - 0.53
+
+
+def hz_to_erb(f):
+    # Glasberg & Moore (1990) ERB-rate
+    return 21.4 * np.log10(1 + 0.00437 * f)
+
+
+def normalize_formants(df, method='hz', formants=FORMANTS, by=None):
+    # speaker-extrinsic methods (lobanov, nearey) are computed per 'by' group,
+    # e.g. a speaker column (or a list, e.g. speaker and session); by=None
+    # treats the table as one speaker
+    if method not in UNITS:
+        raise ValueError(f"Unknown normalization: {method} (choose from {list(UNITS)})")
+    formants = list(formants)
+    out = df.copy()
+    values = out[formants].astype(np.float64)
+    if method == 'bark':
+        out[formants] = hz_to_bark(values)
+    elif method == 'erb':
+        out[formants] = hz_to_erb(values)
+    elif method in ('lobanov', 'nearey'):
+        if by is None:
+            keys = np.zeros(len(out), dtype=np.int8)
+        else:
+            keys = [out[col] for col in ([by] if isinstance(by, str) else by)]
+        if method == 'lobanov':
+            grouped = values.groupby(keys)
+            out[formants] = (values - grouped.transform('mean')) / grouped.transform('std')
+        else:
+            logs = np.log(values)
+            # one log-mean over all formants of the group (Nearey's shared scale factor)
+            total = logs.sum(axis=1).groupby(keys).transform('sum')
+            count = logs.notna().sum(axis=1).groupby(keys).transform('sum')
+            out[formants] = logs.sub(total / count, axis=0)
+    else:
+        out[formants] = values
+    return out
+
+
+def confidence_scale(level):
+    # radius (in SDs) of the bivariate-normal region holding `level` of the tokens;
+    # chi-square with 2 dof has the closed form -2 ln(1 - p)
+    if not 0 < level < 1:
+        raise ValueError(f"Confidence level must be between 0 and 1, got {level}")
+    return np.sqrt(-2 * np.log(1 - level))
+
+
+def covariance_ellipses(df, x='F2', y='F1', by='vowel', scales=(1, 2), confidence=None):
+    # one ellipse per scale (radius in SDs), or with confidence levels
+    # (e.g. (0.5, 0.95)) one per level, sized to hold that share of the tokens
+    grouped = df.groupby(by, sort=True, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    xs = df[x].to_numpy(dtype=np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+    valid = (codes >= 0) & ~np.isnan(xs) & ~np.isnan(ys)
+    codes, xs, ys = codes[valid], xs[valid], ys[valid]
+    n_groups = grouped.ngroups
+    n = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.bincount(codes, xs, minlength=n_groups) / n
+        mean_y = np.bincount(codes, ys, minlength=n_groups) / n
+        dx, dy = xs - mean_x[codes], ys - mean_y[codes]
+        denom = n - 1
+        cov = np.empty((n_groups, 2, 2))
+        cov[:, 0, 0] = np.bincount(codes, dx * dx, minlength=n_groups) / denom
+        cov[:, 1, 1] = np.bincount(codes, dy * dy, minlength=n_groups) / denom
+        cov[:, 0, 1] = cov[:, 1, 0] = np.bincount(codes, dx * dy, minlength=n_groups) / denom
+    # groups with fewer than two tokens get no ellipse
+    usable = n > 1
+    eigvals = np.full((n_groups, 2), np.nan)
+    eigvecs = np.full((n_groups, 2, 2), np.nan)
+    if usable.any():
+        eigvals[usable], eigvecs[usable] = np.linalg.eigh(cov[usable])
+    eigvals = np.clip(eigvals, 0, None)
+    # eigh sorts ascending: the last eigenvector is the major axis
+    angle = np.degrees(np.arctan2(eigvecs[:, 1, 1], eigvecs[:, 0, 1]))
+    table = pd.DataFrame({
+        'count': n.astype(np.int64),
+        f'{x}_mean': mean_x,
+        f'{y}_mean': mean_y,
+        'major_sd': np.sqrt(eigvals[:, 1]),
+        'minor_sd': np.sqrt(eigvals[:, 0]),
+        'angle': angle,
+    }, index=grouped.size().index)
+    radii = {scale: scale for scale in scales} if confidence is None else \
+        {level: confidence_scale(level) for level in confidence}
+    for key, radius in radii.items():
+        table[f'width_{key}'] = 2 * radius * table['major_sd']
+        table[f'height_{key}'] = 2 * radius * table['minor_sd']
+    return table
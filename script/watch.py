@@ -0,0 +1,233 @@
+import argparse
+import os
+import queue
+import re
+import time
+
+from build_figures import DRAFT_DIR, DRAFT_DPI, FIGURE_DIR, FIGURES, input_matches, render_figure
+from corpus import TEXTGRID_PATTERN, scan_files
+
+DATA_ROOT = 'data'
+# Praat saves in bursts (several writes, sometimes a rename); a batch is
+# processed once the tree has been quiet this long
+DEBOUNCE = 0.3
+POLL_INTERVAL = 0.2
+WATCH_PATTERN = r'^[^.].*\.(TextGrid|tsv|txt)$'
+WRITE_EVENTS = {'created', 'modified', 'moved', 'deleted', 'closed'}
+
+VOT_DIRECTORY = 'data/vot'
+# aggregate -> the export it is computed from and the table it is written to
+STAT_TABLES = {
+    'vowels': ('data/vowels/monothongs/summary.tsv', 'data/vowels/monothongs/stat.csv'),
+    'tones': ('data/vowels/tones/mean_f0_results.tsv', 'data/vowels/tones/stat.csv'),
+}
+VOT_STATS = 'data/vot/stat.csv'
+
+
+def _observer():
+    # watchdog is imported on first use; without it the tree is polled
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None, None
+    return Observer, FileSystemEventHandler
+
+
+class PollingSource:
+    # size/mtime snapshots of the watched files, diffed every interval
+    def __init__(self, root, pattern=WATCH_PATTERN, interval=POLL_INTERVAL):
+        self.root = root
+        self.pattern = pattern
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for path in scan_files(self.root, self.pattern):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # removed between scandir and stat
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        snapshot = self.scan()
+        changed = {path for path, stat in snapshot.items() if self.snapshot.get(path) != stat}
+        changed |= set(self.snapshot) - set(snapshot)
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class EventSource:
+    # file system notifications through watchdog, queued by path
+    def __init__(self, root, pattern=WATCH_PATTERN):
+        Observer, FileSystemEventHandler = _observer()
+        regex = re.compile(pattern, re.IGNORECASE)
+        events = queue.Queue()
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # reads (ours included) raise opened/closed_no_write events too
+                if event.is_directory or event.event_type not in WRITE_EVENTS:
+                    return
+                for path in (event.src_path, getattr(event, 'dest_path', '')):
+                    path = os.fsdecode(path)
+                    if path and regex.match(os.path.basename(path)):
+                        events.put(path)
+
+        self.events = events
+        self.observer = Observer()
+        self.observer.schedule(Handler(), root, recursive=True)
+        self.observer.start()
+
+    def changes(self, timeout):
+        changed = set()
+        try:
+            changed.add(self.events.get(timeout=timeout))
+            while True:
+                changed.add(self.events.get_nowait())
+        except queue.Empty:
+            pass
+        return changed
+
+    def close(self):
+        self.observer.stop()
+        self.observer.join()
+
+
+def _key(path):
+    return os.path.relpath(path).replace(os.sep, '/')
+
+
+def dependent_figures(paths, figures=FIGURES):
+    # the figures in build_figures.FIGURES whose inputs match a changed path
+    keys = [_key(path) for path in paths]
+    return [name for name, spec in figures.items()
+            if any(input_matches(key, pattern) for key in keys for pattern in spec['inputs'])]
+
+
+class CorpusWatcher:
+    def __init__(self, root=DATA_ROOT, draft=True, figures=None, workers=None):
+        # draft figures (72 dpi into pics/draft) keep a save-to-figure round
+        # trip under a second; draft=False redraws pics/ at 300 dpi
+        self.root = root
+        self.out_dir = DRAFT_DIR if draft else FIGURE_DIR
+        self.dpi = DRAFT_DPI if draft else 300
+        unknown = [name for name in figures or [] if name not in FIGURES]
+        if unknown:
+            raise KeyError(f"Unknown figure(s): {unknown} (choose from {list(FIGURES)})")
+        self.figures = {name: FIGURES[name] for name in (figures or FIGURES)}
+        self.workers = workers
+        self.vot_regex = re.compile(TEXTGRID_PATTERN, re.IGNORECASE)
+        self.vot = None
+        os.makedirs(self.out_dir, exist_ok=True)
+
+    def vot_processor(self):
+        # kept in memory, so a save only reparses the TextGrids it touched
+        if self.vot is None:
+            from vot import TextGridProcessor
+            self.vot = TextGridProcessor(VOT_DIRECTORY, workers=self.workers)
+        return self.vot
+
+    def refresh(self, paths):
+        start = time.perf_counter()
+        keys = {_key(path) for path in paths}
+        vot_paths = [path for path in sorted(paths)
+                     if _key(path).startswith(VOT_DIRECTORY + '/') and self.vot_regex.match(os.path.basename(path))]
+        updated = []
+        # the VOT summary CSV is rewritten after the figures: feedback first
+        if vot_paths and self.vot_processor().update_files(vot_paths, save=False):
+            self.write_table(self.vot.calculate_statistics(), VOT_STATS)
+            updated.append('vot')
+        for name, (source, out) in STAT_TABLES.items():
+            if source in keys and os.path.exists(source):
+                self.write_table(self.stat_table(name, source), out)
+                updated.append(name)
+        # a VOT TextGrid that did not change the rows leaves its figures alone
+        changed = [path for path in paths if path not in vot_paths or 'vot' in updated]
+        figures = dependent_figures(changed, self.figures)
+        for name in figures:
+            self.render(name)
+        if updated or figures:
+            print(f"Updated {updated + figures} in {time.perf_counter() - start:.2f}s")
+        if self.vot is not None:
+            self.vot.flush_summary()
+        return updated, figures
+
+    def stat_table(self, name, source):
+        if name == 'vowels':
+            from monothong import VowelSpacePlotter
+            stats, _ = VowelSpacePlotter(source).transform_by_label()
+            return stats
+        from contours import load_tone_contours
+        from tones import tone_categories
+        return load_tone_contours(source, labels=tone_categories).label_table(tone_categories)
+
+    def write_table(self, df, path):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        df.to_csv(tmp_path, index=False, encoding='utf-8')
+        os.replace(tmp_path, path)
+        print(f"Statistics saved to: {path}")
+
+    def render(self, name):
+        spec = self.figures[name]
+        save_path = os.path.join(self.out_dir, name)
+        try:
+            if spec['target'] == 'vot:plot_figure':
+                # from the in-memory rows rather than a fresh TextGridProcessor
+                plot = {'plosives': self.vot_processor().plot_vot_bar,
+                        'affricates': self.vot_processor().plot_affricates_bar}[spec['params']['kind']]
+                plot(save_path=save_path, dpi=self.dpi, show=False)
+            else:
+                render_figure(name, spec, save_path, self.dpi)
+        except Exception as error:  # a half-annotated file must not stop the watch
+            print(f"{name}: failed ({error!r})")
+            return
+        print(f"{name}: redrawn -> {save_path}")
+
+    def watch(self, debounce=DEBOUNCE, poll=False):
+        os.environ.setdefault('MPLBACKEND', 'Agg')
+        # paid once up front rather than on the first save
+        import matplotlib.pyplot  # noqa: F401
+        self.vot_processor()
+        Observer, _ = _observer()
+        source = EventSource(self.root) if Observer is not None and not poll else PollingSource(self.root)
+        kind = 'polling' if isinstance(source, PollingSource) else 'file system events'
+        print(f"Watching {self.root}/ ({kind}); Ctrl-C to stop")
+        pending = set()
+        last = 0.0
+        try:
+            while True:
+                changed = source.changes(debounce if pending else 1.0)
+                if changed:
+                    pending |= changed
+                    last = time.monotonic()
+                elif pending and time.monotonic() - last >= debounce:
+                    batch, pending = pending, set()
+                    try:
+                        self.refresh(batch)
+                    except Exception as error:
+                        print(f"Update failed ({error!r}); waiting for the next save")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            source.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute statistics and figures as data/ files are saved")
+    parser.add_argument('figures', nargs='*', help="figure file names to keep up to date (default: all)")
+    parser.add_argument('--root', default=DATA_ROOT)
+    parser.add_argument('--final', action='store_true', help="redraw pics/ at 300 dpi instead of pics/draft/")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE, help="seconds of quiet before recomputing")
+    parser.add_argument('--poll', action='store_true', help="poll file stats even if watchdog is installed")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    CorpusWatcher(args.root, draft=not args.final, figures=args.figures, workers=args.workers).watch(
+        args.debounce, args.poll)